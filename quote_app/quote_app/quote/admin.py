@@ -6,7 +6,8 @@ from django.urls import reverse
 from django.contrib import messages
 from .models import (
     User, Company, RegistrationCode, MaterialDensity,
-    Finish, CompanyMaterialPrice, CompanyFinishPrice
+    Finish, CompanyMaterialPrice, CompanyFinishPrice, AnalysisJob,
+    AnalysisResult, AnalysisComponent
 )
 
 
@@ -155,4 +156,33 @@ class CompanyFinishPriceAdmin(admin.ModelAdmin):
     """Configuración del panel de admin para precios de acabados."""
     list_display = ('company', 'finish', 'price_multiplier', 'is_active', 'updated_at')
     list_filter = ('company', 'finish', 'is_active')
-    search_fields = ('company__name', 'finish__name')
\ No newline at end of file
+    search_fields = ('company__name', 'finish__name')
+
+
+@admin.register(AnalysisJob)
+class AnalysisJobAdmin(admin.ModelAdmin):
+    """Configuración del panel de admin para análisis STEP en segundo plano."""
+    list_display = ('original_name', 'user', 'status', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    search_fields = ('original_name', 'user__username')
+    readonly_fields = ('id', 'created_at', 'started_at', 'finished_at', 'result', 'error')
+    ordering = ('-created_at',)
+
+
+class AnalysisComponentInline(admin.TabularInline):
+    """Inline admin for the components of an analysis result"""
+    model = AnalysisComponent
+    extra = 0
+    can_delete = False
+    fields = ('position', 'name', 'volume', 'material', 'quantity', 'mesh_status')
+    readonly_fields = fields
+
+
+@admin.register(AnalysisResult)
+class AnalysisResultAdmin(admin.ModelAdmin):
+    """Configuración del panel de admin para resultados de análisis en cotización."""
+    list_display = ('original_name', 'user', 'created_at', 'updated_at')
+    search_fields = ('original_name', 'user__username')
+    readonly_fields = ('id', 'job', 'created_at', 'updated_at', 'material_totals', 'densities')
+    ordering = ('-updated_at',)
+    inlines = [AnalysisComponentInline]
@@ -5,3 +5,8 @@ class QuoteConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'quote'
 
+    def ready(self):
+        # Invalidación de la cache de precios al cambiar precios, materiales o acabados
+        from . import signals  # noqa: F401
+        # La plantilla y los conversores a PDF se precargan sólo en el servidor web
+        # (quote.services.startup, llamado desde wsgi.py / asgi.py)
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from quote.services.analysis_service import (
+    claim_next_job, get_analysis_archive, get_analysis_pool, requeue_stale_jobs, run_analysis_job
+)
+from quote.services.result_store import purge_expired_results
+
+# Segundos entre limpiezas de resultados vencidos
+PURGE_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    help = 'Procesa la cola de análisis de archivos STEP'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Procesar los trabajos pendientes y salir')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Segundos de espera cuando la cola está vacía')
+        parser.add_argument('--max-jobs', type=int, default=0, help='Salir después de N trabajos (0 = sin límite)')
+
+    def handle(self, *args, **options):
+        processed = 0
+        self.stdout.write(self.style.SUCCESS('Worker de análisis STEP iniciado.'))
+
+        # Los procesos de análisis arrancan ya con trimesh/cascadio importados
+        pool = get_analysis_pool()
+        if pool is not None:
+            pool.warm()
+
+        last_purge = None
+        while True:
+            if last_purge is None or time.monotonic() - last_purge >= PURGE_INTERVAL:
+                purge_expired_results()
+                last_purge = time.monotonic()
+            requeue_stale_jobs()
+            job = claim_next_job()
+
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            job = run_analysis_job(job)
+            processed += 1
+            self.stdout.write(f'{job.original_name}: {job.get_status_display()}')
+
+            if options['max_jobs'] and processed >= options['max_jobs']:
+                break
+
+        if pool is not None:
+            pool.shutdown()
+        archive = get_analysis_archive()
+        if archive is not None:
+            archive.close()
+        self.stdout.write(self.style.SUCCESS(f'Se procesaron {processed} trabajos.'))
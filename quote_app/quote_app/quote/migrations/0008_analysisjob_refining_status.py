@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quote', '0007_analysisjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='analysisjob',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pendiente'), ('running', 'En proceso'), ('refining', 'Refinando'), ('done', 'Completado'), ('failed', 'Fallido')], db_index=True, default='pending', max_length=20, verbose_name='Estado'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:31
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quote', '0008_analysisjob_refining_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisResult',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('original_name', models.CharField(blank=True, max_length=255, verbose_name='Nombre del archivo')),
+                ('material_totals', models.JSONField(default=dict, verbose_name='Totales por material')),
+                ('densities', models.JSONField(default=dict, verbose_name='Densidades')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+                ('job', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='results', to='quote.analysisjob', verbose_name='Análisis')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analysis_results', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Resultado de Análisis',
+                'verbose_name_plural': 'Resultados de Análisis',
+            },
+        ),
+        migrations.CreateModel(
+            name='AnalysisComponent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(verbose_name='Posición')),
+                ('name', models.CharField(max_length=255, verbose_name='Componente')),
+                ('volume', models.FloatField(verbose_name='Volumen (in³)')),
+                ('material', models.CharField(max_length=100, verbose_name='Material')),
+                ('vertices', models.PositiveIntegerField(default=0, verbose_name='Vértices')),
+                ('faces', models.PositiveIntegerField(default=0, verbose_name='Caras')),
+                ('quantity', models.PositiveIntegerField(default=1, verbose_name='Cantidad')),
+                ('mesh_status', models.CharField(blank=True, max_length=20, verbose_name='Estado de malla')),
+                ('volume_error', models.FloatField(blank=True, null=True, verbose_name='Error de volumen')),
+                ('result', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='components', to='quote.analysisresult', verbose_name='Resultado')),
+            ],
+            options={
+                'verbose_name': 'Componente de Análisis',
+                'verbose_name_plural': 'Componentes de Análisis',
+                'ordering': ['result', 'position'],
+                'indexes': [models.Index(fields=['result', 'name'], name='quote_analy_result__39fd5b_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quote', '0010_analysisjob_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisjob',
+            name='stored_status',
+            field=models.CharField(blank=True, max_length=20, verbose_name='Resultado guardado'),
+        ),
+    ]
@@ -238,4 +238,118 @@ class RegistrationCode(models.Model):
     class Meta:
         verbose_name = "Código de Registro"
         verbose_name_plural = "Códigos de Registro"
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+
+class AnalysisJob(models.Model):
+    """STEP analysis queued for a background worker"""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_REFINING = 'refining'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pendiente'),
+        (STATUS_RUNNING, 'En proceso'),
+        (STATUS_REFINING, 'Refinando'),
+        (STATUS_DONE, 'Completado'),
+        (STATUS_FAILED, 'Fallido'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='analysis_jobs',
+        verbose_name="Usuario"
+    )
+    file = models.FileField("Archivo STEP", upload_to='step_jobs/', blank=True)
+    original_name = models.CharField("Nombre del archivo", max_length=255)
+    status = models.CharField(
+        "Estado",
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        db_index=True
+    )
+    result = models.JSONField("Resultado", null=True, blank=True)
+    error = models.TextField("Error", blank=True)
+    attempts = models.PositiveIntegerField("Intentos", default=0)
+    created_at = models.DateTimeField("Fecha de Creación", auto_now_add=True)
+    started_at = models.DateTimeField("Inicio", null=True, blank=True)
+    # El worker la actualiza periódicamente mientras procesa el trabajo
+    heartbeat_at = models.DateTimeField("Última señal del worker", null=True, blank=True)
+    finished_at = models.DateTimeField("Fin", null=True, blank=True)
+    # Estado cuyo resultado ya se guardó como AnalysisResult (evita guardarlo dos veces)
+    stored_status = models.CharField("Resultado guardado", max_length=20, blank=True)
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+
+    def __str__(self):
+        return f"{self.original_name} - {self.get_status_display()}"
+
+    class Meta:
+        verbose_name = "Análisis STEP"
+        verbose_name_plural = "Análisis STEP"
+        ordering = ['-created_at']
+
+
+class AnalysisResult(models.Model):
+    """Analysis result being quoted; the session only keeps its id"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='analysis_results',
+        verbose_name="Usuario"
+    )
+    job = models.ForeignKey(
+        AnalysisJob,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='results',
+        verbose_name="Análisis"
+    )
+    original_name = models.CharField("Nombre del archivo", max_length=255, blank=True)
+    # {material: [volumen total, número de filas]}, se ajusta en cada cambio de material
+    material_totals = models.JSONField("Totales por material", default=dict)
+    densities = models.JSONField("Densidades", default=dict)
+    created_at = models.DateTimeField("Fecha de Creación", auto_now_add=True)
+    updated_at = models.DateTimeField("Última Actualización", auto_now=True)
+
+    def __str__(self):
+        return f"{self.original_name or self.id} - {self.user}"
+
+    class Meta:
+        verbose_name = "Resultado de Análisis"
+        verbose_name_plural = "Resultados de Análisis"
+
+
+class AnalysisComponent(models.Model):
+    """One row of an analysis result"""
+    result = models.ForeignKey(
+        AnalysisResult,
+        on_delete=models.CASCADE,
+        related_name='components',
+        verbose_name="Resultado"
+    )
+    position = models.PositiveIntegerField("Posición")
+    name = models.CharField("Componente", max_length=255)
+    volume = models.FloatField("Volumen (in³)")
+    material = models.CharField("Material", max_length=100)
+    vertices = models.PositiveIntegerField("Vértices", default=0)
+    faces = models.PositiveIntegerField("Caras", default=0)
+    quantity = models.PositiveIntegerField("Cantidad", default=1)
+    mesh_status = models.CharField("Estado de malla", max_length=20, blank=True)
+    volume_error = models.FloatField("Error de volumen", null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} x{self.quantity}"
+
+    class Meta:
+        verbose_name = "Componente de Análisis"
+        verbose_name_plural = "Componentes de Análisis"
+        ordering = ['result', 'position']
+        indexes = [models.Index(fields=['result', 'name'])]
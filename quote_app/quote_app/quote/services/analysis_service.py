@@ -0,0 +1,252 @@
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from utils.analysis_archive import AnalysisArchive
+from utils.analysis_cache import AnalysisCache
+from utils.analysis_pool import AnalysisPool
+from utils.step_analyzer import analyze_step_file
+
+from ..models import AnalysisJob
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_analysis_cache = None
+_analysis_pool = None
+_analysis_archive = None
+
+
+def get_analysis_cache() -> Optional[AnalysisCache]:
+    """Returns the process-wide STEP analysis cache, or None if it is disabled in settings."""
+    global _analysis_cache
+
+    directory = getattr(settings, 'STEP_ANALYSIS_CACHE_DIR', None)
+    if not directory:
+        return None
+
+    if _analysis_cache is None:
+        try:
+            _analysis_cache = AnalysisCache(
+                directory,
+                max_bytes=getattr(settings, 'STEP_ANALYSIS_CACHE_MAX_BYTES', 512 * 1024 * 1024),
+                max_age=getattr(settings, 'STEP_ANALYSIS_CACHE_MAX_AGE', None),
+            )
+        except OSError as e:
+            logger.error(f"Could not initialize STEP analysis cache at {directory}: {str(e)}")
+            return None
+    return _analysis_cache
+
+
+def get_analysis_pool() -> Optional[AnalysisPool]:
+    """Returns the process-wide analysis subprocess pool, or None to analyze in-process."""
+    global _analysis_pool
+
+    size = getattr(settings, 'STEP_ANALYSIS_POOL_SIZE', 0)
+    if not size:
+        return None
+
+    if _analysis_pool is None:
+        _analysis_pool = AnalysisPool(
+            workers=size,
+            max_jobs_per_child=getattr(settings, 'STEP_ANALYSIS_MAX_JOBS_PER_CHILD', 20),
+            memory_limit=getattr(settings, 'STEP_ANALYSIS_MEMORY_LIMIT', None),
+            cpu_limit=getattr(settings, 'STEP_ANALYSIS_CPU_LIMIT', None),
+        )
+    return _analysis_pool
+
+
+def get_analysis_archive() -> Optional[AnalysisArchive]:
+    """Returns the process-wide analysis archive, or None if archiving is disabled in settings."""
+    global _analysis_archive
+
+    directory = getattr(settings, 'STEP_ANALYSIS_ARCHIVE_DIR', None)
+    if not directory:
+        return None
+
+    if _analysis_archive is None:
+        try:
+            _analysis_archive = AnalysisArchive(
+                directory,
+                max_age=getattr(settings, 'STEP_ANALYSIS_ARCHIVE_MAX_AGE', None),
+                max_entries=getattr(settings, 'STEP_ANALYSIS_ARCHIVE_MAX_ENTRIES', None),
+            )
+        except OSError as e:
+            logger.error(f"Could not initialize STEP analysis archive at {directory}: {str(e)}")
+            return None
+    return _analysis_archive
+
+
+def load_company_history(company, since=None, limit=None):
+    """
+    DataFrame with the components of the company's archived analyses, newest
+    first. A naive `since` is taken in the project time zone.
+    """
+    archive = get_analysis_archive()
+    if archive is None:
+        return None
+    if since is not None and timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return archive.load_history(company.pk, since=since, limit=limit)
+
+
+def enqueue_analysis(user, uploaded_file) -> AnalysisJob:
+    """Stores the upload and queues it for the analysis worker."""
+    job = AnalysisJob(user=user, original_name=uploaded_file.name)
+    job.file.save(uploaded_file.name, uploaded_file, save=False)
+    job.save()
+    logger.info(f"Queued STEP analysis job {job.id} for {uploaded_file.name}")
+    return job
+
+
+def requeue_stale_jobs() -> int:
+    """
+    Puts back in the queue jobs whose worker died; gives up after the configured attempts.
+
+    A job is abandoned when its worker has not refreshed heartbeat_at for
+    STEP_ANALYSIS_JOB_TIMEOUT seconds, however long the analysis itself takes.
+    """
+    timeout = getattr(settings, 'STEP_ANALYSIS_JOB_TIMEOUT', 10 * 60)
+    max_attempts = getattr(settings, 'STEP_ANALYSIS_JOB_MAX_ATTEMPTS', 3)
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    stale = AnalysisJob.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff),
+        status__in=(AnalysisJob.STATUS_RUNNING, AnalysisJob.STATUS_REFINING)
+    )
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status=AnalysisJob.STATUS_FAILED,
+        error='Analysis timed out',
+        finished_at=timezone.now()
+    )
+    requeued = stale.filter(attempts__lt=max_attempts).update(status=AnalysisJob.STATUS_PENDING)
+    if failed or requeued:
+        logger.warning(f"Stale analysis jobs: {requeued} requeued, {failed} failed")
+    return requeued
+
+
+def claim_next_job() -> Optional[AnalysisJob]:
+    """
+    Atomically takes the oldest pending job.
+
+    The conditional UPDATE only succeeds for one worker, so several workers can
+    poll the same table without a broker or row locks.
+    """
+    while True:
+        job = AnalysisJob.objects.filter(status=AnalysisJob.STATUS_PENDING).order_by('created_at').first()
+        if job is None:
+            return None
+        now = timezone.now()
+        claimed = AnalysisJob.objects.filter(pk=job.pk, status=AnalysisJob.STATUS_PENDING).update(
+            status=AnalysisJob.STATUS_RUNNING,
+            started_at=now,
+            heartbeat_at=now,
+            stored_status='',
+            attempts=F('attempts') + 1
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def _owned(job: AnalysisJob):
+    """
+    The job row as long as it still belongs to this run: once it is requeued
+    and claimed again, attempts changes and writes from this run match nothing.
+    """
+    return AnalysisJob.objects.filter(pk=job.pk, attempts=job.attempts)
+
+
+@contextmanager
+def _heartbeat(job: AnalysisJob):
+    """Refreshes job.heartbeat_at in a background thread while the analysis runs."""
+    interval = getattr(settings, 'STEP_ANALYSIS_JOB_HEARTBEAT', 30)
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(interval):
+                if not _owned(job).update(heartbeat_at=timezone.now()):
+                    logger.warning(f"STEP analysis job {job.id} was claimed by another worker")
+                    return
+        except Exception as e:
+            logger.error(f"Heartbeat of STEP analysis job {job.id} failed: {str(e)}")
+        finally:
+            # Cada hilo abre su propia conexión a la base de datos
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f'analysis-heartbeat-{job.id}', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _store_coarse_result(job: AnalysisJob):
+    """Callback for the adaptive analysis: publishes the coarse rows while the refined pass runs."""
+    def store(table):
+        result = table.to_dict()
+        if _owned(job).update(result=result, status=AnalysisJob.STATUS_REFINING):
+            job.result = result
+            job.status = AnalysisJob.STATUS_REFINING
+            logger.info(f"STEP analysis job {job.id}: coarse result stored, refining")
+    return store
+
+
+def run_analysis_job(job: AnalysisJob) -> AnalysisJob:
+    """
+    Runs the STEP analysis for a claimed job and stores its result.
+
+    The result is only written (and the upload deleted) if the job was not
+    requeued and claimed by another worker in the meantime.
+    """
+    logger.info(f"Running STEP analysis job {job.id} ({job.original_name})")
+    table = None
+    try:
+        # Archivo en disco: el analizador pasa la ruta directo a cascadio sin leerlo en memoria
+        with _heartbeat(job), open(job.file.path, 'rb') as step_file:
+            table = analyze_step_file(
+                step_file,
+                cache=get_analysis_cache(),
+                workers=getattr(settings, 'STEP_ANALYSIS_WORKERS', 0),
+                repair_mode=getattr(settings, 'STEP_ANALYSIS_REPAIR_MODE', 'always'),
+                tessellation=getattr(settings, 'STEP_ANALYSIS_TESSELLATION', 'default'),
+                refine_tolerance=getattr(settings, 'STEP_ANALYSIS_REFINE_TOLERANCE', 0.01),
+                on_coarse_result=_store_coarse_result(job),
+                spool_dir=getattr(settings, 'STEP_ANALYSIS_SPOOL_DIR', None),
+                pool=get_analysis_pool()
+            )
+        job.result = table.to_dict()
+        job.status = AnalysisJob.STATUS_DONE
+        job.error = ''
+    except Exception as e:
+        logger.error(f"STEP analysis job {job.id} failed: {str(e)}", exc_info=True)
+        job.status = AnalysisJob.STATUS_FAILED
+        job.error = str(e)
+
+    job.finished_at = timezone.now()
+    stored = _owned(job).update(
+        result=job.result, status=job.status, error=job.error, finished_at=job.finished_at, file=''
+    )
+    if not stored:
+        # Otro worker lo reclamó: su ejecución es la que vale y todavía usa el archivo
+        logger.warning(f"STEP analysis job {job.id} was claimed by another worker, result discarded")
+        job.refresh_from_db()
+        return job
+
+    # El archivo ya no se necesita: el resultado queda en la base de datos
+    job.file.delete(save=False)
+
+    archive = get_analysis_archive()
+    if table is not None and archive is not None:
+        # Se escribe en segundo plano; no retrasa la entrega del resultado
+        archive.submit(job.user.company_id, table, file_name=job.original_name, analysis_id=str(job.id))
+    return job
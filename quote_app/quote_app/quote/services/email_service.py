@@ -10,16 +10,22 @@ from email.mime.image import MIMEImage
 from django.conf import settings
 from django.template.loader import render_to_string
 
+from ..services.pdf_backends import SOURCE_QUOTE, SOURCE_WORKBOOK
 from ..services.pdf_conversion_service import PDFConverter
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-def send_excel_quote_email(customer_excel_content, internal_excel_content, project_name, user_email, internal_email_addr, project_data, company):
-    """Send quote Excel to customer and internal email using direct SMTP with optional PDF conversion."""
+def send_excel_quote_email(customer_excel_content, internal_excel_content, project_name, user_email, internal_email_addr, project_data, company, quote_build=None):
+    """
+    Send quote Excel to customer and internal email using direct SMTP with optional PDF conversion.
+    With quote_build (QuoteBuild) the PDFs are drawn from the priced quote instead of converting the workbooks.
+    """
     try:
         # Check if PDF conversion is supported
-        pdf_supported = PDFConverter.is_conversion_supported()
+        pdf_supported = PDFConverter.is_conversion_supported(
+            SOURCE_QUOTE if quote_build is not None else SOURCE_WORKBOOK
+        )
         format_type = 'Excel & PDF' if pdf_supported else 'Excel'
         
         logger.info("=" * 50)
@@ -32,8 +38,13 @@ def send_excel_quote_email(customer_excel_content, internal_excel_content, proje
         
         if pdf_supported:
             logger.info("Attempting to convert Excel files to PDF...")
-            customer_pdf_content = PDFConverter.convert_excel_to_pdf(customer_excel_content)
-            internal_pdf_content = PDFConverter.convert_excel_to_pdf(internal_excel_content)
+            # Las dos conversiones se hacen en paralelo
+            if quote_build is not None:
+                customer_pdf_content, internal_pdf_content = PDFConverter.convert_quote_to_pdf(quote_build)
+            else:
+                customer_pdf_content, internal_pdf_content = PDFConverter.convert_excels_to_pdf(
+                    customer_excel_content, internal_excel_content
+                )
             
             if customer_pdf_content:
                 logger.info("✅ Customer PDF generated successfully")
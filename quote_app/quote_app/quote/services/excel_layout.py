@@ -0,0 +1,249 @@
+import io
+import logging
+from copy import copy, deepcopy
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from django.conf import settings
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.drawing.spreadsheet_drawing import OneCellAnchor, TwoCellAnchor
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.utils import column_index_from_string
+from openpyxl.workbook import Workbook
+from openpyxl.worksheet.pagebreak import Break
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def rows_per_page() -> int:
+    """Component lines per printed page; the table header row repeats on every page."""
+    return getattr(settings, 'EXCEL_ROWS_PER_PAGE', 30)
+
+
+def streaming_min_lines() -> int:
+    """From this many lines the quote is written in write-only (streaming) mode."""
+    return getattr(settings, 'EXCEL_STREAMING_MIN_LINES', 1000)
+
+
+@dataclass(frozen=True)
+class TableLayout:
+    """
+    Rows used by the components table of one quote.
+
+    The template leaves the rows between table_start_row and terms_row free;
+    when the lines, the blank row and the total row do not fit there,
+    inserted_rows rows are added above the terms block, which moves down.
+    """
+    header_row: int
+    start_row: int
+    line_count: int
+    inserted_rows: int
+    terms_row: int
+
+    @property
+    def total_row(self) -> int:
+        # Una fila en blanco entre los componentes y el total
+        return self.start_row + self.line_count + 1
+
+    @property
+    def page_breaks(self) -> List[int]:
+        """Rows after which a new page starts (none when the lines fit on one page)."""
+        per_page = rows_per_page()
+        if per_page <= 0 or self.line_count <= per_page:
+            return []
+        last_line_row = self.start_row + self.line_count - 1
+        return list(range(self.start_row + per_page - 1, last_line_row, per_page))
+
+
+def plan_table(cell_refs: Mapping, line_count: int) -> TableLayout:
+    """Layout of the components table for line_count lines in a template variant."""
+    start_row = cell_refs['table_start_row']
+    terms_row = cell_refs['terms_row']
+    needed = line_count + 2  # componentes + fila en blanco + total
+    inserted_rows = max(0, needed - (terms_row - start_row))
+    return TableLayout(
+        header_row=cell_refs['table_header_row'],
+        start_row=start_row,
+        line_count=line_count,
+        inserted_rows=inserted_rows,
+        terms_row=terms_row + inserted_rows
+    )
+
+
+def _shift_anchor(anchor, first_row: int, offset: int) -> None:
+    # Las anclas de las imágenes usan filas base 0
+    if isinstance(anchor, (OneCellAnchor, TwoCellAnchor)) and anchor._from.row >= first_row - 1:
+        anchor._from.row += offset
+        if isinstance(anchor, TwoCellAnchor):
+            anchor.to.row += offset
+
+
+def insert_sheet_rows(ws, row: int, count: int,
+                      merged_anchors: Mapping[Tuple[int, int], Tuple[int, int]]) -> Mapping[Tuple[int, int], Tuple[int, int]]:
+    """
+    Inserts count empty rows before row, moving down what openpyxl's
+    insert_rows leaves behind: merged ranges, row heights and image anchors.
+    Returns the merged-cell anchor index of the shifted layout (the one
+    given is shared by every quote and is not modified).
+    """
+    if count <= 0:
+        return merged_anchors
+    ws.insert_rows(row, count)
+
+    for merged_range in ws.merged_cells.ranges:
+        if merged_range.min_row >= row:
+            merged_range.shift(row_shift=count)
+
+    for index in sorted((index for index in ws.row_dimensions if index >= row), reverse=True):
+        dimension = ws.row_dimensions.pop(index)
+        dimension.index = index + count
+        ws.row_dimensions[index + count] = dimension
+
+    for image in ws._images:
+        _shift_anchor(image.anchor, row, count)
+
+    def shifted(position):
+        return (position[0] + count, position[1]) if position[0] >= row else position
+
+    logger.info(f"Inserted {count} rows at row {row}")
+    return MappingProxyType({shifted(position): shifted(anchor) for position, anchor in merged_anchors.items()})
+
+
+def apply_pagination(ws, layout: TableLayout) -> None:
+    """Page breaks every rows_per_page() lines, repeating the table header row on each page."""
+    breaks = layout.page_breaks
+    if not breaks:
+        return
+    ws.print_title_rows = f'{layout.header_row}:{layout.header_row}'
+    for row in breaks:
+        ws.row_breaks.append(Break(id=row))
+    logger.info(f"Components table split into {len(breaks) + 1} pages")
+
+
+def _copy_style(source, target) -> None:
+    if source.has_style:
+        target.font = copy(source.font)
+        target.fill = copy(source.fill)
+        target.border = copy(source.border)
+        target.alignment = copy(source.alignment)
+        target.protection = copy(source.protection)
+        target.number_format = source.number_format
+
+
+class StreamingSheetWriter:
+    """
+    Write-only copy of a filled template sheet for very large BOMs.
+
+    Rows are written in order and flushed to a temporary file as they are
+    appended, so memory stays constant however many component lines the
+    quote has; only the template sheet (header and terms blocks) is kept in
+    memory. copy_rows() reproduces rows of the template sheet with their
+    values, styles, heights, merged ranges and images, moved to the current
+    output row; append() writes one table row.
+    """
+
+    def __init__(self, template_ws):
+        self.template_ws = template_ws
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet(template_ws.title)
+        self.row = 0  # última fila escrita
+        self._max_column = template_ws.max_column
+
+        # Ancho de columnas y configuración de impresión: antes de escribir la primera fila
+        for key, dimension in template_ws.column_dimensions.items():
+            self.ws.column_dimensions[key].width = dimension.width
+            self.ws.column_dimensions[key].hidden = dimension.hidden
+        self.ws.page_setup = copy(template_ws.page_setup)
+        self.ws.page_setup._parent = self.ws
+        self.ws.page_margins = copy(template_ws.page_margins)
+        self.ws.print_options = copy(template_ws.print_options)
+        self.ws.sheet_properties = copy(template_ws.sheet_properties)
+        self.ws.sheet_format = copy(template_ws.sheet_format)
+        self.ws.views = deepcopy(template_ws.views)
+
+    def copy_rows(self, first: int, last: Optional[int] = None) -> None:
+        """Copies template rows first..last (through the end of the sheet, images included, when last is None)."""
+        to_end = last is None
+        if to_end:
+            last = self.template_ws.max_row
+        offset = self.row + 1 - first
+
+        for row in range(first, last + 1):
+            source_dimension = self.template_ws.row_dimensions.get(row)
+            if source_dimension is not None and source_dimension.height is not None:
+                self.ws.row_dimensions[row + offset].height = source_dimension.height
+            cells = []
+            for column in range(1, self._max_column + 1):
+                source = self.template_ws._cells.get((row, column))
+                if source is None or (source.value is None and not source.has_style):
+                    cells.append(None)
+                    continue
+                cell = WriteOnlyCell(self.ws, source.value)
+                _copy_style(source, cell)
+                cells.append(cell)
+            self.ws.append(cells)
+
+        for merged_range in self.template_ws.merged_cells.ranges:
+            if merged_range.min_row >= first and merged_range.max_row <= last:
+                moved = copy(merged_range)
+                moved.shift(row_shift=offset)
+                self.ws.merged_cells.add(moved)
+
+        for image in self.template_ws._images:
+            anchor = image.anchor
+            if not isinstance(anchor, (OneCellAnchor, TwoCellAnchor)):
+                continue
+            if anchor._from.row + 1 < first or (not to_end and anchor._from.row + 1 > last):
+                continue
+            moved = copy(image)
+            moved.anchor = deepcopy(anchor)
+            _shift_anchor(moved.anchor, first, offset)
+            self.ws.add_image(moved)
+
+        self.row = last + offset
+
+    def cell_style(self, **attributes) -> StyleArray:
+        """
+        Style (font=, fill=, border=...) registered once in the output workbook;
+        assigning it to each cell would look it up again for every cell.
+        """
+        cell = WriteOnlyCell(self.ws)
+        for attribute, value in attributes.items():
+            setattr(cell, attribute, value)
+        return cell._style
+
+    def append(self, values: Dict[str, object], columns: Iterable[str], style: Optional[StyleArray] = None) -> None:
+        """
+        Writes one row: values by column letter, style (from cell_style()) applied
+        to every cell of columns even when it has no value.
+        """
+        styled = set(columns) if style else set()
+        by_index = {column_index_from_string(col): col for col in set(values) | styled}
+        cells = []
+        for column in range(1, max(by_index, default=0) + 1):
+            col = by_index.get(column)
+            if col is None:
+                cells.append(None)
+                continue
+            cell = WriteOnlyCell(self.ws, values.get(col))
+            if col in styled:
+                cell._style = copy(style)
+            cells.append(cell)
+        self.ws.append(cells)
+        self.row += 1
+
+    def skip_to(self, row: int) -> None:
+        """Leaves the rows before row empty."""
+        while self.row < row - 1:
+            self.ws.append([])
+            self.row += 1
+
+    def paginate(self, layout: TableLayout) -> None:
+        apply_pagination(self.ws, layout)
+
+    def save(self) -> bytes:
+        buffer = io.BytesIO()
+        self.wb.save(buffer)
+        return buffer.getvalue()
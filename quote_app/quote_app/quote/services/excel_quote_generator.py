@@ -1,58 +1,36 @@
-import os
 import logging
 import io
-from datetime import datetime, timedelta
-from openpyxl import load_workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-from openpyxl.utils import get_column_letter, column_index_from_string
-from django.conf import settings
+from datetime import datetime
+from openpyxl.styles import Font, PatternFill, Border, Side
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.cell import coordinate_to_tuple
 
-from ..models import MaterialDensity, CompanyMaterialPrice, CompanyFinishPrice
+from .excel_layout import (
+    StreamingSheetWriter, apply_pagination, insert_sheet_rows, plan_table, streaming_min_lines
+)
+from .excel_template import get_excel_template
+from .price_cache import get_price_snapshot
+from .pricing_engine import PriceSnapshot, price_project
+from .quote_document import QUOTE_TERMS, component_cells, header_values, table_columns, total_cells
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 class ExcelQuoteGenerator:
-    def __init__(self, user, project_data, is_internal=False):
+    def __init__(self, user, project_data, is_internal=False, priced=None, issued_at=None):
         self.user = user
         self.company = user.company
         self.project_data = project_data
         self.is_internal = is_internal
+        # Resultado ya calculado y fecha de emisión compartidos por las dos versiones (quote_pipeline)
+        self.priced = priced
+        self.issued_at = issued_at
         
-        # Definir referencias de celdas en un diccionario centralizado
-        # Esto facilita ajustar las referencias si el template cambia
-        self.cell_refs = {
-            'date': 'J4',
-            'valid_until': 'J5',
-            'quote_number': 'J6',
-            'revision': 'J7',
-            'project_name': 'C6',
-            'company_name': 'C7',
-            'contact_name': 'C8',
-            'contact_email': 'C9',
-            'table_header_row': 11,
-            'table_start_row': 12,
-            'terms_row': 34
-        }
-        
-        # Cargar la plantilla Excel
-        template_path = os.path.join(settings.STATIC_ROOT, 'templates', 'quote_template.xlsx')
-        if not os.path.exists(template_path):
-            logger.error(f"Template file not found at {template_path}")
-            raise FileNotFoundError(f"Excel template not found: {template_path}")
-        
+        # Copia de la variante (interna o cliente) de la plantilla ya preparada, con sus
+        # referencias de celdas; la versión del cliente ya no tiene las columnas internas
         try:
-            self.wb = load_workbook(template_path)
+            self.wb, self.cell_refs, self.merged_anchors = get_excel_template().clone(is_internal)
             self.ws = self.wb.active
-            logger.info(f"Template loaded successfully: {template_path}")
-            
-            # Verificar si las celdas de referencia existen en el template
-            self._validate_template()
-            
-            # Si no es una cotización interna, eliminar las columnas que no necesitamos mostrar al cliente
-            if not is_internal:
-                self._remove_internal_columns()
-                
         except Exception as e:
             logger.error(f"Error loading Excel template: {str(e)}")
             raise
@@ -65,136 +43,22 @@ class ExcelQuoteGenerator:
             bottom=Side(style='thin')
         )
         
-        self.header_style = {
-            'font': Font(bold=True),
-            'fill': PatternFill(start_color="E0E0E0", end_color="E0E0E0", fill_type="solid"),
-            'border': self.thin_border,
-            'alignment': Alignment(horizontal='center', vertical='center')
-        }
-        
         # Preparar datos de materiales y precios
-        self._load_materials_and_prices()
-
-    def _validate_template(self):
-        """Valida que las celdas de referencia existan en el template"""
-        # Obtener dimensiones de la hoja
-        if not self.ws.dimensions:
-            logger.warning("No se pudo determinar las dimensiones de la hoja")
-            return
-            
-        logger.info(f"Sheet dimensions: {self.ws.dimensions}")
-        
-        # Verificar celdas combinadas
-        if self.ws.merged_cells:
-            merged_ranges = [str(merged_range) for merged_range in self.ws.merged_cells.ranges]
-            logger.info(f"Merged cells found: {merged_ranges}")
-        
-        # Registrar información sobre las celdas clave
-        for name, ref in self.cell_refs.items():
-            if isinstance(ref, str) and not ref.isdigit():  # Solo verificar referencias de celda, no números de fila
-                try:
-                    value = self.ws[ref].value
-                    logger.info(f"Reference '{name}' at {ref}: {value}")
-                except (KeyError, AttributeError):
-                    logger.warning(f"Reference '{name}' at {ref} not found in template")
-
-    def _remove_internal_columns(self):
-        """Elimina columnas que no son necesarias para la versión del cliente"""
-        logger.info("Removing internal columns for client version")
-        
-        # Primero, desunir (unmerge) las celdas combinadas que cruzan columnas que vamos a eliminar
-        # Por ejemplo, la celda D11 (QTY) que está mergeada hasta H11
-        header_row = self.cell_refs['table_header_row']
-        qty_header_ref = f'D{header_row}'
-        
-        # Buscar y deshacer combinaciones de celdas en la fila de encabezados
-        merged_ranges_to_unmerge = []
-        for merged_range in self.ws.merged_cells.ranges:
-            # Verificar si el rango está en la fila de encabezados
-            if merged_range.min_row == header_row and merged_range.max_row == header_row:
-                # Verificar si el rango cruza alguna de las columnas que queremos eliminar
-                if ((merged_range.min_col <= column_index_from_string('D') <= merged_range.max_col) or
-                    (merged_range.min_col <= column_index_from_string('H') <= merged_range.max_col)):
-                    merged_ranges_to_unmerge.append(str(merged_range))
-                    logger.info(f"Will unmerge range: {merged_range}")
-        
-        # Deshacer las combinaciones encontradas
-        for merged_range in merged_ranges_to_unmerge:
-            try:
-                self.ws.unmerge_cells(merged_range)
-                logger.info(f"Unmerged cells in range: {merged_range}")
-            except Exception as e:
-                logger.error(f"Error unmerging cells in range {merged_range}: {str(e)}")
-        
-        # Columnas a eliminar: D a H y J (de derecha a izquierda para evitar problemas de índices)
-        columns_to_delete = ['J', 'H', 'G', 'F', 'E', 'D']
-        
-        # Actualizar las referencias de celda que podrían verse afectadas por la eliminación
-        column_shift_mapping = {}
-        
-        for col in columns_to_delete:
-            try:
-                col_idx = column_index_from_string(col)
-                self.ws.delete_cols(col_idx)
-                logger.info(f"Deleted column {col}")
-                
-                # Actualizar el mapeo de desplazamiento para celdas que están a la derecha de la columna eliminada
-                for i in range(col_idx, 27):  # 26 letras en el alfabeto
-                    original_col = get_column_letter(i + 1)
-                    new_col = get_column_letter(i)
-                    column_shift_mapping[original_col] = new_col
-            except Exception as e:
-                logger.error(f"Error deleting column {col}: {str(e)}")
-        
-        # Actualizar referencias de celda para reflejar las columnas eliminadas
-        updated_refs = {}
-        for key, cell_ref in self.cell_refs.items():
-            if isinstance(cell_ref, str) and any(c.isalpha() for c in cell_ref):
-                col_letter = ''.join(filter(str.isalpha, cell_ref))
-                row_num = ''.join(filter(str.isdigit, cell_ref))
-                
-                # Si la columna necesita ser actualizada
-                if col_letter in column_shift_mapping:
-                    new_col = column_shift_mapping[col_letter]
-                    updated_refs[key] = f"{new_col}{row_num}"
-                    logger.info(f"Updated cell reference {key}: {cell_ref} -> {updated_refs[key]}")
-                else:
-                    updated_refs[key] = cell_ref
-            else:
-                updated_refs[key] = cell_ref
-        
-        self.cell_refs = updated_refs
-        logger.info("Cell references updated after column deletion")
+        if priced is None:
+            self._load_materials_and_prices()
 
     def _load_materials_and_prices(self):
         """Carga los datos de materiales y precios de la base de datos"""
         try:
-            self.material_densities = {
-                material.material_type: material.density 
-                for material in MaterialDensity.objects.all()
-            }
-            
-            self.material_prices = {
-                cp.material.id: {
-                    'price_per_lb': float(cp.price_per_lb),
-                    'density': cp.material.density,
-                    'name': cp.material.name or cp.material.get_material_type_display()
-                }
-                for cp in CompanyMaterialPrice.objects.filter(
-                    company=self.company,
-                    is_active=True
-                ).select_related('material')
-            }
-            
-            logger.info(f"Loaded {len(self.material_prices)} material prices for company {self.company.name}")
+            self.price_snapshot = get_price_snapshot(self.company, self.project_data.get('project_finish'))
         except Exception as e:
             logger.error(f"Error loading material data: {str(e)}")
-            self.material_densities = {}
-            self.material_prices = {}
-    
+            self.price_snapshot = PriceSnapshot.empty()
+
     def find_main_cell_in_merged_range(self, cell_ref):
         """
         Encuentra la celda principal (top-left) de un rango combinado que contiene la celda especificada.
+        Consulta el índice de anclas de la plantilla: O(1), sin recorrer los rangos combinados.
         
         Args:
             cell_ref: Referencia de celda (ej: 'A1', 'B5')
@@ -202,27 +66,14 @@ class ExcelQuoteGenerator:
         Returns:
             str: Referencia de la celda principal o None si no está en un rango combinado
         """
-        # Extraer columna y fila de la referencia de celda
         try:
-            col_letter = ''.join(filter(str.isalpha, cell_ref))
-            row = int(''.join(filter(str.isdigit, cell_ref)))
-            col = column_index_from_string(col_letter)
+            anchor = self.merged_anchors.get(coordinate_to_tuple(cell_ref))
         except (ValueError, TypeError) as e:
             logger.error(f"Error parsing cell reference {cell_ref}: {str(e)}")
             return None
-            
-        # Buscar si la celda está en algún rango combinado
-        for merged_range in self.ws.merged_cells.ranges:
-            if (merged_range.min_col <= col <= merged_range.max_col and 
-                merged_range.min_row <= row <= merged_range.max_row):
-                # Calcular la celda principal (top-left) de la combinación
-                min_col_letter = get_column_letter(merged_range.min_col)
-                main_cell = f"{min_col_letter}{merged_range.min_row}"
-                logger.debug(f"Cell {cell_ref} is in merged range {str(merged_range)}, main cell is {main_cell}")
-                return main_cell
-                
-        # Si llegamos aquí, la celda no está en un rango combinado
-        return None
+        if anchor is None:
+            return None
+        return f"{get_column_letter(anchor[1])}{anchor[0]}"
     
     def safe_write_cell(self, cell_ref, value):
         """
@@ -233,13 +84,10 @@ class ExcelQuoteGenerator:
             value: Valor a escribir en la celda
         """
         try:
-            # Verificar si la celda está en un rango combinado
-            main_cell = self.find_main_cell_in_merged_range(cell_ref)
-            target_cell = main_cell if main_cell else cell_ref
-            
-            # Escribir el valor
-            self.ws[target_cell] = value
-            logger.debug(f"Successfully wrote value to cell {target_cell}")
+            # Si la celda está en un rango combinado se escribe en su celda principal
+            position = coordinate_to_tuple(cell_ref)
+            row, column = self.merged_anchors.get(position, position)
+            self.ws.cell(row=row, column=column).value = value
             return True
         except Exception as e:
             logger.error(f"Error writing to cell {cell_ref}: {str(e)}")
@@ -249,136 +97,75 @@ class ExcelQuoteGenerator:
         """Rellena la información del encabezado en la plantilla Excel."""
         logger.info("Filling header information")
         
-        # Número de cotización y fechas
-        current_date = datetime.now()
-        # Calcular fecha de validez (30 días después de la fecha actual)
-        valid_date = current_date + timedelta(days=30)
-        quote_number = f"AR{current_date.strftime('%d%m%Y%H%M')}"
-        
-        # Escribe las fechas y número de cotización
-        self.safe_write_cell(self.cell_refs['date'], current_date.strftime('%m/%d/%Y'))
-        self.safe_write_cell(self.cell_refs['valid_until'], valid_date.strftime('%m/%d/%Y'))
-        self.safe_write_cell(self.cell_refs['quote_number'], quote_number)
-        self.safe_write_cell(self.cell_refs['revision'], '1')
-        
-        # Información del cliente
-        self.safe_write_cell(self.cell_refs['company_name'], self.company.name)
-        self.safe_write_cell(self.cell_refs['contact_name'], self.company.contact_name)
-        self.safe_write_cell(self.cell_refs['contact_email'], self.company.contact_email)
-        
-        # Proyecto
-        if 'project_name' in self.project_data:
-            self.safe_write_cell(self.cell_refs['project_name'], self.project_data['project_name'])
-        
-        # Aplicar formato a las cabeceras de la tabla
-        self._format_table_headers()
+        # Número de cotización, fechas, información del cliente y proyecto
+        values = header_values(self.company, self.project_data, self.issued_at or datetime.now())
+        for key, value in values.items():
+            self.safe_write_cell(self.cell_refs[key], value)
 
-    def _format_table_headers(self):
-        """Aplica formato a las cabeceras de la tabla"""
-        header_row = self.cell_refs['table_header_row']
-        
-        # Definir las columnas a formatear basado en si es interno o no
-        if self.is_internal:
-            columns_to_format = ['B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K']
-        else:
-            columns_to_format = ['B', 'C', 'D', 'E']  # Columnas ajustadas después de eliminar D-H, J
-            
-            # Para la versión del cliente, configurar encabezados específicos
-            try:
-                # Establecer encabezado QTY
-                qty_cell = f'D{header_row}'
-                self.ws[qty_cell].value = "QTY"
-                logger.info(f"Set header cell {qty_cell} value to 'QTY'")
-                
-                # Cambiar el encabezado de la columna E para que sea "Total Proyecto" en lugar de mostrar subtotales
-                total_cell = f'E{header_row}'
-                self.ws[total_cell].value = "TOTAL PROYECTO"
-                logger.info(f"Set header cell {total_cell} value to 'TOTAL PROYECTO'")
-            except Exception as e:
-                logger.warning(f"Failed to set client headers: {str(e)}")
-        
-        for col in columns_to_format:
-            cell_ref = f'{col}{header_row}'
-            try:
-                cell = self.ws[cell_ref]
-                # Aplicar estilos solo si la celda existe y tiene un valor
-                if cell.value:
-                    cell.font = self.header_style['font']
-                    cell.fill = self.header_style['fill']
-                    cell.border = self.header_style['border']
-                    cell.alignment = self.header_style['alignment']
-                    logger.debug(f"Applied formatting to header cell {cell_ref}")
-            except Exception as e:
-                logger.warning(f"Failed to format header cell {cell_ref}: {str(e)}")
 
     def _add_components(self):
         """Añade los componentes a la tabla del Excel."""
         logger.info("Adding components to table")
         
-        # Define la fila inicial donde insertar componentes
-        start_row = self.cell_refs['table_start_row']
-        
         # Calcular costes para cada componente
         costs_data, total_volume, total_weight, total_cost = self.calculate_component_costs()
         
+        # Si los componentes no caben antes de los términos se insertan filas y los
+        # términos (con sus celdas combinadas, alturas e imágenes) bajan
+        layout = plan_table(self.cell_refs, len(costs_data))
+        if layout.inserted_rows:
+            self.merged_anchors = insert_sheet_rows(
+                self.ws, self.cell_refs['terms_row'], layout.inserted_rows, self.merged_anchors
+            )
+            self.cell_refs['terms_row'] = layout.terms_row
+        apply_pagination(self.ws, layout)
+        
         # Tanto para uso interno como para cliente, mostrar todos los componentes
         # pero con diferentes niveles de detalle
-        self._add_detailed_components(costs_data, start_row)
-        total_row = start_row + len(costs_data) + 1
+        self._add_detailed_components(costs_data, layout.start_row)
         
         # Añadir fila de totales
-        self._add_total_row(total_row, total_volume, total_weight, total_cost)
+        self._add_total_row(layout.total_row, total_volume, total_weight, total_cost)
+
+    def _component_values(self, item):
+        """Valores de la fila de un componente por letra de columna."""
+        return component_cells(item, self.is_internal)
+
+    def _total_values(self, total_volume, total_weight, total_cost):
+        """Valores de la fila de totales por letra de columna."""
+        return total_cells(total_volume, total_weight, total_cost, self.is_internal)
+
+    def _table_columns(self):
+        return table_columns(self.is_internal)
+
+    def _total_row_style(self):
+        return {
+            'font': Font(bold=True),
+            'fill': PatternFill(start_color="D9D9D9", end_color="D9D9D9", fill_type="solid"),
+            'border': self.thin_border
+        }
 
     def _add_detailed_components(self, costs_data, start_row):
         """Añade los componentes detallados"""
         for i, item in enumerate(costs_data):
             row = start_row + i
-            
-            if self.is_internal:
-                # Información completa para uso interno
-                self.safe_write_cell(f'B{row}', item['component'])
-                self.safe_write_cell(f'C{row}', item['material'])
-                self.safe_write_cell(f'D{row}', f"{item['volume']:.2f} in³")
-                self.safe_write_cell(f'E{row}', f"{item['weight']:.2f} lbs")
-                self.safe_write_cell(f'F{row}', f"${item['price_per_pound']:.2f}/lb")
-                self.safe_write_cell(f'I{row}', item['quantity'])
-                self.safe_write_cell(f'J{row}', f"${item['unit_cost']:.2f}")
-                self.safe_write_cell(f'K{row}', f"${item['subtotal']:.2f}")
-            else:
-                # Información simplificada para cliente (con columnas ya eliminadas)
-                # No mostramos el costo por ítem, solo componente, material y cantidad
-                self.safe_write_cell(f'B{row}', item['component'])
-                self.safe_write_cell(f'C{row}', item['material'])
-                self.safe_write_cell(f'D{row}', item['quantity'])
-                # Dejamos la columna E vacía para los ítems individuales
+            for col, value in self._component_values(item).items():
+                self.safe_write_cell(f'{col}{row}', value)
             
             # Aplicar bordes a todas las celdas de la fila
             self._apply_borders_to_row(row)
 
     def _add_total_row(self, row, total_volume, total_weight, total_cost):
         """Añade la fila de totales"""
-        self.safe_write_cell(f'B{row}', "TOTAL")
-        
-        if self.is_internal:
-            # Vista interna completa
-            self.safe_write_cell(f'D{row}', f"{total_volume:.2f} in³")
-            self.safe_write_cell(f'E{row}', f"{total_weight:.2f} lbs")
-            self.safe_write_cell(f'K{row}', f"${total_cost:.2f}")
-        else:
-            # Para el cliente, solo mostrar el total del proyecto (con columnas ya eliminadas)
-            self.safe_write_cell(f'E{row}', f"${total_cost:.2f}")
+        for col, value in self._total_values(total_volume, total_weight, total_cost).items():
+            self.safe_write_cell(f'{col}{row}', value)
         
         # Aplicar formato a la fila de totales
         self._apply_total_row_format(row)
 
     def _apply_borders_to_row(self, row):
         """Aplica bordes a todas las celdas de una fila"""
-        if self.is_internal:
-            columns_to_format = ['B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K']
-        else:
-            columns_to_format = ['B', 'C', 'D', 'E']  # Columnas ajustadas después de eliminar D-H, J
-            
-        for col in columns_to_format:
+        for col in self._table_columns():
             try:
                 cell = self.ws[f'{col}{row}']
                 cell.border = self.thin_border
@@ -387,114 +174,44 @@ class ExcelQuoteGenerator:
 
     def _apply_total_row_format(self, row):
         """Aplica formato a la fila de totales"""
-        if self.is_internal:
-            columns_to_format = ['B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K']
-        else:
-            columns_to_format = ['B', 'C', 'D', 'E']  # Columnas ajustadas después de eliminar D-H, J
-            
-        for col in columns_to_format:
+        style = self._total_row_style()
+        for col in self._table_columns():
             try:
                 cell = self.ws[f'{col}{row}']
-                cell.font = Font(bold=True)
-                cell.fill = PatternFill(start_color="D9D9D9", end_color="D9D9D9", fill_type="solid")
-                cell.border = self.thin_border
+                for attribute, value in style.items():
+                    setattr(cell, attribute, value)
             except Exception as e:
                 logger.debug(f"Failed to format total row cell {col}{row}: {str(e)}")
 
-    def calculate_component_costs(self):
-        """Calculate costs for all components considering material weight, quantity and price per pound."""
-        logger.info("Calculating component costs")
-        costs_data = []
-        total_volume = 0
-        total_weight = 0
-        total_cost = 0
+    def _priced_quote(self):
+        """Resultado con precios del proyecto (el compartido o calculado una vez aquí); None si faltan datos."""
+        if self.priced is not None:
+            return self.priced
 
         # Verificar que los datos necesarios estén presentes
         required_keys = ['components', 'materials', 'quantities', 'volumes']
         for key in required_keys:
             if key not in self.project_data or not self.project_data[key]:
                 logger.error(f"Missing required data: {key}")
-                return [], 0, 0, 0
-                
-        # Verificar que las listas tengan la misma longitud
-        list_lengths = [len(self.project_data[key]) for key in required_keys]
-        if len(set(list_lengths)) > 1:
-            logger.error(f"Mismatched data lengths: {list_lengths}")
-            return [], 0, 0, 0
+                return None
 
-        for comp, mat_id, qty, vol in zip(
-            self.project_data['components'],
-            self.project_data['materials'],
-            self.project_data['quantities'],
-            self.project_data['volumes']
-        ):
-            try:
-                # Convert values to appropriate types
-                volume = float(vol)
-                quantity = int(qty)
-                mat_id = int(mat_id)
-                
-                if mat_id not in self.material_prices:
-                    logger.warning(f"No price found for material ID {mat_id} in company {self.company.name}")
-                    continue
-                    
-                material_data = self.material_prices[mat_id]
-                
-                # Calculate weight using material density
-                weight = volume * material_data['density']  # Weight per unit in pounds
-                
-                # Calculate costs
-                unit_cost = weight * material_data['price_per_lb']  # Cost for one unit
-                subtotal = unit_cost * quantity  # Cost for all units of this component
-                
-                # Apply finish multiplier if specified
-                finish_multiplier = self._get_finish_multiplier()
-                subtotal *= finish_multiplier
-                
-                # Update totals
-                total_volume += volume * quantity
-                total_weight += weight * quantity
-                total_cost += subtotal
-                
-                costs_data.append({
-                    'component': comp,
-                    'material': material_data['name'],
-                    'quantity': quantity,
-                    'volume': volume,
-                    'weight': weight,
-                    'unit_cost': unit_cost,
-                    'subtotal': subtotal,
-                    'price_per_pound': material_data['price_per_lb'],
-                    'finish_multiplier': finish_multiplier
-                })
-                
-                logger.debug(f"Processed component: {comp}, material: {material_data['name']}, cost: ${subtotal:.2f}")
-                
-            except (ValueError, TypeError) as e:
-                logger.error(f"Error processing component {comp}: {str(e)}")
-                continue
-        
-        logger.info(f"Total cost calculation: ${total_cost:.2f}")
-        return costs_data, total_volume, total_weight, total_cost
+        try:
+            self.priced = price_project(self.project_data, self.price_snapshot)
+        except ValueError as e:
+            logger.error(str(e))
+            return None
+        return self.priced
 
-    def _get_finish_multiplier(self):
-        """Obtiene el multiplicador de acabado si está especificado"""
-        finish_name = self.project_data.get('project_finish')
-        finish_multiplier = 1.0
-        
-        if finish_name:
-            try:
-                finish_price = CompanyFinishPrice.objects.get(
-                    company=self.company,
-                    finish__name=finish_name,
-                    is_active=True
-                )
-                finish_multiplier = float(finish_price.price_multiplier)
-                logger.info(f"Applied finish multiplier {finish_multiplier} for {finish_name}")
-            except CompanyFinishPrice.DoesNotExist:
-                logger.warning(f"No finish price found for {finish_name} in company {self.company.name}")
-        
-        return finish_multiplier
+    def calculate_component_costs(self):
+        """Calculate costs for all components considering material weight, quantity and price per pound."""
+        logger.info("Calculating component costs")
+
+        priced = self._priced_quote()
+        if priced is None:
+            return [], 0, 0, 0
+
+        logger.info(f"Total cost calculation: ${priced.total_cost:.2f}")
+        return priced.costs_data(), priced.total_volume, priced.total_weight, priced.total_cost
 
     def _add_terms_and_delivery(self):
         """Añade información de términos y entrega en la parte inferior del Excel."""
@@ -502,20 +219,56 @@ class ExcelQuoteGenerator:
         
         terms_row = self.cell_refs['terms_row']
         
-        # Términos estándar (se pueden personalizar según necesidades)
-        self.safe_write_cell(f'C{terms_row}', "6 weeks or advise required")  # Entrega
-        self.safe_write_cell(f'C{terms_row+1}', "Net 15 after shipping")  # Términos de pago
-        self.safe_write_cell(f'C{terms_row+2}', "Fob Grupo ARGA Plant at Chihuahua")  # Incoterms
+        # Términos estándar (se pueden personalizar según necesidades en quote_document)
+        for offset, value in enumerate(QUOTE_TERMS):
+            self.safe_write_cell(f'C{terms_row + offset}', value)
+
+    def _generate_streaming_excel(self, priced):
+        """
+        Genera el Excel en modo de solo escritura para listas de materiales muy grandes.
+        
+        El encabezado y los términos se rellenan en la plantilla y se copian al libro
+        de salida; los componentes se escriben fila a fila sin guardarse en memoria.
+        """
+        logger.info(f"Streaming Excel quote with {len(priced)} components")
+        
+        self._fill_header_info()
+        # Los términos se escriben en su fila de la plantilla y se copian después del total
+        self._add_terms_and_delivery()
+        
+        layout = plan_table(self.cell_refs, len(priced))
+        writer = StreamingSheetWriter(self.ws)
+        writer.copy_rows(1, layout.start_row - 1)
+        
+        columns = self._table_columns()
+        line_style = writer.cell_style(border=self.thin_border)
+        for item in priced.iter_lines():
+            writer.append(self._component_values(item), columns, line_style)
+        
+        writer.skip_to(layout.total_row)
+        writer.append(
+            self._total_values(priced.total_volume, priced.total_weight, priced.total_cost),
+            columns,
+            writer.cell_style(**self._total_row_style())
+        )
         
-        # Notas adicionales
-        notes = "We can provide logistic service Door to Door including customs clerance. To be quoted base on needs and weight."
-        self.safe_write_cell(f'C{terms_row+3}', notes)
+        writer.skip_to(layout.terms_row)
+        writer.copy_rows(self.cell_refs['terms_row'])
+        writer.paginate(layout)
+        
+        logger.info("Excel quote generated successfully")
+        return writer.save()
 
     def generate_excel(self):
         """Genera el archivo Excel con todos los datos de la cotización."""
         logger.info("Generating Excel quote")
         
         try:
+            # Listas de materiales muy grandes: escritura en streaming con memoria constante
+            priced = self._priced_quote()
+            if priced is not None and len(priced) >= streaming_min_lines():
+                return self._generate_streaming_excel(priced)
+            
             # Paso 1: Rellenar la información del encabezado
             self._fill_header_info()
             
@@ -0,0 +1,263 @@
+import copyreg
+import logging
+import os
+import pickle
+import threading
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from django.conf import settings
+from openpyxl import load_workbook
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from openpyxl.utils import column_index_from_string, get_column_letter
+from openpyxl.workbook import Workbook
+from openpyxl.worksheet.dimensions import DimensionHolder
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Celdas de la plantilla que rellena ExcelQuoteGenerator (los números son filas)
+TEMPLATE_CELL_REFS = {
+    'date': 'J4',
+    'valid_until': 'J5',
+    'quote_number': 'J6',
+    'revision': 'J7',
+    'project_name': 'C6',
+    'company_name': 'C7',
+    'contact_name': 'C8',
+    'contact_email': 'C9',
+    'table_header_row': 11,
+    'table_start_row': 12,
+    'terms_row': 34
+}
+
+# Columnas que no ve el cliente: D a H y J (de derecha a izquierda para evitar problemas de índices)
+INTERNAL_COLUMNS = ['J', 'H', 'G', 'F', 'E', 'D']
+
+_thin_side = Side(style='thin')
+HEADER_STYLE = {
+    'font': Font(bold=True),
+    'fill': PatternFill(start_color="E0E0E0", end_color="E0E0E0", fill_type="solid"),
+    'border': Border(left=_thin_side, right=_thin_side, top=_thin_side, bottom=_thin_side),
+    'alignment': Alignment(horizontal='center', vertical='center')
+}
+
+
+def _restore_dimension_holder(worksheet, reference, default_factory):
+    return DimensionHolder(worksheet, reference, default_factory)
+
+
+def _reduce_dimension_holder(holder):
+    # defaultdict.__reduce__ pasa default_factory como primer argumento (worksheet) y el
+    # clon queda sin default_factory; se reconstruye con los argumentos correctos
+    return (
+        _restore_dimension_holder,
+        (holder.worksheet, holder.reference, holder.default_factory),
+        dict(holder.__dict__),
+        None,
+        iter(dict.items(holder))
+    )
+
+
+copyreg.pickle(DimensionHolder, _reduce_dimension_holder)
+
+
+def template_path() -> str:
+    return getattr(
+        settings,
+        'QUOTE_EXCEL_TEMPLATE',
+        os.path.join(settings.STATIC_ROOT, 'templates', 'quote_template.xlsx')
+    )
+
+
+def validate_template(workbook: Workbook) -> List[str]:
+    """Checks the reference cells of the template; returns the problems found (also logged)."""
+    ws = workbook.active
+    problems = []
+    if not ws.dimensions:
+        logger.warning("No se pudo determinar las dimensiones de la hoja")
+        return problems
+
+    logger.info(f"Sheet dimensions: {ws.dimensions}")
+    logger.debug(f"Merged cells found: {[str(merged_range) for merged_range in ws.merged_cells.ranges]}")
+
+    for name, ref in TEMPLATE_CELL_REFS.items():
+        if isinstance(ref, int):
+            if ref > ws.max_row:
+                problems.append(f"Row '{name}' ({ref}) is beyond the last template row ({ws.max_row})")
+            continue
+        try:
+            logger.debug(f"Reference '{name}' at {ref}: {ws[ref].value}")
+        except (KeyError, AttributeError, ValueError):
+            problems.append(f"Reference '{name}' at {ref} not found in template")
+
+    for problem in problems:
+        logger.warning(problem)
+    return problems
+
+
+def remove_internal_columns(ws, cell_refs: Dict) -> Dict:
+    """
+    Turns the template into the customer variant: deletes the internal
+    columns and returns the cell references shifted accordingly.
+    """
+    logger.info("Removing internal columns for client version")
+    header_row = cell_refs['table_header_row']
+
+    # Primero, desunir (unmerge) las celdas combinadas de la fila de encabezados que cruzan
+    # columnas que vamos a eliminar (por ejemplo D11 (QTY), que está mergeada hasta H11)
+    merged_ranges_to_unmerge = [
+        str(merged_range) for merged_range in ws.merged_cells.ranges
+        if merged_range.min_row == header_row and merged_range.max_row == header_row and (
+            merged_range.min_col <= column_index_from_string('D') <= merged_range.max_col or
+            merged_range.min_col <= column_index_from_string('H') <= merged_range.max_col
+        )
+    ]
+    for merged_range in merged_ranges_to_unmerge:
+        ws.unmerge_cells(merged_range)
+        logger.info(f"Unmerged cells in range: {merged_range}")
+
+    column_shift_mapping = {}
+    for col in INTERNAL_COLUMNS:
+        col_idx = column_index_from_string(col)
+        ws.delete_cols(col_idx)
+        # Desplazamiento de las columnas a la derecha de la eliminada
+        for i in range(col_idx, 27):
+            column_shift_mapping[get_column_letter(i + 1)] = get_column_letter(i)
+
+    updated_refs = {}
+    for key, cell_ref in cell_refs.items():
+        if isinstance(cell_ref, str):
+            col_letter = ''.join(filter(str.isalpha, cell_ref))
+            row_num = ''.join(filter(str.isdigit, cell_ref))
+            updated_refs[key] = f"{column_shift_mapping.get(col_letter, col_letter)}{row_num}"
+        else:
+            updated_refs[key] = cell_ref
+    logger.info(f"Customer cell references: {updated_refs}")
+    return updated_refs
+
+
+def format_table_headers(ws, cell_refs: Dict, internal: bool) -> None:
+    """Header labels and style of the components table for one variant."""
+    header_row = cell_refs['table_header_row']
+    if internal:
+        columns_to_format = ['B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K']
+    else:
+        columns_to_format = ['B', 'C', 'D', 'E']  # Columnas ajustadas después de eliminar D-H, J
+        ws[f'D{header_row}'].value = "QTY"
+        # La columna E muestra el total del proyecto en lugar de subtotales
+        ws[f'E{header_row}'].value = "TOTAL PROYECTO"
+
+    for col in columns_to_format:
+        cell = ws[f'{col}{header_row}']
+        # Aplicar estilos solo si la celda tiene un valor
+        if cell.value:
+            cell.font = HEADER_STYLE['font']
+            cell.fill = HEADER_STYLE['fill']
+            cell.border = HEADER_STYLE['border']
+            cell.alignment = HEADER_STYLE['alignment']
+
+
+def merged_anchor_index(ws) -> Mapping[Tuple[int, int], Tuple[int, int]]:
+    """(row, col) of every cell covered by a merged range -> (row, col) of the range's top-left cell."""
+    index = {}
+    for merged_range in ws.merged_cells.ranges:
+        anchor = (merged_range.min_row, merged_range.min_col)
+        for row in range(merged_range.min_row, merged_range.max_row + 1):
+            for col in range(merged_range.min_col, merged_range.max_col + 1):
+                index[(row, col)] = anchor
+    return MappingProxyType(index)
+
+
+class ExcelTemplate:
+    """
+    quote_template.xlsx parsed once per process, prepared as two variants.
+
+    The internal variant is the template with its table headers formatted;
+    the customer variant also has the internal columns deleted and its own
+    shifted cell references. Each variant carries the merged-cell anchor
+    index of its own layout (built after the column deletion), shared
+    read-only by every quote. Both are kept pickled; clone() unpickles an
+    independent copy for every quote, an order of magnitude cheaper than parsing the
+    file again. (copy.deepcopy cannot be used: it rebuilds openpyxl's style
+    IndexedLists empty, which breaks saving.) The file's mtime and size are
+    checked on each clone; when they change the template is parsed and
+    validated again, so a new template is picked up without a restart.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._workbook: Optional[Workbook] = None
+        self._variants: Dict[bool, Tuple[bytes, Dict, Mapping]] = {}
+        self._signature = None
+        self.problems: List[str] = []
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            logger.error(f"Template file not found at {self.path}")
+            raise FileNotFoundError(f"Excel template not found: {self.path}")
+        return stat.st_mtime_ns, stat.st_size
+
+    def workbook(self) -> Workbook:
+        """Parsed template, reloaded if the file changed. Must not be modified: use clone()."""
+        signature = self._file_signature()
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    workbook = load_workbook(self.path)
+                    self.problems = validate_template(workbook)
+                    self._variants = self._build_variants(workbook)
+                    self._workbook, self._signature = workbook, signature
+                    logger.info(f"Template loaded successfully: {self.path}")
+        return self._workbook
+
+    @staticmethod
+    def _build_variants(workbook: Workbook) -> Dict[bool, Tuple[bytes, Dict, Mapping]]:
+        pickled = pickle.dumps(workbook, pickle.HIGHEST_PROTOCOL)
+        variants = {}
+        for internal in (True, False):
+            variant = pickle.loads(pickled)
+            cell_refs = dict(TEMPLATE_CELL_REFS)
+            if not internal:
+                cell_refs = remove_internal_columns(variant.active, cell_refs)
+            format_table_headers(variant.active, cell_refs, internal)
+            variants[internal] = (
+                pickle.dumps(variant, pickle.HIGHEST_PROTOCOL),
+                cell_refs,
+                merged_anchor_index(variant.active)
+            )
+        return variants
+
+    def clone(self, internal: bool = True) -> Tuple[Workbook, Dict, Mapping]:
+        """
+        Independent copy of a template variant for one quote, with its cell
+        references and its (shared, read-only) merged-cell anchor index.
+        """
+        self.workbook()
+        pickled, cell_refs, merged_anchors = self._variants[internal]
+        return pickle.loads(pickled), dict(cell_refs), merged_anchors
+
+
+_template: Optional[ExcelTemplate] = None
+_template_lock = threading.Lock()
+
+
+def get_excel_template() -> ExcelTemplate:
+    """Process-wide template cache (created on first use)."""
+    global _template
+    path = template_path()
+    with _template_lock:
+        if _template is None or _template.path != path:
+            _template = ExcelTemplate(path)
+        return _template
+
+
+def preload_excel_template() -> None:
+    """Parses and validates the template at startup; a missing template is only logged here."""
+    try:
+        get_excel_template().workbook()
+    except Exception as e:
+        logger.error(f"Could not preload Excel quote template: {str(e)}")
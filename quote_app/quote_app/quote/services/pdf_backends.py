@@ -0,0 +1,437 @@
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+from django.conf import settings
+
+from utils.office_pool import OfficeConversionError, OfficePool, claim_profile_slot, office_command
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Peso de la última medición en la latencia media (media móvil exponencial)
+LATENCY_ALPHA = 0.3
+
+_office_pool = None
+_office_pool_lock = threading.Lock()
+
+
+# Tipos de documento de origen: sólo el libro Excel, o la cotización calculada (con su libro)
+SOURCE_WORKBOOK = 'workbook'
+SOURCE_QUOTE = 'quote'
+
+
+class PDFBackendError(Exception):
+    """A PDF backend could not convert a document."""
+
+
+@dataclass(frozen=True)
+class PDFSource:
+    """
+    A quote to be turned into a PDF: its workbook and, when the priced quote
+    is at hand, a callable that draws the PDF directly (native backend).
+    """
+    excel: bytes
+    render: Optional[Callable[[], bytes]] = None
+
+    @property
+    def kind(self) -> str:
+        return SOURCE_QUOTE if self.render is not None else SOURCE_WORKBOOK
+
+
+def _office_binary() -> str:
+    return getattr(settings, 'PDF_CONVERSION_OFFICE_BINARY', 'libreoffice')
+
+
+def _profile_dir() -> str:
+    return getattr(
+        settings, 'PDF_CONVERSION_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'quote_office_profiles')
+    )
+
+
+def get_office_pool() -> Optional[OfficePool]:
+    """
+    Returns the process-wide pool of warm LibreOffice listeners, or None to
+    start LibreOffice for every conversion (pool disabled or python3-uno missing).
+    """
+    global _office_pool
+
+    size = getattr(settings, 'PDF_CONVERSION_POOL_SIZE', 0)
+    if not size:
+        return None
+
+    with _office_pool_lock:
+        if _office_pool is None:
+            if not OfficePool.is_supported():
+                logger.warning("python3-uno not available, LibreOffice is started for every PDF conversion")
+                _office_pool = False
+            else:
+                _office_pool = OfficePool(
+                    size=size,
+                    binary=_office_binary(),
+                    profile_dir=_profile_dir(),
+                    job_timeout=getattr(settings, 'PDF_CONVERSION_TIMEOUT', 60),
+                    start_timeout=getattr(settings, 'PDF_CONVERSION_START_TIMEOUT', 30),
+                    health_interval=getattr(settings, 'PDF_CONVERSION_HEALTH_INTERVAL', 30),
+                    max_jobs_per_process=getattr(settings, 'PDF_CONVERSION_MAX_JOBS_PER_PROCESS', 200),
+                )
+        return _office_pool or None
+
+
+def convert_with_subprocess(excel_bytes: bytes) -> Optional[bytes]:
+    """Starts LibreOffice for this conversion only, on a profile no other conversion is using."""
+    try:
+        # Create temporary directory to work in
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Write Excel content to temp file
+            temp_excel_path = os.path.join(temp_dir, 'temp_quote.xlsx')
+            with open(temp_excel_path, 'wb') as f:
+                f.write(excel_bytes)
+            
+            logger.info(f"Excel file saved to temporary location: {temp_excel_path}")
+            
+            # Convert to PDF using LibreOffice
+            logger.info("Starting LibreOffice conversion process")
+            try:
+                # Perfil propio: las conversiones simultáneas no comparten (ni bloquean) el perfil
+                with claim_profile_slot(_profile_dir()) as slot_dir:
+                    # Set a timeout to prevent hanging
+                    result = subprocess.run(office_command(
+                        _office_binary(), slot_dir,
+                        '--convert-to', 'pdf',
+                        '--outdir', temp_dir,
+                        temp_excel_path
+                    ), check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
+                
+                logger.info(f"LibreOffice conversion output: {result.stdout.decode('utf-8', errors='ignore')}")
+            except subprocess.CalledProcessError as e:
+                logger.error(f"LibreOffice conversion failed: {str(e)}")
+                if e.stderr:
+                    logger.error(f"Error output: {e.stderr.decode('utf-8', errors='ignore')}")
+                return None
+            except subprocess.TimeoutExpired:
+                logger.error("LibreOffice conversion timed out after 60 seconds")
+                return None
+            
+            # Check if PDF was created
+            expected_pdf_path = os.path.join(temp_dir, 'temp_quote.pdf')
+            if not os.path.exists(expected_pdf_path):
+                logger.error(f"PDF file not found at expected location: {expected_pdf_path}")
+                # Try with different name pattern
+                pdf_files = [f for f in os.listdir(temp_dir) if f.endswith('.pdf')]
+                if pdf_files:
+                    expected_pdf_path = os.path.join(temp_dir, pdf_files[0])
+                    logger.info(f"Found PDF with different name: {expected_pdf_path}")
+                else:
+                    logger.error("No PDF files found in output directory")
+                    return None
+            
+            # Read PDF content
+            with open(expected_pdf_path, 'rb') as f:
+                pdf_content = f.read()
+            
+            logger.info(f"Successfully converted Excel to PDF, size: {len(pdf_content)} bytes")
+            return pdf_content
+            
+    except Exception as e:
+        logger.error(f"Error during PDF conversion: {str(e)}")
+        logger.error("Stacktrace:", exc_info=True)
+        return None
+
+
+class PDFBackend:
+    """
+    A way of turning a quote (PDFSource) into a PDF.
+
+    probe() tells whether the backend can run on this machine; it is called
+    by the registry at start-up and on every background refresh, never per
+    request, so it must be cheap (no subprocesses). source_kinds are the
+    kinds of PDFSource it can handle. convert() raises PDFBackendError when
+    the document could not be converted.
+    """
+    name = ''
+    # Latencia supuesta (ms) hasta tener mediciones reales
+    expected_ms = 1000.0
+    # Los conversores del libro Excel también sirven para una cotización (se convierte su libro)
+    source_kinds = frozenset({SOURCE_WORKBOOK, SOURCE_QUOTE})
+
+    def probe(self) -> bool:
+        raise NotImplementedError
+
+    def accepts(self, source: PDFSource) -> bool:
+        return source.kind in self.source_kinds
+
+    def convert(self, source: PDFSource) -> bytes:
+        raise NotImplementedError
+
+
+class NativePDFBackend(PDFBackend):
+    """Draws the PDF with ReportLab from the priced quote (pdf_renderer), no workbook conversion."""
+    name = 'native'
+    expected_ms = 50.0
+    source_kinds = frozenset({SOURCE_QUOTE})
+
+    def probe(self) -> bool:
+        # ReportLab es una dependencia del proyecto: siempre disponible
+        return True
+
+    def convert(self, source: PDFSource) -> bytes:
+        if source.render is None:
+            raise PDFBackendError("No priced quote to render the PDF from")
+        return source.render()
+
+
+class OfficePoolBackend(PDFBackend):
+    """Warm LibreOffice listeners driven over UNO (utils.office_pool)."""
+    name = 'office_pool'
+    expected_ms = 500.0
+
+    def probe(self) -> bool:
+        return (
+            platform.system().lower() == 'linux'
+            and bool(getattr(settings, 'PDF_CONVERSION_POOL_SIZE', 0))
+            and OfficePool.is_supported()
+            and shutil.which(_office_binary()) is not None
+        )
+
+    def convert(self, source: PDFSource) -> bytes:
+        pool = get_office_pool()
+        if pool is None:
+            raise PDFBackendError("LibreOffice pool is disabled")
+        # Espera máxima: tiempo de conversión más el de una conversión en cola
+        timeout = 2 * getattr(settings, 'PDF_CONVERSION_TIMEOUT', 60)
+        try:
+            return pool.convert(source.excel, timeout=timeout)
+        except FuturesTimeoutError:
+            raise PDFBackendError(f"PDF conversion not finished after {timeout} seconds") from None
+        except OfficeConversionError as e:
+            raise PDFBackendError(str(e)) from e
+
+
+class OfficeSubprocessBackend(PDFBackend):
+    """One `libreoffice --convert-to pdf` process per document."""
+    name = 'office_subprocess'
+    expected_ms = 5000.0
+
+    def probe(self) -> bool:
+        return platform.system().lower() == 'linux' and shutil.which(_office_binary()) is not None
+
+    def convert(self, source: PDFSource) -> bytes:
+        pdf = convert_with_subprocess(source.excel)
+        if pdf is None:
+            raise PDFBackendError("LibreOffice conversion failed")
+        return pdf
+
+
+# Backends disponibles por nombre (setting PDF_BACKENDS)
+BACKEND_CLASSES = {
+    NativePDFBackend.name: NativePDFBackend,
+    OfficePoolBackend.name: OfficePoolBackend,
+    OfficeSubprocessBackend.name: OfficeSubprocessBackend,
+}
+
+
+@dataclass
+class BackendStats:
+    available: bool = False
+    latency_ms: Optional[float] = None  # media móvil exponencial de las conversiones correctas
+    conversions: int = 0
+    failures: int = 0  # fallos consecutivos
+    retry_at: float = 0.0  # time.monotonic() a partir del cual se vuelve a probar un backend caído
+
+
+class PDFBackendRegistry:
+    """
+    PDF backends with their availability, measured latency and health.
+
+    Availability comes from probe(), run when the registry is created and
+    then every `refresh_interval` seconds in a background thread, so checking
+    for PDF support costs nothing per request. Each conversion goes to the
+    fastest healthy backend (exponentially weighted latency of its past
+    conversions, `expected_ms` before the first one) and falls through to
+    the next one when it fails. A backend that fails `failure_threshold`
+    times in a row is left out for `retry_after` seconds and then tried again.
+    """
+
+    def __init__(self, backends: Sequence[PDFBackend], refresh_interval: float = 300,
+                 failure_threshold: int = 3, retry_after: float = 60):
+        self.backends = list(backends)
+        self.refresh_interval = refresh_interval
+        self.failure_threshold = failure_threshold
+        self.retry_after = retry_after
+        self._stats: Dict[str, BackendStats] = {backend.name: BackendStats() for backend in self.backends}
+        self._lock = threading.Lock()
+        self._refresher: Optional[threading.Thread] = None
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Probes every backend again."""
+        for backend in self.backends:
+            try:
+                available = bool(backend.probe())
+            except Exception as e:
+                logger.error(f"Error probing PDF backend {backend.name}: {str(e)}")
+                available = False
+            with self._lock:
+                stats = self._stats[backend.name]
+                if stats.available != available:
+                    logger.info(f"PDF backend {backend.name} {'available' if available else 'not available'}")
+                stats.available = available
+
+    def _refresh_loop(self) -> None:
+        while True:
+            time.sleep(self.refresh_interval)
+            self.refresh()
+
+    def start_refresher(self) -> None:
+        with self._lock:
+            if self._refresher is None and self.refresh_interval:
+                self._refresher = threading.Thread(target=self._refresh_loop, name='pdf-backend-refresh', daemon=True)
+                self._refresher.start()
+
+    def is_available(self, kind: Optional[str] = None) -> bool:
+        """Whether some backend can run here, and handle sources of `kind` when given (SOURCE_*)."""
+        self.start_refresher()
+        with self._lock:
+            return any(
+                self._stats[backend.name].available and (kind is None or kind in backend.source_kinds)
+                for backend in self.backends
+            )
+
+    def candidates(self) -> List[PDFBackend]:
+        """Available backends in the order they are tried: healthy first, fastest first."""
+        now = time.monotonic()
+        with self._lock:
+            def key(backend):
+                stats = self._stats[backend.name]
+                resting = stats.failures >= self.failure_threshold and now < stats.retry_at
+                latency = stats.latency_ms if stats.latency_ms is not None else backend.expected_ms
+                return (resting, latency)
+            available = [backend for backend in self.backends if self._stats[backend.name].available]
+        return sorted(available, key=key)
+
+    def _record(self, backend: PDFBackend, elapsed_ms: Optional[float]) -> None:
+        with self._lock:
+            stats = self._stats[backend.name]
+            if elapsed_ms is None:
+                stats.failures += 1
+                if stats.failures >= self.failure_threshold:
+                    stats.retry_at = time.monotonic() + self.retry_after
+                    logger.warning(
+                        f"PDF backend {backend.name} failed {stats.failures} times in a row, "
+                        f"retrying it in {self.retry_after} s"
+                    )
+                return
+            stats.failures = 0
+            stats.conversions += 1
+            if stats.latency_ms is None:
+                stats.latency_ms = elapsed_ms
+            else:
+                stats.latency_ms = LATENCY_ALPHA * elapsed_ms + (1 - LATENCY_ALPHA) * stats.latency_ms
+
+    def convert(self, source: Union[PDFSource, bytes]) -> Optional[bytes]:
+        """
+        PDF of the quote (a PDFSource, or just the workbook bytes) from the first
+        backend that succeeds, or None if all of them fail.
+        """
+        self.start_refresher()
+        if not isinstance(source, PDFSource):
+            source = PDFSource(excel=source)
+        for backend in self.candidates():
+            # Un backend que no admite este documento no cuenta como fallo
+            if not backend.accepts(source):
+                continue
+            started = time.monotonic()
+            try:
+                pdf = backend.convert(source)
+            except Exception as e:
+                logger.error(f"PDF backend {backend.name} failed: {str(e)}")
+                self._record(backend, None)
+                continue
+            elapsed_ms = (time.monotonic() - started) * 1000
+            self._record(backend, elapsed_ms)
+            logger.info(f"PDF generated by {backend.name} in {elapsed_ms:.0f} ms")
+            return pdf
+        logger.error("No PDF backend could convert the document")
+        return None
+
+    def convert_many(self, sources: Sequence[Union[PDFSource, bytes]]) -> List[Optional[bytes]]:
+        """Converts several quotes concurrently; one PDF (or None) per quote, in order."""
+        if len(sources) <= 1:
+            return [self.convert(source) for source in sources]
+        with ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix='pdf-convert') as executor:
+            return list(executor.map(self.convert, sources))
+
+    def status(self) -> Dict[str, Dict]:
+        """Availability, latency and failures of each backend (for logs and diagnostics)."""
+        with self._lock:
+            return {
+                name: {
+                    'available': stats.available,
+                    'latency_ms': None if stats.latency_ms is None else round(stats.latency_ms),
+                    'conversions': stats.conversions,
+                    'failures': stats.failures
+                }
+                for name, stats in self._stats.items()
+            }
+
+
+_registry: Optional[PDFBackendRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_pdf_backends() -> PDFBackendRegistry:
+    """Process-wide backend registry (created, and probed, on first use)."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            names = getattr(settings, 'PDF_BACKENDS', list(BACKEND_CLASSES))
+            backends = []
+            for name in names:
+                if name not in BACKEND_CLASSES:
+                    logger.error(f"Unknown PDF backend '{name}' in PDF_BACKENDS")
+                    continue
+                backends.append(BACKEND_CLASSES[name]())
+            _registry = PDFBackendRegistry(
+                backends,
+                refresh_interval=getattr(settings, 'PDF_BACKEND_REFRESH_INTERVAL', 300),
+                failure_threshold=getattr(settings, 'PDF_BACKEND_FAILURE_THRESHOLD', 3),
+                retry_after=getattr(settings, 'PDF_BACKEND_RETRY_AFTER', 60),
+            )
+            logger.info(f"PDF backends: {_registry.status()}")
+        return _registry
+
+
+def preload_pdf_backends() -> None:
+    """Probes the PDF backends at startup; the background refresh starts with the first request."""
+    try:
+        get_pdf_backends()
+    except Exception as e:
+        logger.error(f"Could not probe PDF backends: {str(e)}")
+
+
+def preload_office_pool() -> None:
+    """
+    Starts the LibreOffice listeners at startup in a background thread, so
+    the first conversions find them warm without delaying the server start.
+    """
+    pool = get_office_pool()
+    if pool is None:
+        return
+
+    def warm():
+        try:
+            pool.warm(timeout=getattr(settings, 'PDF_CONVERSION_WARM_TIMEOUT', 60))
+        except Exception as e:
+            logger.error(f"Could not warm the office pool: {str(e)}")
+
+    threading.Thread(target=warm, name='office-pool-warm', daemon=True).start()
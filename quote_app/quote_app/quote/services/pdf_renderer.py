@@ -0,0 +1,317 @@
+import io
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from openpyxl.utils import column_index_from_string, get_column_letter
+from openpyxl.utils.cell import coordinate_to_tuple
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+from reportlab.lib.pagesizes import landscape, letter
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import Image, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from .excel_template import HEADER_STYLE, get_excel_template
+from .pricing_engine import PricedQuote
+from .quote_document import QUOTE_TERMS, component_cells, header_values, table_columns, total_cells
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Medidas de Excel: ancho de columna en caracteres (7 px cada uno más 5 px de margen), px = 0.75 pt
+DEFAULT_COLUMN_WIDTH = 8.43
+DEFAULT_FONT_SIZE = 11
+PAGE_MARGIN = 0.4 * inch
+FRAME_PADDING = 6  # relleno por defecto de los Frame de ReportLab
+
+TOTAL_ROW_FILL = colors.HexColor('#D9D9D9')
+_ALIGNMENTS = {'left': TA_LEFT, 'right': TA_RIGHT, 'center': TA_CENTER}
+
+# Variante de la plantilla leída una vez por carga: internal -> (workbook de origen, datos)
+_variants: Dict[bool, Tuple[object, Tuple]] = {}
+_variants_lock = threading.Lock()
+
+
+def _column_points(width: Optional[float]) -> float:
+    return ((width or DEFAULT_COLUMN_WIDTH) * 7 + 5) * 0.75
+
+
+def _variant(internal: bool):
+    """
+    Sheet, cell references and images of a template variant, read once per
+    template load (never modified; the renderer only reads from it).
+    """
+    template = get_excel_template()
+    source = template.workbook()
+    with _variants_lock:
+        cached = _variants.get(internal)
+        if cached is None or cached[0] is not source:
+            workbook, cell_refs, merged_anchors = template.clone(internal)
+            ws = workbook.active
+            images = [
+                (image._data(), image.anchor._from.row + 1, image.anchor._from.col + 1, image.width, image.height)
+                for image in ws._images
+            ]
+            cached = (source, (ws, cell_refs, merged_anchors, images))
+            _variants[internal] = cached
+    return cached[1]
+
+
+class QuotePDFRenderer:
+    """
+    Customer or internal quote PDF drawn with ReportLab straight from the
+    priced result, laid out like quote_template.xlsx.
+
+    The header and terms blocks are read from the same template variant the
+    Excel generator fills (labels, fonts, alignment, merged cells, column
+    widths and images) and the table rows use the same cell values
+    (quote_document), so both documents match without converting the
+    workbook. The sheet is scaled like the template's print setup and
+    shrunk further if it does not fit the page width; the components table
+    repeats its header row on every page.
+    """
+
+    def __init__(self, company, project_data: Mapping, priced: PricedQuote,
+                 issued_at: Optional[datetime] = None, is_internal: bool = False):
+        self.company = company
+        self.project_data = project_data
+        self.priced = priced
+        self.issued_at = issued_at or datetime.now()
+        self.is_internal = is_internal
+
+    def _filled_values(self, cell_refs, merged_anchors) -> Dict[Tuple[int, int], object]:
+        """(row, col) -> value the Excel generator writes, at the top-left cell of merged ranges."""
+        values = {}
+        for key, value in header_values(self.company, self.project_data, self.issued_at).items():
+            position = coordinate_to_tuple(cell_refs[key])
+            values[merged_anchors.get(position, position)] = value
+        for offset, value in enumerate(QUOTE_TERMS):
+            position = (cell_refs['terms_row'] + offset, column_index_from_string('C'))
+            values[merged_anchors.get(position, position)] = value
+        return values
+
+    def _paragraph(self, text: str, cell, scale: float) -> Paragraph:
+        bold = cell is not None and cell.font.b
+        size = ((cell.font.sz if cell is not None else None) or DEFAULT_FONT_SIZE) * scale
+        alignment = _ALIGNMENTS.get(cell.alignment.horizontal if cell is not None else None, TA_LEFT)
+        style = ParagraphStyle(
+            'cell', fontName='Helvetica-Bold' if bold else 'Helvetica',
+            fontSize=size, leading=size * 1.2, alignment=alignment
+        )
+        return Paragraph(text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;'), style)
+
+    def _region_table(self, ws, rows: List[int], columns: List[int], widths: List[float],
+                      values: Dict[Tuple[int, int], object], scale: float) -> Table:
+        """Rows of the template sheet (header or terms block) as a table on the sheet's column grid."""
+        data = []
+        heights = []
+        commands = [
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 2),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 2),
+            ('TOPPADDING', (0, 0), (-1, -1), 1),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 1),
+        ]
+        for r, row in enumerate(rows):
+            data_row = []
+            for c, column in enumerate(columns):
+                cell = ws._cells.get((row, column))
+                value = values.get((row, column), cell.value if cell is not None else None)
+                data_row.append('' if value is None else self._paragraph(str(value), cell, scale))
+            data.append(data_row)
+            dimension = ws.row_dimensions.get(row)
+            heights.append(dimension.height * scale if dimension is not None and dimension.height else None)
+
+        first_row, last_row = rows[0], rows[-1]
+        first_col, last_col = columns[0], columns[-1]
+        for merged_range in ws.merged_cells.ranges:
+            if (merged_range.min_row >= first_row and merged_range.max_row <= last_row and
+                    merged_range.min_col >= first_col and merged_range.max_col <= last_col):
+                commands.append((
+                    'SPAN',
+                    (merged_range.min_col - first_col, merged_range.min_row - first_row),
+                    (merged_range.max_col - first_col, merged_range.max_row - first_row)
+                ))
+
+        table = Table(data, colWidths=widths, rowHeights=heights, hAlign='LEFT')
+        table.setStyle(TableStyle(commands))
+        return table
+
+    def _components_tables(self, ws, header_row: int, columns: List[int], widths: List[float], scale: float,
+                           first_page_space: float, page_space: float) -> List:
+        """
+        Header row, one row per component, a blank row and the total row, cut
+        into one table per page, each starting with the header row.
+
+        Rows have a fixed height (one line of text), so the rows that fit on
+        each page are known in advance; a single table split by ReportLab
+        page by page would re-measure every remaining row on each split.
+        """
+        first_col = columns[0]
+        last_table_col = max(column_index_from_string(col) for col in table_columns(self.is_internal)) - first_col
+        font_size = DEFAULT_FONT_SIZE * scale
+        row_height = font_size * 1.2 + 4
+
+        base_commands = [
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), font_size),
+            ('LEADING', (0, 0), (-1, -1), font_size * 1.2),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 2),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 2),
+            ('TOPPADDING', (0, 0), (-1, -1), 1),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 1),
+        ]
+        header = []
+        header_fill = colors.HexColor('#' + HEADER_STYLE['fill'].fgColor.rgb[-6:])
+        for c, column in enumerate(columns):
+            cell = ws._cells.get((header_row, column))
+            value = cell.value if cell is not None else None
+            header.append('' if value is None else str(value))
+            if value:
+                base_commands += [
+                    ('BACKGROUND', (c, 0), (c, 0), header_fill),
+                    ('FONTNAME', (c, 0), (c, 0), 'Helvetica-Bold'),
+                    ('ALIGN', (c, 0), (c, 0), 'CENTER')
+                ]
+        for merged_range in ws.merged_cells.ranges:
+            if merged_range.min_row == header_row == merged_range.max_row and merged_range.min_col >= first_col:
+                base_commands.append(
+                    ('SPAN', (merged_range.min_col - first_col, 0), (merged_range.max_col - first_col, 0))
+                )
+        base_commands.append(('GRID', (0, 0), (last_table_col, 0), 0.5, colors.black))
+
+        def row_from(cells):
+            row = [''] * len(columns)
+            for col, value in cells.items():
+                row[column_index_from_string(col) - first_col] = '' if value is None else str(value)
+            return row
+
+        rows = [row_from(component_cells(item, self.is_internal)) for item in self.priced.iter_lines()]
+        lines = len(rows)
+        rows.append([''] * len(columns))
+        rows.append(row_from(total_cells(
+            self.priced.total_volume, self.priced.total_weight, self.priced.total_cost, self.is_internal
+        )))
+        total = len(rows) - 1
+
+        # Filas por página: menos la del encabezado y una de margen; sin sitio en la primera, empieza en la siguiente
+        per_page = max(1, int(page_space // row_height) - 2)
+        first_page = int(first_page_space // row_height) - 2
+        flowables = []
+        if first_page < 1:
+            flowables.append(PageBreak())
+            first_page = per_page
+
+        start = 0
+        while start < len(rows):
+            end = min(len(rows), start + (first_page if start == 0 else per_page))
+            commands = list(base_commands)
+            # Filas del tramo: la 0 es el encabezado, la fila i de rows es la i - start + 1
+            if start < lines:
+                commands.append(('GRID', (0, 1), (last_table_col, min(end, lines) - start), 0.5, colors.black))
+            if start <= total < end:
+                row = total - start + 1
+                commands += [
+                    ('GRID', (0, row), (last_table_col, row), 0.5, colors.black),
+                    ('BACKGROUND', (0, row), (last_table_col, row), TOTAL_ROW_FILL),
+                    ('FONTNAME', (0, row), (last_table_col, row), 'Helvetica-Bold'),
+                ]
+            table = Table(
+                [header] + rows[start:end], colWidths=widths, rowHeights=row_height,
+                repeatRows=1, hAlign='LEFT'
+            )
+            table.setStyle(TableStyle(commands))
+            flowables.append(table)
+            if end < len(rows):
+                flowables.append(PageBreak())
+            start = end
+        return flowables
+
+    @staticmethod
+    def _image(data: bytes, column: int, columns: List[int], widths: List[float],
+               width_px: float, height_px: float, scale: float):
+        """Template image at its anchor column on the sheet grid."""
+        image = Image(io.BytesIO(data), width=width_px * 0.75 * scale, height=height_px * 0.75 * scale)
+        offset = sum(width for col, width in zip(columns, widths) if col < column)
+        available = sum(widths)
+        if image.drawWidth > available:
+            ratio = available / image.drawWidth
+            image.drawWidth, image.drawHeight = image.drawWidth * ratio, image.drawHeight * ratio
+        offset = min(offset, available - image.drawWidth)
+        if offset <= 0:
+            image.hAlign = 'LEFT'
+            return image
+        holder = Table([['', image]], colWidths=[offset, image.drawWidth], hAlign='LEFT')
+        holder.setStyle(TableStyle([('LEFTPADDING', (0, 0), (-1, -1), 0), ('RIGHTPADDING', (0, 0), (-1, -1), 0)]))
+        return holder
+
+    def render(self) -> bytes:
+        """The quote PDF."""
+        ws, cell_refs, merged_anchors, images = _variant(self.is_internal)
+        header_row = cell_refs['table_header_row']
+        terms_row = cell_refs['terms_row']
+        values = self._filled_values(cell_refs, merged_anchors)
+
+        # Columnas de la hoja desde B (A es el margen de la plantilla) hasta la última con contenido
+        first_col = column_index_from_string('B')
+        last_col = max(
+            [column_index_from_string(col) for col in table_columns(self.is_internal)] +
+            [column for (_, column), value in values.items() if value is not None] +
+            [column for (row, column), cell in ws._cells.items()
+             if cell.value is not None and (row < header_row or row >= terms_row)]
+        )
+        columns = list(range(first_col, last_col + 1))
+        widths = [
+            _column_points(ws.column_dimensions[letter].width if letter in ws.column_dimensions else None)
+            for letter in map(get_column_letter, columns)
+        ]
+
+        page_size = landscape(letter) if ws.page_setup.orientation == 'landscape' else letter
+        # Área útil: márgenes de la página y el relleno del marco de SimpleDocTemplate
+        frame_width = page_size[0] - 2 * PAGE_MARGIN - 2 * FRAME_PADDING
+        frame_height = page_size[1] - 2 * PAGE_MARGIN - 2 * FRAME_PADDING
+        scale = min((ws.page_setup.scale or 100) / 100, frame_width / sum(widths))
+        widths = [width * scale for width in widths]
+
+        header_rows = [
+            row for row in range(1, header_row)
+            if any(ws._cells.get((row, column)) is not None and ws._cells[(row, column)].value is not None
+                   for column in columns) or any((row, column) in values for column in columns)
+        ]
+        header_rows = list(range(header_rows[0], header_row)) if header_rows else []
+        terms_rows = list(range(terms_row, max(ws.max_row, terms_row + len(QUOTE_TERMS) - 1) + 1))
+
+        flowables = []
+        for data, row, column, width_px, height_px in images:
+            if row < header_row:
+                flowables.append(self._image(data, column, columns, widths, width_px, height_px, scale))
+        if header_rows:
+            flowables.append(self._region_table(ws, header_rows, columns, widths, values, scale))
+        used = sum(flowable.wrap(frame_width, frame_height)[1] for flowable in flowables)
+        flowables.extend(self._components_tables(
+            ws, header_row, columns, widths, scale, frame_height - used, frame_height
+        ))
+        flowables.append(Spacer(1, 12 * scale))
+        flowables.append(self._region_table(ws, terms_rows, columns, widths, values, scale))
+        for data, row, column, width_px, height_px in images:
+            if row >= terms_row:
+                flowables.append(Spacer(1, 12 * scale))
+                flowables.append(self._image(data, column, columns, widths, width_px, height_px, scale))
+
+        buffer = io.BytesIO()
+        quote_number = header_values(self.company, self.project_data, self.issued_at)['quote_number']
+        doc = SimpleDocTemplate(
+            buffer,
+            pagesize=page_size,
+            leftMargin=PAGE_MARGIN,
+            rightMargin=PAGE_MARGIN,
+            topMargin=PAGE_MARGIN,
+            bottomMargin=PAGE_MARGIN,
+            title=f"Quote {quote_number}"
+        )
+        doc.build(flowables)
+        logger.info(f"{'Internal' if self.is_internal else 'Customer'} quote PDF rendered ({len(self.priced)} components)")
+        return buffer.getvalue()
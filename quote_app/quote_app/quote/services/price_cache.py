@@ -0,0 +1,84 @@
+import logging
+import threading
+import uuid
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, caches
+
+from .pricing_engine import PriceSnapshot
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Copia en memoria del proceso: company_id -> (versión, snapshot)
+_local_snapshots: Dict[int, Tuple[str, PriceSnapshot]] = {}
+_lock = threading.Lock()
+
+
+def _cache():
+    alias = getattr(settings, 'PRICE_CACHE_ALIAS', 'default')
+    try:
+        return caches[alias]
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def _version_key(company_id) -> str:
+    return f'price_snapshot:version:{company_id}'
+
+
+def _snapshot_key(company_id, version: str) -> str:
+    return f'price_snapshot:{company_id}:{version}'
+
+
+def _current_version(cache, company_id) -> str:
+    """Version token of a company's prices; created on first use (or after eviction)."""
+    version = cache.get(_version_key(company_id))
+    if version is None:
+        cache.add(_version_key(company_id), uuid.uuid4().hex, None)
+        version = cache.get(_version_key(company_id))
+    return version
+
+
+def get_price_snapshot(company, finish_name: Optional[str] = None) -> PriceSnapshot:
+    """
+    Price snapshot of a company with the finish applied, without touching the
+    database when warm.
+
+    The shared cache (PRICE_CACHE_ALIAS, visible to every worker) keeps the
+    snapshot under the company's current version token; each process also
+    keeps the last snapshot it used and only compares tokens. Price changes
+    replace the token (see quote.signals), so stale snapshots are never read.
+    """
+    cache = _cache()
+    version = _current_version(cache, company.pk)
+
+    with _lock:
+        local = _local_snapshots.get(company.pk)
+    if local is not None and local[0] == version:
+        snapshot = local[1]
+    else:
+        snapshot = cache.get(_snapshot_key(company.pk, version))
+        if snapshot is None:
+            snapshot = PriceSnapshot.from_company(company)
+            cache.set(
+                _snapshot_key(company.pk, version),
+                snapshot,
+                getattr(settings, 'PRICE_SNAPSHOT_CACHE_TIMEOUT', 24 * 60 * 60)
+            )
+            logger.debug(f"Price snapshot for company {company.pk} cached as version {version}")
+        with _lock:
+            _local_snapshots[company.pk] = (version, snapshot)
+
+    return snapshot.with_finish(finish_name)
+
+
+def invalidate_company_prices(*company_ids) -> None:
+    """Gives the companies a new version token; their cached snapshots are no longer used."""
+    cache = _cache()
+    for company_id in set(company_ids):
+        cache.set(_version_key(company_id), uuid.uuid4().hex, None)
+        with _lock:
+            _local_snapshots.pop(company_id, None)
+        logger.info(f"Price snapshot of company {company_id} invalidated")
@@ -0,0 +1,270 @@
+import logging
+from dataclasses import dataclass, field, replace
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..models import CompanyFinishPrice, CompanyMaterialPrice
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Multiplicadores de acabado en centésimas (price_multiplier tiene 2 decimales)
+MULTIPLIER_SCALE = 100
+
+# Decimales de centavo (micro-centavos) que se conservan antes de redondear al centavo
+ROUNDING_DECIMALS = 6
+
+
+def _to_cents(amount) -> int:
+    """Decimal/str/float amount to integer cents, rounded half up."""
+    return int((Decimal(str(amount)) * 100).quantize(Decimal('1'), rounding='ROUND_HALF_UP'))
+
+
+@dataclass(frozen=True)
+class PriceSnapshot:
+    """
+    Company prices at one point in time, as arrays sorted by material id.
+
+    Prices are integer cents per lb and finish multipliers integer
+    hundredths, so they are exact; only the per-line amounts are rounded. The
+    snapshot holds the multipliers of every finish of the company;
+    with_finish() selects the one a quote uses.
+    """
+    material_ids: np.ndarray
+    densities: np.ndarray
+    price_cents_per_lb: np.ndarray
+    material_names: np.ndarray
+    finish_multipliers: Dict[str, int] = field(default_factory=dict)
+    finish_name: Optional[str] = None
+    finish_multiplier: int = MULTIPLIER_SCALE
+
+    @classmethod
+    def from_company(cls, company, finish_name: Optional[str] = None) -> 'PriceSnapshot':
+        """Active material and finish prices of a company, one query each."""
+        prices = sorted(
+            CompanyMaterialPrice.objects.filter(company=company, is_active=True).select_related('material'),
+            key=lambda price: price.material_id
+        )
+        finish_multipliers = {
+            name: _to_cents(multiplier)
+            for name, multiplier in CompanyFinishPrice.objects.filter(
+                company=company,
+                is_active=True
+            ).values_list('finish__name', 'price_multiplier')
+        }
+
+        logger.info(f"Loaded {len(prices)} material prices for company {company.name}")
+        snapshot = cls(
+            material_ids=np.array([price.material_id for price in prices], dtype=np.int64),
+            densities=np.array([price.material.density for price in prices], dtype=np.float64),
+            price_cents_per_lb=np.array([_to_cents(price.price_per_lb) for price in prices], dtype=np.int64),
+            material_names=np.array(
+                [price.material.name or price.material.get_material_type_display() for price in prices],
+                dtype=object
+            ),
+            finish_multipliers=finish_multipliers,
+        )
+        return snapshot.with_finish(finish_name) if finish_name else snapshot
+
+    def with_finish(self, finish_name: Optional[str]) -> 'PriceSnapshot':
+        """Same prices with the multiplier of a finish applied (1.0 when it has no active price)."""
+        multiplier = MULTIPLIER_SCALE
+        if finish_name:
+            if finish_name in self.finish_multipliers:
+                multiplier = self.finish_multipliers[finish_name]
+                logger.info(f"Applied finish multiplier {multiplier / MULTIPLIER_SCALE} for {finish_name}")
+            else:
+                logger.warning(f"No finish price found for {finish_name}")
+        return replace(self, finish_name=finish_name, finish_multiplier=multiplier)
+
+    @classmethod
+    def empty(cls) -> 'PriceSnapshot':
+        """Snapshot without prices: every component is skipped."""
+        return cls(
+            material_ids=np.zeros(0, dtype=np.int64),
+            densities=np.zeros(0, dtype=np.float64),
+            price_cents_per_lb=np.zeros(0, dtype=np.int64),
+            material_names=np.zeros(0, dtype=object),
+        )
+
+    def lookup(self, material_ids: np.ndarray) -> np.ndarray:
+        """Index into the snapshot arrays for every material id, -1 where the company has no price."""
+        if not len(self.material_ids):
+            return np.full(len(material_ids), -1, dtype=np.int64)
+        index = np.searchsorted(self.material_ids, material_ids)
+        index = np.minimum(index, len(self.material_ids) - 1)
+        return np.where(self.material_ids[index] == material_ids, index, -1)
+
+
+@dataclass(frozen=True)
+class PricedQuote:
+    """
+    Priced BOM lines (only the rows that could be priced) and their totals.
+    Immutable: the arrays are read-only, so one result can be shared by every
+    document rendered from it.
+    """
+    components: np.ndarray
+    material_names: np.ndarray
+    quantities: np.ndarray
+    volumes: np.ndarray
+    weights: np.ndarray
+    price_cents_per_lb: np.ndarray
+    unit_cents: np.ndarray
+    subtotal_cents: np.ndarray
+    finish_multiplier: int = MULTIPLIER_SCALE
+    skipped: Tuple[str, ...] = ()
+
+    def __post_init__(self):
+        for array in (self.components, self.material_names, self.quantities, self.volumes, self.weights,
+                      self.price_cents_per_lb, self.unit_cents, self.subtotal_cents):
+            array.flags.writeable = False
+
+    def __len__(self) -> int:
+        return len(self.components)
+
+    @property
+    def total_volume(self) -> float:
+        return float(np.dot(self.volumes, self.quantities))
+
+    @property
+    def total_weight(self) -> float:
+        return float(np.dot(self.weights, self.quantities))
+
+    @property
+    def total_cents(self) -> int:
+        return int(self.subtotal_cents.sum())
+
+    @property
+    def total_cost(self) -> float:
+        return self.total_cents / 100
+
+    def costs_data(self) -> List[Dict]:
+        """Line items as dicts with the keys the quote generators have always used."""
+        return list(self.iter_lines())
+
+    def iter_lines(self) -> Iterator[Dict]:
+        """Same dicts as costs_data(), built one at a time (streaming Excel writer)."""
+        multiplier = self.finish_multiplier / MULTIPLIER_SCALE
+        return (
+            {
+                'component': component,
+                'material': material,
+                'quantity': quantity,
+                'volume': volume,
+                'weight': weight,
+                'unit_cost': unit_cents / 100,
+                'subtotal': subtotal_cents / 100,
+                'price_per_pound': price_cents / 100,
+                'finish_multiplier': multiplier
+            }
+            for component, material, quantity, volume, weight, price_cents, unit_cents, subtotal_cents in zip(
+                self.components.tolist(),
+                self.material_names.tolist(),
+                self.quantities.tolist(),
+                self.volumes.tolist(),
+                self.weights.tolist(),
+                self.price_cents_per_lb.tolist(),
+                self.unit_cents.tolist(),
+                self.subtotal_cents.tolist()
+            )
+        )
+
+
+def _parse_column(values: Sequence, dtype) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parses a form column in one call; only when that fails (a malformed
+    entry) falls back to per-row parsing. Returns the values and a mask of
+    the rows that parsed.
+    """
+    try:
+        return np.asarray(values, dtype=dtype), np.ones(len(values), dtype=bool)
+    except (ValueError, TypeError):
+        parsed = np.zeros(len(values), dtype=dtype)
+        valid = np.zeros(len(values), dtype=bool)
+        for row, value in enumerate(values):
+            try:
+                parsed[row] = float(value) if dtype is np.float64 else int(value)
+                valid[row] = True
+            except (ValueError, TypeError):
+                pass
+        return parsed, valid
+
+
+def _round_half_up(cents: np.ndarray) -> np.ndarray:
+    """
+    Float cents to integer cents, half up like _to_cents. Amounts are first
+    snapped to micro-cents so float noise does not push a decimal tie (x.5)
+    down (np.rint would also round ties to even).
+    """
+    return np.floor(np.round(cents, ROUNDING_DECIMALS) + 0.5).astype(np.int64)
+
+
+def price_components(components: Sequence[str], material_ids: Sequence, quantities: Sequence,
+                     volumes: Sequence, snapshot: PriceSnapshot) -> PricedQuote:
+    """
+    Prices a BOM against a snapshot without a Python loop per row.
+
+    weight = volume × density; subtotal = weight × price/lb × quantity ×
+    finish multiplier, rounded half up to the cent once per line (the unit
+    cost keeps its sub-cent precision until then, as the per-line formula of
+    the original generators did). The unit cost is also rounded to the cent,
+    for display only. The total is the exact sum of the subtotals, so it
+    always matches the lines shown on the quote. Rows with unparseable values
+    or a material the company has no price for are skipped.
+    """
+    lengths = {len(components), len(material_ids), len(quantities), len(volumes)}
+    if len(lengths) > 1:
+        raise ValueError(f"Mismatched data lengths: {[len(components), len(material_ids), len(quantities), len(volumes)]}")
+
+    components = np.asarray(components, dtype=object)
+    volumes, valid_volumes = _parse_column(volumes, np.float64)
+    quantities, valid_quantities = _parse_column(quantities, np.int64)
+    material_ids, valid_materials = _parse_column(material_ids, np.int64)
+    index = snapshot.lookup(material_ids)
+
+    valid = valid_volumes & valid_quantities & valid_materials
+    priced = valid & (index >= 0)
+    skipped = tuple(components[~priced].tolist())
+    for component, material_id in zip(components[valid & (index < 0)], material_ids[valid & (index < 0)]):
+        logger.warning(f"No price found for material ID {material_id}, skipping component {component}")
+    for component in components[~valid]:
+        logger.error(f"Error processing component {component}: invalid volume, quantity or material")
+
+    index = index[priced]
+    volumes = volumes[priced]
+    quantities = quantities[priced]
+    weights = volumes * snapshot.densities[index]
+    price_cents = snapshot.price_cents_per_lb[index]
+    # Costo unitario sin redondear: el subtotal se calcula a partir de él y el
+    # costo unitario en centavos solo se usa para mostrarlo
+    exact_unit_cents = weights * price_cents
+    unit_cents = _round_half_up(exact_unit_cents)
+    subtotal_cents = _round_half_up(exact_unit_cents * quantities * snapshot.finish_multiplier / MULTIPLIER_SCALE)
+
+    quote = PricedQuote(
+        components=components[priced],
+        material_names=snapshot.material_names[index],
+        quantities=quantities,
+        volumes=volumes,
+        weights=weights,
+        price_cents_per_lb=price_cents,
+        unit_cents=unit_cents,
+        subtotal_cents=subtotal_cents,
+        finish_multiplier=snapshot.finish_multiplier,
+        skipped=skipped,
+    )
+    logger.info(f"Priced {len(quote)} components ({len(skipped)} skipped), total ${quote.total_cost:.2f}")
+    return quote
+
+
+def price_project(project_data: dict, snapshot: PriceSnapshot) -> PricedQuote:
+    """Prices the component lists of a quote form (components/materials/quantities/volumes)."""
+    return price_components(
+        project_data.get('components') or [],
+        project_data.get('materials') or [],
+        project_data.get('quantities') or [],
+        project_data.get('volumes') or [],
+        snapshot
+    )
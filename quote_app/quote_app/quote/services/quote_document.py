@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Mapping
+
+# Días de validez de una cotización
+VALIDITY_DAYS = 30
+
+# Valores de la sección de términos, en el orden de sus filas a partir de terms_row
+# (las etiquetas Delivery / Payment Terms / Incoterms / Notes están en la plantilla)
+QUOTE_TERMS = (
+    "6 weeks or advise required",  # Entrega
+    "Net 15 after shipping",  # Términos de pago
+    "Fob Grupo ARGA Plant at Chihuahua",  # Incoterms
+    # Notas adicionales
+    "We can provide logistic service Door to Door including customs clerance. To be quoted base on needs and weight.",
+)
+
+
+def header_values(company, project_data: Mapping, issued_at: datetime) -> Dict[str, object]:
+    """
+    Values of the quote header, keyed like TEMPLATE_CELL_REFS. Shared by the
+    Excel workbook and the native PDF so both show the same quote number and dates.
+    """
+    # Calcular fecha de validez (30 días después de la fecha de emisión)
+    valid_date = issued_at + timedelta(days=VALIDITY_DAYS)
+    values = {
+        'date': issued_at.strftime('%m/%d/%Y'),
+        'valid_until': valid_date.strftime('%m/%d/%Y'),
+        'quote_number': f"AR{issued_at.strftime('%d%m%Y%H%M')}",
+        'revision': '1',
+        'company_name': company.name,
+        'contact_name': company.contact_name,
+        'contact_email': company.contact_email,
+    }
+    if 'project_name' in project_data:
+        values['project_name'] = project_data['project_name']
+    return values
+
+
+def table_columns(internal: bool) -> List[str]:
+    """Columns of the components table in each template variant."""
+    if internal:
+        return ['B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K']
+    return ['B', 'C', 'D', 'E']  # Columnas ajustadas después de eliminar D-H, J
+
+
+def component_cells(item: Mapping, internal: bool) -> Dict[str, object]:
+    """Cells of one component row by column letter."""
+    if internal:
+        # Información completa para uso interno
+        return {
+            'B': item['component'],
+            'C': item['material'],
+            'D': f"{item['volume']:.2f} in³",
+            'E': f"{item['weight']:.2f} lbs",
+            'F': f"${item['price_per_pound']:.2f}/lb",
+            'I': item['quantity'],
+            'J': f"${item['unit_cost']:.2f}",
+            'K': f"${item['subtotal']:.2f}"
+        }
+    # Información simplificada para cliente (con columnas ya eliminadas)
+    # No mostramos el costo por ítem, solo componente, material y cantidad;
+    # la columna E queda vacía para los ítems individuales
+    return {
+        'B': item['component'],
+        'C': item['material'],
+        'D': item['quantity']
+    }
+
+
+def total_cells(total_volume: float, total_weight: float, total_cost: float, internal: bool) -> Dict[str, object]:
+    """Cells of the total row by column letter."""
+    if internal:
+        # Vista interna completa
+        return {
+            'B': "TOTAL",
+            'D': f"{total_volume:.2f} in³",
+            'E': f"{total_weight:.2f} lbs",
+            'K': f"${total_cost:.2f}"
+        }
+    # Para el cliente, solo mostrar el total del proyecto (con columnas ya eliminadas)
+    return {'B': "TOTAL", 'E': f"${total_cost:.2f}"}
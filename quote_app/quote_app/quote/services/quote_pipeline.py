@@ -0,0 +1,90 @@
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from types import MappingProxyType
+from typing import Mapping
+
+from .excel_quote_generator import ExcelQuoteGenerator
+from .pdf_renderer import QuotePDFRenderer
+from .price_cache import get_price_snapshot
+from .pricing_engine import PricedQuote, price_project
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+REQUIRED_LISTS = ('components', 'materials', 'quantities', 'volumes')
+
+
+class QuoteInputError(ValueError):
+    """The quote form data is incomplete or inconsistent."""
+
+
+def project_data_from_request(post) -> dict:
+    """Collects the quote form fields (QueryDict) into the project_data dict the generators use."""
+    return {
+        'project_name': post.get('project_name', 'New Project'),
+        'project_finish': post.get('project_finish'),
+        'components': post.getlist('components[]'),
+        'materials': post.getlist('materials[]'),
+        'quantities': post.getlist('quantities[]'),
+        'volumes': post.getlist('volumes[]')
+    }
+
+
+def validate_project_data(project_data: Mapping) -> None:
+    """Raises QuoteInputError when a component list is missing or the lists differ in length."""
+    if not all(project_data.get(key) for key in REQUIRED_LISTS):
+        raise QuoteInputError('Missing required form data')
+    lengths = [len(project_data[key]) for key in REQUIRED_LISTS]
+    if len(set(lengths)) > 1:
+        raise QuoteInputError(f'Mismatched data lengths: {lengths}')
+
+
+@dataclass(frozen=True)
+class QuoteBuild:
+    """Both documents of a quote and the priced result they were rendered from."""
+    company: object
+    project_data: Mapping
+    priced: PricedQuote
+    issued_at: datetime
+    customer_excel: bytes
+    internal_excel: bytes
+
+    def render_pdf(self, internal: bool) -> bytes:
+        """Customer or internal PDF drawn from the same priced result and issue date as the workbooks."""
+        return QuotePDFRenderer(
+            self.company, self.project_data, self.priced, issued_at=self.issued_at, is_internal=internal
+        ).render()
+
+
+def build_quote(user, project_data: Mapping) -> QuoteBuild:
+    """
+    Validates the form data and prices it once, then renders the customer and
+    internal workbooks from that same immutable result and issue date. The
+    two variants only differ in columns and detail level, so no query or cost
+    calculation is repeated between them.
+    """
+    validate_project_data(project_data)
+    project_data = MappingProxyType(dict(project_data))
+    issued_at = datetime.now()
+
+    snapshot = get_price_snapshot(user.company, project_data.get('project_finish'))
+    priced = price_project(project_data, snapshot)
+
+    logger.info("Generating Excel for customer...")
+    customer_excel = ExcelQuoteGenerator(
+        user, project_data, is_internal=False, priced=priced, issued_at=issued_at
+    ).generate_excel()
+    logger.info("Generating internal Excel...")
+    internal_excel = ExcelQuoteGenerator(
+        user, project_data, is_internal=True, priced=priced, issued_at=issued_at
+    ).generate_excel()
+
+    return QuoteBuild(
+        company=user.company,
+        project_data=project_data,
+        priced=priced,
+        issued_at=issued_at,
+        customer_excel=customer_excel,
+        internal_excel=internal_excel,
+    )
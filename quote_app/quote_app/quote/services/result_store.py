@@ -0,0 +1,260 @@
+import fnmatch
+import logging
+import re
+from collections import defaultdict
+from datetime import timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Sum
+from django.utils import timezone
+
+from utils.component_table import NOT_SPECIFIED, ComponentTable
+
+from ..models import AnalysisComponent, AnalysisJob, AnalysisResult
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# The session only keeps the id of the result being quoted
+SESSION_KEY = 'analysis_result_id'
+
+# Component names per UPDATE ... WHERE name IN (...), below the SQLite parameter limit
+UPDATE_BATCH_SIZE = 500
+
+
+def store_result(user, table: ComponentTable, job=None, original_name: str = '') -> AnalysisResult:
+    """Saves an analysis table as an AnalysisResult with one row per component."""
+    with transaction.atomic():
+        result = AnalysisResult.objects.create(
+            user=user,
+            job=job,
+            original_name=original_name,
+            material_totals={
+                label: [float(volume), int(count)]
+                for label, volume, count in zip(table.material_labels, table.material_volumes, table.material_counts)
+                if count
+            },
+            densities=table.densities,
+        )
+        materials = table.materials
+        statuses = table.mesh_statuses
+        AnalysisComponent.objects.bulk_create([
+            AnalysisComponent(
+                result=result,
+                position=index,
+                name=table.names[index],
+                volume=float(table.volumes[index]),
+                material=materials[index],
+                vertices=int(table.vertices[index]),
+                faces=int(table.faces[index]),
+                quantity=int(table.quantities[index]),
+                mesh_status=statuses[index] or '',
+                volume_error=None if table.volume_errors[index] != table.volume_errors[index] else float(table.volume_errors[index]),
+            )
+            for index in range(len(table))
+        ], batch_size=500)
+    logger.info(f"Stored analysis result {result.id} ({len(table)} components)")
+    return result
+
+
+def load_table(result: AnalysisResult) -> ComponentTable:
+    """Reads the component rows of a result back into a ComponentTable."""
+    rows = list(result.components.order_by('position').values_list(
+        'name', 'volume', 'material', 'vertices', 'faces', 'quantity', 'mesh_status', 'volume_error'
+    ))
+    columns = list(zip(*rows)) if rows else [[]] * 8
+    table = ComponentTable(
+        names=columns[0],
+        volumes=columns[1],
+        materials=columns[2],
+        vertices=columns[3],
+        faces=columns[4],
+        quantities=columns[5],
+        mesh_statuses=[status or None for status in columns[6]],
+        volume_errors=[float('nan') if error is None else error for error in columns[7]],
+    )
+    table.set_densities(result.densities)
+    return table
+
+
+def get_session_result(request) -> Optional[AnalysisResult]:
+    """
+    Result referenced by the session. Sessions from before the result store
+    still carry the whole table in 'result_data'; it is moved to the database once.
+    """
+    result_id = request.session.get(SESSION_KEY)
+    if result_id:
+        return AnalysisResult.objects.filter(pk=result_id, user=request.user).first()
+
+    legacy_data = request.session.get('result_data')
+    if not legacy_data:
+        return None
+    result = store_result(request.user, ComponentTable.from_dict(legacy_data))
+    request.session[SESSION_KEY] = str(result.id)
+    del request.session['result_data']
+    return result
+
+
+def store_job_result(request, job) -> Optional[AnalysisResult]:
+    """
+    Stores the current result of a job and points the session to it. When the
+    refined result replaces the coarse one, the materials the user already
+    picked are carried over by component name.
+
+    Each result version is stored once: a conditional UPDATE on the job picks a
+    single caller, and concurrent polls just point their session at the stored
+    result (None if that store failed and there is nothing to show yet).
+    """
+    with transaction.atomic():
+        claimed = AnalysisJob.objects.filter(pk=job.pk, status=job.status).exclude(
+            stored_status=job.status
+        ).update(stored_status=job.status)
+        if not claimed:
+            result = AnalysisResult.objects.filter(job=job, user=request.user).order_by('-created_at').first()
+            if result is not None:
+                request.session[SESSION_KEY] = str(result.id)
+            return result
+
+        table = ComponentTable.from_dict(job.result)
+        previous = AnalysisResult.objects.filter(job=job, user=request.user).order_by('-created_at').first()
+        if previous is not None:
+            chosen = dict(previous.components.exclude(material=NOT_SPECIFIED).values_list('name', 'material'))
+            for name, material in chosen.items():
+                table.set_material(name, material)
+            table.set_densities(previous.densities)
+
+        result = store_result(request.user, table, job=job, original_name=job.original_name)
+        if previous is not None:
+            AnalysisResult.objects.filter(job=job, user=request.user).exclude(pk=result.pk).delete()
+    request.session[SESSION_KEY] = str(result.id)
+    return result
+
+
+def set_component_material(result: AnalysisResult, component: str, material: Optional[str]) -> AnalysisResult:
+    """
+    Changes the material of a component with a single UPDATE on its rows and
+    moves their volume between the per-material totals of the result.
+    """
+    label = material or NOT_SPECIFIED
+    with transaction.atomic():
+        result = AnalysisResult.objects.select_for_update().get(pk=result.pk)
+        rows = result.components.filter(name=component).exclude(material=label)
+        moved = list(rows.values('material').annotate(
+            volume=Sum(ExpressionWrapper(F('volume') * F('quantity'), output_field=FloatField())),
+            count=Count('id')
+        ))
+        if not moved:
+            return result
+        rows.update(material=label)
+
+        totals = result.material_totals
+        for group in moved:
+            volume, count = totals.get(group['material'], [0.0, 0])
+            if count - group['count'] > 0:
+                totals[group['material']] = [volume - group['volume'], count - group['count']]
+            else:
+                totals.pop(group['material'], None)
+            volume, count = totals.get(label, [0.0, 0])
+            totals[label] = [volume + group['volume'], count + group['count']]
+        result.save(update_fields=['material_totals', 'updated_at'])
+    return result
+
+
+def _aggregate_material_totals(result: AnalysisResult) -> Dict[str, list]:
+    """Per-material totals computed by the database in a single GROUP BY."""
+    return {
+        group['material']: [group['volume'], group['count']]
+        for group in result.components.values('material').annotate(
+            volume=Sum(ExpressionWrapper(F('volume') * F('quantity'), output_field=FloatField())),
+            count=Count('id')
+        )
+    }
+
+
+def set_component_materials(result: AnalysisResult, assignments: Dict[str, Optional[str]]) -> Tuple[AnalysisResult, int]:
+    """
+    Applies many component -> material assignments in one transaction: one
+    UPDATE per target material (in batches of names) and a single recount of
+    the per-material totals. Returns the result and the number of rows changed.
+    """
+    components_by_label = defaultdict(list)
+    for component, material in assignments.items():
+        components_by_label[material or NOT_SPECIFIED].append(component)
+
+    changed = 0
+    with transaction.atomic():
+        result = AnalysisResult.objects.select_for_update().get(pk=result.pk)
+        for label, components in components_by_label.items():
+            for start in range(0, len(components), UPDATE_BATCH_SIZE):
+                changed += result.components.filter(
+                    name__in=components[start:start + UPDATE_BATCH_SIZE]
+                ).exclude(material=label).update(material=label)
+        if changed:
+            result.material_totals = _aggregate_material_totals(result)
+            result.save(update_fields=['material_totals', 'updated_at'])
+    logger.info(f"Analysis result {result.id}: {changed} component rows changed material")
+    return result, changed
+
+
+def compile_material_rules(rules: Iterable[dict]) -> List[Tuple[Callable, Optional[str]]]:
+    """
+    Compiles rules of the form {'pattern': '*_bracket*', 'material': label} or
+    {'regex': '^BRK-\\d+', 'material': label}. Globs and regexes ignore case;
+    raises ValueError on a rule without a pattern or with an invalid regex.
+    """
+    compiled = []
+    for rule in rules:
+        if rule.get('pattern'):
+            # Un glob debe cubrir el nombre completo, una regex basta con que aparezca
+            matcher = re.compile(fnmatch.translate(rule['pattern']), re.IGNORECASE).match
+        elif rule.get('regex'):
+            try:
+                matcher = re.compile(rule['regex'], re.IGNORECASE).search
+            except re.error as e:
+                raise ValueError(f"Invalid regex {rule['regex']!r}: {str(e)}")
+        else:
+            raise ValueError("Each rule needs a 'pattern' or a 'regex'")
+        compiled.append((matcher, rule.get('material')))
+    return compiled
+
+
+def match_material_rules(result: AnalysisResult, rules: List[Tuple[Callable, Optional[str]]]) -> Dict[str, Optional[str]]:
+    """Component -> material for every component name matched by a rule; the first matching rule wins."""
+    assignments = {}
+    for name in result.components.values_list('name', flat=True).distinct():
+        for matcher, material in rules:
+            if matcher(name):
+                assignments[name] = material
+                break
+    return assignments
+
+
+def set_densities(result: AnalysisResult, densities: Dict[str, float]) -> None:
+    """Stores the densities used for weight totals, only if they changed."""
+    densities = {label: float(density) for label, density in densities.items()}
+    if densities != result.densities:
+        AnalysisResult.objects.filter(pk=result.pk).update(densities=densities)
+        result.densities = densities
+
+
+def material_totals(result: AnalysisResult, decimals: int = 2) -> Tuple[Dict[str, float], Dict[str, Optional[float]]]:
+    """Volume and weight per material from the stored totals; weight is None without a density."""
+    volumes = {label: round(volume, decimals) for label, (volume, count) in result.material_totals.items()}
+    weights = {
+        label: round(volume * result.densities[label], decimals) if label in result.densities else None
+        for label, (volume, count) in result.material_totals.items()
+    }
+    return volumes, weights
+
+
+def purge_expired_results() -> int:
+    """Deletes results nobody touched within STEP_ANALYSIS_RESULT_MAX_AGE seconds."""
+    max_age = getattr(settings, 'STEP_ANALYSIS_RESULT_MAX_AGE', None)
+    if not max_age:
+        return 0
+    deleted, _ = AnalysisResult.objects.filter(updated_at__lt=timezone.now() - timedelta(seconds=max_age)).delete()
+    if deleted:
+        logger.info(f"Purged {deleted} expired analysis result rows")
+    return deleted
@@ -0,0 +1,23 @@
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def preload_web_services() -> None:
+    """
+    Startup work of the processes that serve requests, called from wsgi.py and
+    asgi.py (runserver loads WSGI_APPLICATION too). Management commands and
+    the analysis worker skip it: the template, the PDF backends and the
+    LibreOffice pool are then loaded on first use.
+    """
+    # La plantilla Excel de cotizaciones se parsea y valida una vez al arrancar
+    from .excel_template import preload_excel_template
+    preload_excel_template()
+
+    # Los conversores a PDF disponibles se detectan una vez (y se refrescan en segundo plano)
+    from .pdf_backends import preload_office_pool, preload_pdf_backends
+    preload_pdf_backends()
+    # Los procesos de LibreOffice arrancan en segundo plano, sin retrasar el inicio
+    preload_office_pool()
+    logger.info("Quote services preloaded")
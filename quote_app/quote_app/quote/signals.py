@@ -0,0 +1,36 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import CompanyFinishPrice, CompanyMaterialPrice, Finish, MaterialDensity
+from .services.price_cache import invalidate_company_prices
+
+
+def _invalidate_on_commit(company_ids) -> None:
+    # Tras el commit: un snapshot reconstruido antes no puede guardar precios sin confirmar
+    company_ids = list(company_ids)
+    if company_ids:
+        transaction.on_commit(lambda: invalidate_company_prices(*company_ids))
+
+
+@receiver([post_save, post_delete], sender=CompanyMaterialPrice)
+@receiver([post_save, post_delete], sender=CompanyFinishPrice)
+def company_price_changed(sender, instance, **kwargs):
+    """A material or finish price of a company changed."""
+    _invalidate_on_commit([instance.company_id])
+
+
+@receiver(post_save, sender=MaterialDensity)
+def material_changed(sender, instance, **kwargs):
+    """Density or name of a material changed: every company pricing it is affected."""
+    _invalidate_on_commit(
+        CompanyMaterialPrice.objects.filter(material=instance).values_list('company_id', flat=True).distinct()
+    )
+
+
+@receiver(post_save, sender=Finish)
+def finish_changed(sender, instance, **kwargs):
+    """Snapshots key finish multipliers by name."""
+    _invalidate_on_commit(
+        CompanyFinishPrice.objects.filter(finish=instance).values_list('company_id', flat=True).distinct()
+    )
@@ -8,7 +8,10 @@ urlpatterns = [
     path('about/', views.about, name='about'),
     path('contact/', views.contact, name='contact'),
     path('upload/', views.upload_step, name='upload'),  
+    path('upload/<uuid:job_id>/', views.analysis_progress, name='analysis_progress'),
+    path('upload/<uuid:job_id>/status/', views.analysis_status, name='analysis_status'),
     path('results/', views.results, name='results'),
     path('update-material/', views.update_material, name='update_material'),
+    path('update-materials/', views.update_materials, name='update_materials'),
     path('generate_quote/', views.generate_quote, name='generate_quote'),
 ]
\ No newline at end of file
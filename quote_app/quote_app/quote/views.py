@@ -4,6 +4,8 @@ from .views import (
     contact,
     about, 
     upload_step,
+    analysis_progress,
+    analysis_status,
     results,
     update_material,
     generate_quote,
@@ -15,6 +17,8 @@ __all__ = [
     'contact',
     'about',
     'upload_step',
+    'analysis_progress',
+    'analysis_status',
     'results', 
     'update_material',
     'generate_quote',
@@ -1,7 +1,7 @@
 # Import all views to make them available when importing from the views package
 from .basic_views import home, contact, about
-from .file_views import upload_step
-from .result_views import results, update_material
+from .file_views import upload_step, analysis_progress, analysis_status
+from .result_views import results, update_material, update_materials
 from .quote_views import generate_quote
 
 __all__ = [
@@ -9,7 +9,10 @@ __all__ = [
     'contact',
     'about',
     'upload_step',
+    'analysis_progress',
+    'analysis_status',
     'results',
     'update_material',
+    'update_materials',
     'generate_quote',
 ]
\ No newline at end of file
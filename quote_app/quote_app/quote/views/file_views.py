@@ -1,7 +1,11 @@
 import logging
-from django.http import HttpRequest
-from django.shortcuts import render, redirect
-from utils.step_analyzer import analyze_step_file
+from django.http import HttpRequest, JsonResponse
+from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
+
+from ..models import AnalysisJob
+from ..services.analysis_service import enqueue_analysis
+from ..services.result_store import store_job_result
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -10,18 +14,51 @@ def upload_step(request: HttpRequest):
     if request.method == 'POST':
         if 'step_file' not in request.FILES:
             return render(request, 'upload.html', {'error': 'No file selected'})
-            
+
         file = request.FILES['step_file']
         if not file.name.lower().endswith(('.step', '.stp')):
             return render(request, 'upload.html', {'error': 'Invalid file type'})
-            
+
         try:
-            # Process STEP file here
-            result_df = analyze_step_file(file, './data/csv')
-            # Store the DataFrame in the session
-            request.session['result_data'] = result_df.to_dict('records')
-            return redirect('quote:results')
+            # El análisis se hace en el worker (manage.py run_analysis_worker)
+            job = enqueue_analysis(request.user, file)
         except Exception as e:
             return render(request, 'quote/upload.html', {'error': str(e)})
-            
-    return render(request, 'quote/upload.html')
\ No newline at end of file
+
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return JsonResponse({
+                'job_id': str(job.id),
+                'status_url': reverse('quote:analysis_status', args=[job.id])
+            }, status=202)
+        return redirect('quote:analysis_progress', job_id=job.id)
+
+    return render(request, 'quote/upload.html')
+
+def analysis_progress(request: HttpRequest, job_id):
+    job = get_object_or_404(AnalysisJob, pk=job_id, user=request.user)
+    return render(request, 'quote/analysis_progress.html', {'job': job})
+
+def analysis_status(request: HttpRequest, job_id):
+    job = get_object_or_404(AnalysisJob, pk=job_id, user=request.user)
+    data = {
+        'job_id': str(job.id),
+        'status': job.status,
+        'status_display': job.get_status_display(),
+    }
+
+    if job.status in (AnalysisJob.STATUS_REFINING, AnalysisJob.STATUS_DONE):
+        # Store the result for the results page once per result version; the session
+        # only keeps its id. The refined result inherits the materials already picked.
+        # store_job_result itself makes sure concurrent polls store it only once
+        result_state = [str(job.id), job.status]
+        stored = request.session.get('result_job_state') == result_state
+        if not stored and store_job_result(request, job) is not None:
+            request.session['result_job_state'] = result_state
+            stored = True
+        if stored:
+            data['redirect_url'] = reverse('quote:results')
+        data['refining'] = job.status == AnalysisJob.STATUS_REFINING
+    elif job.status == AnalysisJob.STATUS_FAILED:
+        data['error'] = job.error
+
+    return JsonResponse(data)
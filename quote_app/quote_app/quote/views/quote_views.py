@@ -7,8 +7,9 @@ from django.views.decorators.http import require_http_methods
 
 # Importar los servicios necesarios
 
-from ..services.excel_quote_generator import ExcelQuoteGenerator
+from ..services.quote_pipeline import QuoteInputError, build_quote, project_data_from_request
 from ..services.email_service import send_excel_quote_email
+from ..services.pdf_backends import SOURCE_QUOTE
 from ..services.pdf_conversion_service import PDFConverter
 
 
@@ -23,7 +24,8 @@ def generate_quote(request: HttpRequest):
         logger.info("=" * 80)
         
         # Check if PDF conversion is supported
-        pdf_supported = PDFConverter.is_conversion_supported()
+        # Los PDF se dibujan desde la cotización calculada (quote_build)
+        pdf_supported = PDFConverter.is_conversion_supported(SOURCE_QUOTE)
         logger.info(f"PDF conversion supported: {pdf_supported}")
         
         if not request.user.is_authenticated:
@@ -45,38 +47,17 @@ def generate_quote(request: HttpRequest):
         logger.info(f"Quantities: {request.POST.getlist('quantities[]')}")
         logger.info(f"Volumes: {request.POST.getlist('volumes[]')}")
 
-        # Validate received data
-        if not all([
-            request.POST.getlist('components[]'),
-            request.POST.getlist('materials[]'),
-            request.POST.getlist('quantities[]'),
-            request.POST.getlist('volumes[]')
-        ]):
-            logger.error("❌ Missing required form data")
+        # Validate, price once and render both Excel variants from the same result
+        project_data = project_data_from_request(request.POST)
+        try:
+            build = build_quote(request.user, project_data)
+        except QuoteInputError as e:
+            logger.error(f"❌ {str(e)}")
             return JsonResponse({
                 'status': 'error',
-                'message': 'Missing required form data'
+                'message': str(e)
             }, status=400)
-
-        # Collect project data
-        project_data = {
-            'project_name': request.POST.get('project_name', 'New Project'),
-            'project_finish': request.POST.get('project_finish'),
-            'components': request.POST.getlist('components[]'),
-            'materials': request.POST.getlist('materials[]'),
-            'quantities': request.POST.getlist('quantities[]'),
-            'volumes': request.POST.getlist('volumes[]')
-        }
-
-        logger.info("Generating Excel for customer...")
-        customer_quote_generator = ExcelQuoteGenerator(request.user, project_data, is_internal=False)
-        customer_excel_content = customer_quote_generator.generate_excel()
-        logger.info("✅ Customer Excel generated successfully")
-
-        logger.info("Generating internal Excel...")
-        internal_quote_generator = ExcelQuoteGenerator(request.user, project_data, is_internal=True)
-        internal_excel_content = internal_quote_generator.generate_excel()
-        logger.info("✅ Internal Excel generated successfully")
+        logger.info("✅ Customer and internal Excel generated successfully")
 
         # Setup email addresses
         customer_email = request.user.company.contact_email
@@ -87,13 +68,14 @@ def generate_quote(request: HttpRequest):
 
         logger.info("Sending emails...")
         email_sent = send_excel_quote_email(
-            customer_excel_content,
-            internal_excel_content,
-            project_data['project_name'],
+            build.customer_excel,
+            build.internal_excel,
+            build.project_data['project_name'],
             customer_email,
             internal_email,
-            project_data,
-            request.user.company
+            build.project_data,
+            request.user.company,
+            quote_build=build
         )
 
         if email_sent:
@@ -1,12 +1,16 @@
 import json
 import logging
-import pandas as pd
 from django.http import HttpRequest, JsonResponse
 from django.shortcuts import redirect, render
+from django.urls import reverse
 
 from ..models import (
     Company, CompanyMaterialPrice, CompanyFinishPrice
 )
+from ..services.result_store import (
+    compile_material_rules, get_session_result, load_table, match_material_rules, material_totals,
+    set_component_material, set_component_materials, set_densities
+)
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -14,14 +18,15 @@ logger = logging.getLogger(__name__)
 def results(request: HttpRequest):
     logger.debug("Request received for results.")
     
-    if not request.session.get('result_data'):
-        logger.debug("Session does not contain 'result_data'. Redirecting to 'upload'.")
-        return redirect('upload')
-    
     if not request.user.is_authenticated:
         logger.debug("User is not authenticated. Redirecting to 'login'.")
         return redirect('login')
     
+    result = get_session_result(request)
+    if result is None:
+        logger.debug("Session does not reference an analysis result. Redirecting to 'upload'.")
+        return redirect('upload')
+    
     if not request.user.company:
         logger.debug("User is not associated with any company.")
         return render(request, 'quote/error.html', {
@@ -29,25 +34,9 @@ def results(request: HttpRequest):
         })
     
     try:
-        # Get and log session data
-        result_data = request.session['result_data']
-        logger.debug(f"Session 'result_data': {result_data}")
-        
-        df = pd.DataFrame(result_data)
-        
-        # Log original columns
-        logger.debug(f"Original DataFrame columns: {df.columns.tolist()}")
-        
-        # Rename columns and log
-        df = df.rename(columns={
-            'Volume (in³)': 'volume',
-            'Component': 'component',
-            'Material': 'material',
-            'Vertices': 'vertices',
-            'Faces': 'faces',
-            'Quantity': 'quantity'
-        })
-        logger.debug(f"Renamed DataFrame columns: {df.columns.tolist()}")
+        # Get and log the stored result
+        table = load_table(result)
+        logger.debug(f"Analysis result {result.id} loaded: {len(table)} components")
         
         company = request.user.company
         
@@ -67,6 +56,14 @@ def results(request: HttpRequest):
             })
         logger.debug(f"Available materials for company {company.name}: {available_materials}")
         
+        # Densities are stored with the result so update_material can total weights without joins
+        densities = {}
+        for material in available_materials:
+            densities[material['name']] = material['density']
+            if material['material_type']:
+                densities[material['material_type']] = material['density']
+        set_densities(result, densities)
+        
         # Get and log available finishes and prices
         finish_prices = {
             price.finish.name: float(price.price_multiplier)
@@ -79,7 +76,7 @@ def results(request: HttpRequest):
         
         # Prepare and log context
         context = {
-            'table_data': df.to_dict('records'),
+            'table_data': table.records(),
             'available_materials': available_materials,
             'finish_prices': finish_prices,
             'available_finishes': [
@@ -89,6 +86,11 @@ def results(request: HttpRequest):
                 )
             ]
         }
+
+        # Coarse volumes: the page polls the job until the refined pass is stored
+        job_id, job_status = request.session.get('result_job_state') or (None, None)
+        if job_status == 'refining':
+            context['refining_status_url'] = reverse('quote:analysis_status', args=[job_id])
         logger.debug(f"Context prepared for rendering: {context}")
         
         return render(request, 'quote/results.html', context)
@@ -99,40 +101,83 @@ def results(request: HttpRequest):
             'error': f'Error procesando resultados: {str(e)}'
         })
 
+def _totals_response(result, **extra):
+    volume_by_material, weight_by_material = material_totals(result)
+    return JsonResponse({
+        'success': True,
+        'volume_by_material': volume_by_material,
+        'total_volume': round(sum(volume_by_material.values()), 2),
+        'weight_by_material': weight_by_material,
+        'total_weight': round(sum(weight for weight in weight_by_material.values() if weight is not None), 2),
+        **extra
+    })
+
 def update_material(request: HttpRequest):
     if request.method == 'POST':
         data = json.loads(request.body)
         component = data.get('component')
         new_material = data.get('material')
         
-        # Get current data
-        result_data = request.session.get('result_data', [])
-        df = pd.DataFrame(result_data)
-        
-        # Update material for the specific component
-        df.loc[df['Component'] == component, 'Material'] = new_material
+        result = get_session_result(request) if request.user.is_authenticated else None
+        if result is None:
+            return JsonResponse({'success': False, 'error': 'No analysis result'}, status=404)
         
-        # Recalculate volumes by material
-        df = df.rename(columns={
-            'Volume (in³)': 'volume',
-            'Component': 'component',
-            'Material': 'material',
-            'Vertices': 'vertices',
-            'Faces': 'faces',
-            'Quantity': 'quantity'
-        })
+        # Only the component's rows and the stored totals are written
+        result = set_component_material(result, component, new_material)
+        return _totals_response(result)
+    
+    return JsonResponse({'success': False}, status=400)
+
+def update_materials(request: HttpRequest):
+    """
+    Assigns materials to many components in one request. Body (JSON):
+      assignments: [{"component": ..., "material": ... | "material_id": ...}] or {component: material}
+      rules: [{"pattern": "*_bracket*" | "regex": "...", "material": ... | "material_id": ...}]
+    Rules are applied first (first matching rule wins); explicit assignments override them.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False}, status=400)
+    
+    result = get_session_result(request) if request.user.is_authenticated else None
+    if result is None:
+        return JsonResponse({'success': False, 'error': 'No analysis result'}, status=404)
+    
+    try:
+        data = json.loads(request.body)
+        assignments = data.get('assignments') or []
+        if isinstance(assignments, dict):
+            assignments = [{'component': component, 'material': material} for component, material in assignments.items()]
+        rules = data.get('rules') or []
         
-        volume_by_material = df.groupby('material').apply(
-            lambda x: (x['volume'] * x['quantity']).sum()
-        ).round(2).to_dict()
+        # Los ids se resuelven contra los materiales activos de la empresa, con la misma etiqueta que usa results.html
+        labels = {}
+        if request.user.company:
+            for material_price in CompanyMaterialPrice.objects.filter(
+                company=request.user.company,
+                is_active=True
+            ).select_related('material'):
+                material = material_price.material
+                labels[str(material.id)] = material.material_type or material.name or material.get_material_type_display()
         
-        # Save updated data in session
-        request.session['result_data'] = df.to_dict('records')
+        def material_of(entry):
+            if entry.get('material_id') is None:
+                return entry.get('material')
+            if str(entry['material_id']) not in labels:
+                raise ValueError(f"Unknown material id {entry['material_id']}")
+            return labels[str(entry['material_id'])]
         
-        return JsonResponse({
-            'success': True,
-            'volume_by_material': volume_by_material,
-            'total_volume': sum(volume_by_material.values())
-        })
+        compiled_rules = compile_material_rules(
+            dict(rule, material=material_of(rule)) for rule in rules
+        )
+        changes = match_material_rules(result, compiled_rules) if compiled_rules else {}
+        for entry in assignments:
+            if not entry.get('component'):
+                raise ValueError("Each assignment needs a 'component'")
+            changes[entry['component']] = material_of(entry)
+    except (ValueError, TypeError, AttributeError) as e:
+        logger.debug(f"Invalid bulk material request: {str(e)}")
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
     
-    return JsonResponse({'success': False}, status=400)
\ No newline at end of file
+    # Una sola transacción y un solo recálculo de totales para todos los cambios
+    result, changed = set_component_materials(result, changes)
+    return _totals_response(result, matched=len(changes), updated=changed)
\ No newline at end of file
@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quote_app.settings')
 
 application = get_asgi_application()
+
+# Plantilla Excel y conversores a PDF listos antes de la primera petición
+from quote.services.startup import preload_web_services  # noqa: E402
+preload_web_services()
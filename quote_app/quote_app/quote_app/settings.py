@@ -54,6 +54,10 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Archivos subidos (STEP en cola de análisis)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
 # Middleware config
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
@@ -71,6 +75,11 @@ LOGIN_REDIRECT_URL = 'quote/home'
 
 DATA_UPLOAD_MAX_NUMBER_FIELDS = 100000
 
+# Subidas mayores a este tamaño se guardan en disco (TemporaryUploadedFile) en lugar de memoria;
+# el archivo temporal se mueve tal cual a MEDIA_ROOT y cascadio lo lee por ruta
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv("FILE_UPLOAD_MAX_MEMORY_SIZE", 2.5 * 1024 * 1024))
+FILE_UPLOAD_TEMP_DIR = os.getenv("FILE_UPLOAD_TEMP_DIR") or None
+
 # URL del login
 LOGIN_URL = 'session:login'
 
@@ -174,3 +183,75 @@ QUOTE_REPLY_EMAIL: str = os.getenv("QUOTE_REPLY_EMAIL")
 
 ENABLE_PDF_CONVERSION = True
 
+# Cache compartida entre workers para los precios de cada empresa (quote.services.price_cache);
+# en producción puede apuntar a Redis/Memcached
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'prices': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'data', 'cache', 'prices'),
+    },
+}
+PRICE_CACHE_ALIAS = 'prices'
+PRICE_SNAPSHOT_CACHE_TIMEOUT = 24 * 60 * 60  # 1 día
+
+# Cache de resultados de análisis STEP (compartido por todos los workers)
+STEP_ANALYSIS_CACHE_DIR = os.path.join(BASE_DIR, 'data', 'cache', 'step_analysis')
+STEP_ANALYSIS_CACHE_MAX_BYTES = 512 * 1024 * 1024  # 512 MB
+STEP_ANALYSIS_CACHE_MAX_AGE = 7 * 24 * 60 * 60  # 7 días
+
+# Cola de análisis en segundo plano (python manage.py run_analysis_worker)
+STEP_ANALYSIS_JOB_HEARTBEAT = 30  # segundos entre señales de vida del worker que procesa un trabajo
+STEP_ANALYSIS_JOB_TIMEOUT = 10 * 60  # segundos sin señal de vida antes de reencolar un trabajo abandonado
+STEP_ANALYSIS_JOB_MAX_ATTEMPTS = 3
+# Procesos para teselar las piezas en paralelo (0 = análisis en serie)
+STEP_ANALYSIS_WORKERS = int(os.getenv("STEP_ANALYSIS_WORKERS", 0))
+# "auto": solo se reparan los cuerpos que fallan la validación; "always": se reparan todos
+STEP_ANALYSIS_REPAIR_MODE = 'auto'
+# Teselado: "coarse", "default", "fine" o "adaptive" (pasada gruesa y refinamiento de los cuerpos curvos)
+STEP_ANALYSIS_TESSELLATION = 'adaptive'
+# Error relativo de volumen máximo aceptado de la pasada gruesa (0.01 = 1%)
+STEP_ANALYSIS_REFINE_TOLERANCE = 0.01
+# Directorio donde se vuelcan los STEP que solo existen en memoria antes de pasarlos a cascadio
+STEP_ANALYSIS_SPOOL_DIR = os.getenv("STEP_ANALYSIS_SPOOL_DIR") or None
+# Procesos hijos que ejecutan el análisis con límites de recursos (0 = en el mismo proceso del worker)
+STEP_ANALYSIS_POOL_SIZE = int(os.getenv("STEP_ANALYSIS_POOL_SIZE", 1))
+STEP_ANALYSIS_MAX_JOBS_PER_CHILD = 20
+# Límites por trabajo: memoria virtual (RLIMIT_AS) en bytes y tiempo de CPU en segundos
+STEP_ANALYSIS_MEMORY_LIMIT = int(os.getenv("STEP_ANALYSIS_MEMORY_LIMIT", 4 * 1024 * 1024 * 1024))
+STEP_ANALYSIS_CPU_LIMIT = int(os.getenv("STEP_ANALYSIS_CPU_LIMIT", 10 * 60))
+
+# Historial de análisis (.npz por análisis, una carpeta por empresa); None lo desactiva
+STEP_ANALYSIS_ARCHIVE_DIR = os.path.join(BASE_DIR, 'data', 'archive')
+STEP_ANALYSIS_ARCHIVE_MAX_AGE = 365 * 24 * 60 * 60  # 1 año
+STEP_ANALYSIS_ARCHIVE_MAX_ENTRIES = 5000  # por empresa
+
+# Resultados en cotización (la sesión solo guarda su id); se borran tras este tiempo sin cambios
+STEP_ANALYSIS_RESULT_MAX_AGE = 30 * 24 * 60 * 60  # 30 días
+
+
+# Excel de cotización: líneas de componentes por página impresa (el encabezado de la tabla se
+# repite en cada página) y número de líneas a partir del cual se escribe en modo streaming
+EXCEL_ROWS_PER_PAGE = 30
+EXCEL_STREAMING_MIN_LINES = 1000
+
+# Conversión Excel -> PDF con LibreOffice: procesos soffice en segundo plano (uno por conversión
+# simultánea, cada uno con su perfil) controlados por UNO; 0 = arrancar LibreOffice en cada conversión.
+# Requiere python3-uno; sin él se usa siempre un proceso por conversión
+PDF_CONVERSION_OFFICE_BINARY = 'libreoffice'
+PDF_CONVERSION_POOL_SIZE = int(os.getenv("PDF_CONVERSION_POOL_SIZE", 2))
+PDF_CONVERSION_PROFILE_DIR = os.path.join(BASE_DIR, 'data', 'office_profiles')
+PDF_CONVERSION_TIMEOUT = 60  # segundos por documento antes de matar y reiniciar el proceso
+PDF_CONVERSION_START_TIMEOUT = 30
+PDF_CONVERSION_WARM_TIMEOUT = 60  # espera máxima del arranque en segundo plano de todos los procesos
+PDF_CONVERSION_HEALTH_INTERVAL = 30  # comprobación de los procesos sin trabajo
+PDF_CONVERSION_MAX_JOBS_PER_PROCESS = 200
+# Conversores a PDF que se pueden usar; en cada conversión se elige el más rápido de los que
+# funcionan (latencia medida) y, si falla, el siguiente. 'native' dibuja el PDF con ReportLab
+# desde la cotización calculada; los de LibreOffice convierten el Excel
+PDF_BACKENDS = ['native', 'office_pool', 'office_subprocess']
+PDF_BACKEND_REFRESH_INTERVAL = 5 * 60  # segundos entre detecciones de conversores disponibles
+PDF_BACKEND_FAILURE_THRESHOLD = 3  # fallos seguidos para dejar de usar un conversor...
+PDF_BACKEND_RETRY_AFTER = 60  # ...durante estos segundos
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quote_app.settings')
 
 application = get_wsgi_application()
+
+# Plantilla Excel y conversores a PDF listos antes de la primera petición
+from quote.services.startup import preload_web_services  # noqa: E402
+preload_web_services()
@@ -1,3 +1,4 @@
+from .component_table import ComponentTable
 from .step_analyzer import analyze_step_file
 
-__all__ = ["analyze_step_file"]
\ No newline at end of file
+__all__ = ["ComponentTable", "analyze_step_file"]
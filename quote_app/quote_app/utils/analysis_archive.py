@@ -0,0 +1,169 @@
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .component_table import ComponentTable
+
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_SUFFIX = '.npz'
+
+# Columnas de metadatos agregadas a cada fila al cargar el historial
+META_COLUMNS = ('Analysis ID', 'Analyzed At', 'File')
+
+_STOP = object()
+
+
+class AnalysisArchive:
+    """
+    Columnar archive of past STEP analyses, one compressed .npz per analysis.
+
+    Files live in one directory per company and are named by UTC timestamp, so
+    history queries only list a directory and load the newest files; no CSV is
+    ever parsed. Writes go through a background thread (submit returns at
+    once) and are atomic (temp file + os.replace). After every write the
+    company directory is pruned to `max_entries` files no older than `max_age`.
+    """
+
+    def __init__(self, directory: str, max_age: Optional[int] = None, max_entries: Optional[int] = None):
+        self.directory = directory
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _company_dir(self, company_id) -> str:
+        return os.path.join(self.directory, str(company_id) if company_id is not None else 'none')
+
+    def submit(self, company_id, table: ComponentTable, file_name: str = '', analysis_id: Optional[str] = None) -> str:
+        """Queues an analysis for archiving and returns its id; the write happens in the background."""
+        analysis_id = analysis_id or uuid.uuid4().hex
+        analyzed_at = datetime.now(timezone.utc)
+        self._queue.put((company_id, table.columns(), file_name, analysis_id, analyzed_at))
+        self._ensure_thread()
+        return analysis_id
+
+    def _ensure_thread(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='analysis-archive', daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                company_id = item[0]
+                self.write(*item)
+                self.apply_retention(company_id)
+            except Exception as e:
+                logger.error(f"Error archiving STEP analysis: {str(e)}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    def write(self, company_id, columns: Dict[str, np.ndarray], file_name: str, analysis_id: str,
+              analyzed_at: datetime) -> str:
+        """Writes the columns of one analysis synchronously and returns the archive path."""
+        directory = self._company_dir(company_id)
+        os.makedirs(directory, exist_ok=True)
+
+        arrays: Dict[str, np.ndarray] = {
+            'columns': np.array(list(columns), dtype=str),
+            'analysis_id': np.array(analysis_id),
+            'analyzed_at': np.array(analyzed_at.isoformat()),
+            'file_name': np.array(file_name or ''),
+        }
+        for index, values in enumerate(columns.values()):
+            # Sin pickle: las columnas de texto se guardan como cadenas unicode
+            arrays[f'c{index}'] = values if values.dtype.kind in 'biuf' else values.astype(str)
+
+        name = f"{analyzed_at.strftime('%Y%m%dT%H%M%S%f')}_{analysis_id}{ARCHIVE_SUFFIX}"
+        path = os.path.join(directory, name)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        logger.info(f"STEP analysis archived to {path}")
+        return path
+
+    def _entries(self, company_id) -> List[str]:
+        """Archive files of a company, newest first."""
+        directory = self._company_dir(company_id)
+        try:
+            names = [name for name in os.listdir(directory) if name.endswith(ARCHIVE_SUFFIX)]
+        except FileNotFoundError:
+            return []
+        return [os.path.join(directory, name) for name in sorted(names, reverse=True)]
+
+    def apply_retention(self, company_id) -> int:
+        """Deletes the archives of a company beyond max_entries or older than max_age; returns how many."""
+        entries = self._entries(company_id)
+        expired = entries[self.max_entries:] if self.max_entries else []
+        if self.max_age:
+            cutoff = time.time() - self.max_age
+            expired += [path for path in entries[:len(entries) - len(expired)] if os.path.getmtime(path) < cutoff]
+
+        for path in expired:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        if expired:
+            logger.info(f"Analysis archive: removed {len(expired)} old entries for company {company_id}")
+        return len(expired)
+
+    def load_history(self, company_id, since: Optional[datetime] = None, limit: Optional[int] = None) -> pd.DataFrame:
+        """
+        Rows of every archived analysis of a company, newest analysis first,
+        with the META_COLUMNS identifying the analysis each row belongs to.
+        `since` must be timezone-aware (analyses are stamped in UTC).
+        """
+        if since is not None and since.tzinfo is None:
+            raise ValueError("since must be a timezone-aware datetime")
+        frames = []
+        for path in self._entries(company_id)[:limit]:
+            with np.load(path, allow_pickle=False) as data:
+                analyzed_at = datetime.fromisoformat(str(data['analyzed_at']))
+                if since is not None and analyzed_at < since:
+                    break  # Los archivos están ordenados por fecha: los siguientes son más antiguos
+                columns = [str(column) for column in data['columns']]
+                frame = pd.DataFrame({column: data[f'c{index}'] for index, column in enumerate(columns)})
+                frame.insert(0, 'Analysis ID', str(data['analysis_id']))
+                frame.insert(1, 'Analyzed At', analyzed_at)
+                frame.insert(2, 'File', str(data['file_name']))
+                frames.append(frame)
+
+        if not frames:
+            return pd.DataFrame(columns=list(META_COLUMNS))
+        return pd.concat(frames, ignore_index=True)
+
+    def flush(self) -> None:
+        """Blocks until every queued analysis has been written."""
+        self._queue.join()
+
+    def close(self) -> None:
+        """Writes the pending analyses and stops the background thread."""
+        with self._lock:
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join()
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Any, BinaryIO, Dict, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(file: BinaryIO, chunk_size: int = CHUNK_SIZE) -> str:
+    """SHA-256 of the file contents, read in chunks so the upload is never copied whole."""
+    digest = hashlib.sha256()
+    file.seek(0)
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """
+    On-disk cache of STEP analysis results keyed by content hash + analyzer settings.
+
+    Entries are JSON files written atomically (temp file + os.replace), so every
+    worker process pointing at the same directory shares them safely. An entry's
+    mtime is its creation time and is never touched afterwards; hits only bump
+    the atime. Eviction drops entries created more than `max_age` seconds ago,
+    then the least recently used ones (by atime) until the directory fits in
+    `max_bytes`. Temp files left behind by crashed writers are swept as well.
+    """
+
+    SUFFIX = '.json'
+    TMP_SUFFIX = '.tmp'
+    # Antigüedad a partir de la cual un .tmp se considera huérfano (escritor caído)
+    TMP_GRACE = 10 * 60
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024, max_age: Optional[int] = None):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(digest: str, settings: Dict[str, Any]) -> str:
+        settings_blob = json.dumps(settings, sort_keys=True, default=str)
+        return hashlib.sha256(f"{digest}:{settings_blob}".encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}{self.SUFFIX}")
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.max_age is not None and now - created_at > self.max_age
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+            now = time.time()
+            if self._is_expired(stat.st_mtime, now):
+                self._remove(path)
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+            # Marcar la entrada como usada recientemente (LRU) solo en el atime;
+            # el mtime sigue siendo la fecha de creación para max_age
+            os.utime(path, (now, stat.st_mtime))
+            logger.info(f"Analysis cache hit: {key[:12]}")
+            return payload
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable cache entry {key[:12]}: {str(e)}")
+            self._remove(path)
+            return None
+
+    def set(self, key: str, payload: List[Dict[str, Any]]) -> None:
+        try:
+            data = json.dumps(payload)
+        except (TypeError, ValueError) as e:
+            # Un resultado no serializable simplemente no se cachea
+            logger.warning(f"Analysis result for {key[:12]} is not cacheable: {str(e)}")
+            return
+
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=self.TMP_SUFFIX)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+            logger.info(f"Analysis cache stored: {key[:12]}")
+        except OSError as e:
+            logger.warning(f"Could not write analysis cache entry {key[:12]}: {str(e)}")
+            if tmp_path is not None:
+                self._remove(tmp_path)
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        now = time.time()
+        entries = []
+        for entry in os.scandir(self.directory):
+            is_tmp = entry.name.endswith(self.TMP_SUFFIX)
+            if not is_tmp and not entry.name.endswith(self.SUFFIX):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if is_tmp:
+                if now - stat.st_mtime > self.TMP_GRACE:
+                    logger.info(f"Removing stale cache temp file {entry.name}")
+                    self._remove(entry.path)
+                continue
+            if self._is_expired(stat.st_mtime, now):
+                self._remove(entry.path)
+            else:
+                entries.append((stat.st_atime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,177 @@
+import importlib
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional, Sequence
+
+try:
+    import resource
+except ImportError:  # Windows: los límites de recursos no están disponibles
+    resource = None
+
+
+logger = logging.getLogger(__name__)
+
+# Módulos que cada proceso hijo trae importados antes de recibir trabajos
+PRELOAD_MODULES = ('numpy', 'trimesh', 'cascadio', 'pandas', f'{__package__}.step_analyzer')
+
+# Margen extra sobre el límite de CPU antes de matar un proceso que no responde (código nativo)
+CPU_GRACE_SECONDS = 15
+
+# Límite de CPU del trabajo en curso, para el mensaje de error del proceso hijo
+_job_cpu_limit: Optional[int] = None
+
+
+class AnalysisLimitError(Exception):
+    """A STEP analysis was stopped because it exceeded its memory or CPU-time limit."""
+
+
+def _preload(modules: Sequence[str]) -> None:
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            logger.warning(f"Could not preload {module} in analysis process: {str(e)}")
+
+
+def _raise_cpu_limit(signum, frame):
+    raise AnalysisLimitError(f"CPU time limit exceeded ({_job_cpu_limit} s)")
+
+
+def _init_child(modules: Sequence[str]) -> None:
+    """Runs once per child process: imports the heavy libraries so jobs do not pay for it."""
+    _preload(modules)
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        # Los pools de teselado que abra el trabajo (workers > 0) también parten de módulos precargados
+        multiprocessing.set_forkserver_preload(list(modules))
+    if resource is not None:
+        signal.signal(signal.SIGXCPU, _raise_cpu_limit)
+
+
+def _run_limited(memory_limit: Optional[int], cpu_limit: Optional[int], func: Callable, args, kwargs):
+    """
+    Runs one job inside a child with the limits applied.
+
+    Only soft limits are changed (they can be raised again for the next job;
+    hard limits can only go down). RLIMIT_CPU is cumulative for the process, so
+    the soft limit is set to the CPU already used plus the per-job budget, and
+    SIGXCPU interrupts the job as soon as Python code runs again.
+    """
+    global _job_cpu_limit
+    _job_cpu_limit = cpu_limit
+    if resource is not None:
+        if memory_limit:
+            _, hard = resource.getrlimit(resource.RLIMIT_AS)
+            soft = memory_limit if hard == resource.RLIM_INFINITY else min(memory_limit, hard)
+            resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+        if cpu_limit:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            used = int(usage.ru_utime + usage.ru_stime) + 1
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            soft = used + cpu_limit if hard == resource.RLIM_INFINITY else min(used + cpu_limit, hard)
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+    try:
+        return func(*args, **kwargs)
+    except MemoryError:
+        if not memory_limit:
+            raise
+        raise AnalysisLimitError(f"Memory limit exceeded ({memory_limit // (1024 * 1024)} MB)") from None
+    finally:
+        if resource is not None:
+            for limit in (resource.RLIMIT_AS, resource.RLIMIT_CPU):
+                _, hard = resource.getrlimit(limit)
+                resource.setrlimit(limit, (hard, hard))
+
+
+class AnalysisPool:
+    """
+    Pool of pre-warmed child processes for STEP analysis with per-job limits.
+
+    Children are forked from a forkserver that already imported trimesh and
+    cascadio (spawned and initialized once on platforms without forkserver),
+    recycled after `max_jobs_per_child` jobs, and run every job under an
+    address-space (RLIMIT_AS) and CPU-time (RLIMIT_CPU) limit. A runaway or
+    crashing analysis raises AnalysisLimitError instead of taking the calling
+    process down; the pool replaces the broken children on its own.
+    """
+
+    def __init__(self, workers: int = 1, max_jobs_per_child: Optional[int] = 20,
+                 memory_limit: Optional[int] = None, cpu_limit: Optional[int] = None):
+        self.workers = max(1, workers)
+        self.max_jobs_per_child = max_jobs_per_child or None
+        self.memory_limit = memory_limit
+        self.cpu_limit = cpu_limit
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+        if resource is None and (memory_limit or cpu_limit):
+            logger.warning("Resource limits are not supported on this platform; analysis runs unlimited")
+
+    def _context(self):
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('forkserver')
+            context.set_forkserver_preload(list(PRELOAD_MODULES))
+            return context
+        return multiprocessing.get_context('spawn')
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=self._context(),
+                    initializer=_init_child,
+                    initargs=(PRELOAD_MODULES,),
+                    max_tasks_per_child=self.max_jobs_per_child
+                )
+            return self._executor
+
+    def _restart(self, kill: bool = False) -> None:
+        """Drops the current executor; with kill, its children are terminated first."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        if kill:
+            # ProcessPoolExecutor.terminate_workers() solo existe desde Python 3.14
+            for process in list((executor._processes or {}).values()):
+                if process.is_alive():
+                    process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def warm(self) -> None:
+        """Starts every child now so the first jobs do not wait for process start-up."""
+        executor = self._get_executor()
+        try:
+            for future in [executor.submit(os.getpid) for _ in range(self.workers)]:
+                future.result()
+        except BrokenProcessPool:
+            logger.error("Analysis pool failed to start, processes will be started on the first job")
+            self._restart()
+            return
+        logger.info(f"Analysis pool ready with {self.workers} processes")
+
+    def run(self, func: Callable, *args, **kwargs):
+        """Runs func(*args, **kwargs) in a child process under the pool limits."""
+        future = self._get_executor().submit(_run_limited, self.memory_limit, self.cpu_limit, func, args, kwargs)
+        # Tiempo de pared como último recurso para código nativo que no atiende SIGXCPU
+        timeout = self.cpu_limit + CPU_GRACE_SECONDS if self.cpu_limit else None
+        try:
+            return future.result(timeout=timeout)
+        except FuturesTimeoutError:
+            logger.error(f"Analysis process did not finish within {timeout} s, killing it")
+            self._restart(kill=True)
+            raise AnalysisLimitError(f"CPU time limit exceeded ({self.cpu_limit} s)") from None
+        except BrokenProcessPool:
+            logger.error("Analysis process died, restarting pool")
+            self._restart()
+            raise AnalysisLimitError("Analysis process crashed, the file may need more memory than allowed") from None
+
+    def shutdown(self) -> None:
+        self._restart()
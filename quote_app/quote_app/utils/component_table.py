@@ -0,0 +1,252 @@
+import sys
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+NOT_SPECIFIED = 'Not specified'
+
+# Column names of the legacy row format (DataFrame / CSV / session records)
+LEGACY_COLUMNS = {
+    'Component': 'component',
+    'Volume (in³)': 'volume',
+    'Material': 'material',
+    'Vertices': 'vertices',
+    'Faces': 'faces',
+    'Quantity': 'quantity',
+    'Mesh Status': 'mesh_status',
+}
+
+TABLE_FORMAT_VERSION = 1
+
+
+def _encode(values: Iterable[Optional[str]], labels: Optional[List[str]] = None) -> Tuple[List[str], np.ndarray]:
+    """Categorical encoding: unique interned labels plus an int32 code per row."""
+    labels = list(labels or [])
+    index = {label: code for code, label in enumerate(labels)}
+    codes = []
+    for value in values:
+        if value not in index:
+            index[value] = len(labels)
+            labels.append(sys.intern(value) if isinstance(value, str) else value)
+        codes.append(index[value])
+    return labels, np.asarray(codes, dtype=np.int32)
+
+
+class ComponentTable:
+    """
+    Analysis result as a struct of NumPy arrays, one entry per unique component.
+
+    Names are interned strings; materials and mesh statuses are stored as
+    int32 codes into small label lists. The total volume (volume × quantity)
+    and row count of every material are kept next to the rows and adjusted on
+    each set_material, so reassigning a component costs O(rows changed) and
+    the result store saves the totals without scanning the table (the stored
+    result keeps them up to date from then on). to_dict() gives a compact
+    column-wise JSON form for the session, the job table and the cache.
+    """
+
+    __slots__ = (
+        'names', 'volumes', 'vertices', 'faces', 'quantities', 'volume_errors',
+        'material_labels', 'material_codes', 'status_labels', 'status_codes',
+        'material_volumes', 'material_counts', 'densities', '_rows',
+    )
+
+    def __init__(self, names: Sequence[str], volumes, materials: Sequence[Optional[str]], vertices, faces,
+                 quantities, mesh_statuses: Optional[Sequence[Optional[str]]] = None, volume_errors=None):
+        count = len(names)
+        self.names = np.array([sys.intern(str(name)) for name in names], dtype=object)
+        self.volumes = np.asarray(volumes, dtype=np.float64).reshape(count)
+        self.vertices = np.asarray(vertices, dtype=np.int32).reshape(count)
+        self.faces = np.asarray(faces, dtype=np.int32).reshape(count)
+        self.quantities = np.asarray(quantities, dtype=np.int32).reshape(count)
+        self.volume_errors = (
+            np.full(count, np.nan) if volume_errors is None
+            else np.asarray(volume_errors, dtype=np.float64).reshape(count)
+        )
+        self.material_labels, self.material_codes = _encode(material or NOT_SPECIFIED for material in materials)
+        self.status_labels, self.status_codes = _encode(mesh_statuses if mesh_statuses is not None else [None] * count)
+        self.densities: Dict[str, float] = {}
+        self._rows = None
+        self._recompute_material_totals()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __repr__(self) -> str:
+        return f"<ComponentTable: {len(self)} components>"
+
+    @property
+    def materials(self) -> np.ndarray:
+        return np.array(self.material_labels, dtype=object)[self.material_codes] if len(self) else np.array([], dtype=object)
+
+    @property
+    def mesh_statuses(self) -> np.ndarray:
+        return np.array(self.status_labels, dtype=object)[self.status_codes] if len(self) else np.array([], dtype=object)
+
+    @classmethod
+    def from_components(cls, components: Sequence) -> 'ComponentTable':
+        """Builds the table from objects with the step_analyzer.Component attributes."""
+        return cls(
+            names=[component.name for component in components],
+            volumes=[component.volume for component in components],
+            materials=[component.material for component in components],
+            vertices=[component.vertices for component in components],
+            faces=[component.faces for component in components],
+            quantities=[component.quantity for component in components],
+            mesh_statuses=[component.mesh_status for component in components],
+            volume_errors=[
+                np.nan if component.volume_error is None else component.volume_error
+                for component in components
+            ],
+        )
+
+    @classmethod
+    def from_records(cls, records: List[dict]) -> 'ComponentTable':
+        """Builds the table from row dicts, with either the legacy or the lowercase column names."""
+        def column(key, default=None):
+            legacy = next(name for name, lower in LEGACY_COLUMNS.items() if lower == key)
+            return [record.get(legacy, record.get(key, default)) for record in records]
+
+        return cls(
+            names=column('component'),
+            volumes=column('volume', 0.0),
+            materials=column('material'),
+            vertices=column('vertices', 0),
+            faces=column('faces', 0),
+            quantities=[quantity or 1 for quantity in column('quantity', 1)],
+            mesh_statuses=column('mesh_status'),
+        )
+
+    def to_dict(self) -> dict:
+        """Compact JSON-serializable form: one list per column, categorical columns as labels + codes."""
+        return {
+            'format': TABLE_FORMAT_VERSION,
+            'names': self.names.tolist(),
+            'volumes': self.volumes.tolist(),
+            'vertices': self.vertices.tolist(),
+            'faces': self.faces.tolist(),
+            'quantities': self.quantities.tolist(),
+            'volume_errors': [None if np.isnan(error) else error for error in self.volume_errors.tolist()],
+            'materials': {
+                'labels': self.material_labels,
+                'codes': self.material_codes.tolist(),
+                'volumes': self.material_volumes.tolist(),
+                'counts': self.material_counts.tolist(),
+            },
+            'mesh_statuses': {'labels': self.status_labels, 'codes': self.status_codes.tolist()},
+            'densities': self.densities,
+        }
+
+    @classmethod
+    def from_dict(cls, data) -> 'ComponentTable':
+        """Inverse of to_dict; also accepts the legacy list of row dicts."""
+        if isinstance(data, list):
+            return cls.from_records(data)
+
+        table = cls.__new__(cls)
+        table.names = np.array([sys.intern(name) for name in data['names']], dtype=object)
+        table.volumes = np.asarray(data['volumes'], dtype=np.float64)
+        table.vertices = np.asarray(data['vertices'], dtype=np.int32)
+        table.faces = np.asarray(data['faces'], dtype=np.int32)
+        table.quantities = np.asarray(data['quantities'], dtype=np.int32)
+        table.volume_errors = np.array(
+            [np.nan if error is None else error for error in data.get('volume_errors') or [None] * len(table.names)],
+            dtype=np.float64
+        )
+        table.material_labels = [sys.intern(label) for label in data['materials']['labels']]
+        table.material_codes = np.asarray(data['materials']['codes'], dtype=np.int32)
+        table.status_labels = list(data['mesh_statuses']['labels'])
+        table.status_codes = np.asarray(data['mesh_statuses']['codes'], dtype=np.int32)
+        table.densities = dict(data.get('densities') or {})
+        table._rows = None
+        if 'volumes' in data['materials']:
+            table.material_volumes = np.asarray(data['materials']['volumes'], dtype=np.float64)
+            table.material_counts = np.asarray(data['materials']['counts'], dtype=np.int32)
+        else:
+            table._recompute_material_totals()
+        return table
+
+    def records(self) -> List[dict]:
+        """Rows with lowercase keys, as the results templates use them."""
+        materials = self.materials
+        statuses = self.mesh_statuses
+        return [
+            {
+                'component': self.names[index],
+                'volume': float(self.volumes[index]),
+                'material': materials[index],
+                'vertices': int(self.vertices[index]),
+                'faces': int(self.faces[index]),
+                'quantity': int(self.quantities[index]),
+                'mesh_status': statuses[index],
+            }
+            for index in range(len(self))
+        ]
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Arrays keyed by the legacy column names (archive, CSV and DataFrame export)."""
+        return {
+            'Component': self.names.astype(str),
+            'Volume (in³)': self.volumes,
+            'Material': self.materials.astype(str),
+            'Vertices': self.vertices,
+            'Faces': self.faces,
+            'Quantity': self.quantities,
+            'Mesh Status': self.mesh_statuses.astype(str),
+        }
+
+    def to_frame(self):
+        """pandas DataFrame with the legacy column names; pandas is only imported here."""
+        import pandas as pd
+        return pd.DataFrame(self.columns())
+
+    def _recompute_material_totals(self) -> None:
+        """Full O(n) pass; only used when the totals are not stored yet."""
+        labels = len(self.material_labels)
+        self.material_volumes = np.bincount(self.material_codes, weights=self.volumes * self.quantities, minlength=labels)
+        self.material_counts = np.bincount(self.material_codes, minlength=labels).astype(np.int32)
+
+    def _material_code(self, material: Optional[str]) -> int:
+        label = str(material or NOT_SPECIFIED)
+        try:
+            return self.material_labels.index(label)
+        except ValueError:
+            self.material_labels.append(sys.intern(label))
+            self.material_volumes = np.append(self.material_volumes, 0.0)
+            self.material_counts = np.append(self.material_counts, np.int32(0))
+            return len(self.material_labels) - 1
+
+    def rows_of(self, component: str) -> List[int]:
+        """Row indices of a component; the name index is built once per table."""
+        if self._rows is None:
+            self._rows = {}
+            for index, name in enumerate(self.names):
+                self._rows.setdefault(name, []).append(index)
+        return self._rows.get(component, [])
+
+    def set_material(self, component: str, material: Optional[str]) -> int:
+        """
+        Assigns a material to every row of a component and moves their volume
+        between the per-material totals; returns the number of rows changed.
+        """
+        code = self._material_code(material)
+        changed = 0
+        for row in self.rows_of(component):
+            previous = self.material_codes[row]
+            if previous == code:
+                continue
+            volume = self.volumes[row] * self.quantities[row]
+            self.material_volumes[previous] -= volume
+            self.material_counts[previous] -= 1
+            if not self.material_counts[previous]:
+                self.material_volumes[previous] = 0.0  # Sin residuos de redondeo en materiales vacíos
+            self.material_volumes[code] += volume
+            self.material_counts[code] += 1
+            self.material_codes[row] = code
+            changed += 1
+        return changed
+
+    def set_densities(self, densities: Dict[str, float]) -> None:
+        """Densities (lb/in³) by material label, stored with the result for its weight totals."""
+        self.densities = {label: float(density) for label, density in densities.items()}
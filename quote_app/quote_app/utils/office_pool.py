@@ -0,0 +1,404 @@
+import atexit
+import logging
+import os
+import queue
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo de ranuras de perfil
+    fcntl = None
+
+try:
+    import uno  # python3-uno, incluido con LibreOffice
+except ImportError:
+    uno = None
+
+
+logger = logging.getLogger(__name__)
+
+# Filtro de exportación a PDF de las hojas de cálculo
+CALC_PDF_FILTER = 'calc_pdf_Export'
+
+# Segundos de espera antes de volver a arrancar un soffice que no pudo iniciarse
+RESTART_BACKOFF = 5
+
+# Intervalo del vigilante que mata las conversiones que exceden su tiempo
+WATCHDOG_INTERVAL = 0.5
+
+
+class OfficeConversionError(Exception):
+    """A document could not be converted by LibreOffice (timeout, crash or unreadable input)."""
+
+
+def _kill_group(pid: int) -> None:
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _kill_orphan(slot_dir: str) -> None:
+    """Kills a soffice left running in a profile slot by a process that died without stopping it."""
+    pid_file = os.path.join(slot_dir, 'soffice.pid')
+    try:
+        with open(pid_file) as f:
+            pid = int(f.read().strip())
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            cmdline = f.read()
+    except (OSError, ValueError):
+        return
+    if slot_dir.encode() in cmdline:
+        logger.warning(f"Killing orphan soffice process {pid} of profile {slot_dir}")
+        _kill_group(pid)
+
+
+@contextmanager
+def claim_profile_slot(base_dir: str) -> Iterator[str]:
+    """
+    Exclusive LibreOffice user profile directory under base_dir.
+
+    Two soffice processes started with the same profile do not run side by
+    side: the second one hands its work to the first and exits. Slots are
+    numbered directories locked with flock while in use, so every process
+    (and every listener of a pool) gets its own profile, and a profile is
+    reused warm by the next owner instead of being created again.
+    """
+    base_dir = os.path.abspath(base_dir)
+    os.makedirs(base_dir, exist_ok=True)
+    if fcntl is None:
+        with tempfile.TemporaryDirectory(dir=base_dir) as slot_dir:
+            yield slot_dir
+        return
+
+    index = 0
+    while True:
+        lock_file = open(os.path.join(base_dir, f'slot-{index}.lock'), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            break
+        except BlockingIOError:
+            lock_file.close()
+            index += 1
+    try:
+        slot_dir = os.path.join(base_dir, f'slot-{index}')
+        os.makedirs(slot_dir, exist_ok=True)
+        _kill_orphan(slot_dir)
+        yield slot_dir
+    finally:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+
+def office_command(binary: str, slot_dir: str, *args: str) -> List[str]:
+    """soffice command line running headless on the profile of slot_dir."""
+    return [
+        binary,
+        f'-env:UserInstallation=file://{slot_dir}/profile',
+        '--headless',
+        '--invisible',
+        '--nologo',
+        '--nodefault',
+        '--norestore',
+        '--nofirststartwizard',
+        '--nolockcheck',  # la ranura ya garantiza un solo proceso por perfil
+        *args
+    ]
+
+
+def _property(name: str, value):
+    prop = uno.createUnoStruct('com.sun.star.beans.PropertyValue')
+    prop.Name = name
+    prop.Value = value
+    return prop
+
+
+class OfficeListener:
+    """
+    One long-running headless soffice accepting UNO connections on a private
+    pipe, with its own profile slot. Not thread-safe: it converts one
+    document at a time.
+    """
+
+    def __init__(self, binary: str, slot_dir: str, start_timeout: float = 30):
+        self.binary = binary
+        self.slot_dir = slot_dir
+        self.start_timeout = start_timeout
+        self.pipe_name = f'quote_office_{os.getpid()}_{os.path.basename(slot_dir)}'
+        self.process: Optional[subprocess.Popen] = None
+        self.desktop = None
+        self.jobs = 0
+        self.timed_out = False
+
+    def start(self) -> None:
+        command = office_command(
+            self.binary, self.slot_dir, f'--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext'
+        )
+        # Grupo de procesos propio: el lanzador (oosplash) y soffice.bin se matan juntos
+        self.process = subprocess.Popen(
+            command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True
+        )
+        with open(os.path.join(self.slot_dir, 'soffice.pid'), 'w') as f:
+            f.write(str(self.process.pid))
+
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            'com.sun.star.bridge.UnoUrlResolver', local_context
+        )
+        deadline = time.monotonic() + self.start_timeout
+        while True:
+            if self.process.poll() is not None:
+                raise OfficeConversionError(f"soffice exited during start-up with code {self.process.returncode}")
+            try:
+                context = resolver.resolve(f'uno:pipe,name={self.pipe_name};urp;StarOffice.ComponentContext')
+                break
+            except Exception:
+                if time.monotonic() > deadline:
+                    self.kill()
+                    raise OfficeConversionError(f"soffice did not accept connections within {self.start_timeout} s")
+                time.sleep(0.2)
+        self.desktop = context.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', context)
+        logger.info(f"soffice listener {self.pipe_name} started (pid {self.process.pid})")
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def is_healthy(self) -> bool:
+        """The process is running and answers a UNO call."""
+        if not self.is_alive() or self.desktop is None:
+            return False
+        try:
+            self.desktop.getFrames().getCount()
+            return True
+        except Exception as e:
+            logger.warning(f"soffice listener {self.pipe_name} failed health check: {str(e)}")
+            return False
+
+    def convert(self, source_path: str, target_path: str, filter_name: str = CALC_PDF_FILTER) -> None:
+        document = self.desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(source_path), '_blank', 0,
+            (_property('Hidden', True), _property('ReadOnly', True))
+        )
+        if document is None:
+            raise OfficeConversionError(f"LibreOffice could not open {os.path.basename(source_path)}")
+        try:
+            document.storeToURL(uno.systemPathToFileUrl(target_path), (_property('FilterName', filter_name),))
+        finally:
+            document.close(True)
+        self.jobs += 1
+
+    def kill(self) -> None:
+        if self.process is not None:
+            _kill_group(self.process.pid)
+            self.process.wait()
+        self.desktop = None
+
+    def stop(self) -> None:
+        """Asks soffice to quit; killed if it does not exit in a few seconds."""
+        if self.desktop is not None and self.is_alive():
+            try:
+                self.desktop.terminate()
+                self.process.wait(timeout=5)
+            except Exception:
+                pass
+        self.kill()
+
+
+class OfficePool:
+    """
+    Pool of warm headless LibreOffice listeners converting documents to PDF.
+
+    Each of the `size` worker threads owns one OfficeListener with its own
+    profile slot, takes jobs from a shared queue and converts them over UNO,
+    so documents convert in parallel without paying soffice start-up. Idle
+    listeners are health-checked every `health_interval` seconds and
+    replaced when they stop answering; a watchdog kills a listener whose
+    job runs past `job_timeout` (the job fails, the listener restarts), and
+    listeners are recycled after `max_jobs_per_process` documents.
+    Requires python3-uno (see is_supported()).
+    """
+
+    def __init__(self, size: int = 2, binary: str = 'soffice', profile_dir: Optional[str] = None,
+                 job_timeout: float = 60, start_timeout: float = 30, health_interval: float = 30,
+                 max_jobs_per_process: Optional[int] = 200):
+        self.size = max(1, size)
+        self.binary = binary
+        self.profile_dir = profile_dir or os.path.join(tempfile.gettempdir(), 'quote_office_profiles')
+        self.job_timeout = job_timeout
+        self.start_timeout = start_timeout
+        self.health_interval = health_interval
+        self.max_jobs_per_process = max_jobs_per_process or None
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._ready = threading.Semaphore(0)
+        # Conversión en curso de cada worker: (listener, hora límite)
+        self._running = {}
+
+    @staticmethod
+    def is_supported() -> bool:
+        return uno is not None and fcntl is not None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            if shutil.which(self.binary) is None:
+                raise OfficeConversionError(f"LibreOffice binary '{self.binary}' not found")
+            self._closed.clear()
+            for index in range(self.size):
+                thread = threading.Thread(target=self._worker, name=f'office-pool-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            watchdog = threading.Thread(target=self._watchdog, name='office-pool-watchdog', daemon=True)
+            watchdog.start()
+            self._threads.append(watchdog)
+        atexit.register(self.shutdown)
+
+    def warm(self, timeout: Optional[float] = None) -> None:
+        """Starts the pool and waits until every listener accepted its first connection."""
+        self.start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for _ in range(self.size):
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            if not self._ready.acquire(timeout=remaining):
+                logger.warning("Office pool not fully started, remaining listeners start in the background")
+                return
+        logger.info(f"Office pool ready with {self.size} listeners")
+
+    def submit(self, data: bytes, suffix: str = '.xlsx', filter_name: str = CALC_PDF_FILTER) -> 'Future[bytes]':
+        """Queues a document for conversion; the future returns the PDF bytes."""
+        self.start()
+        future: Future = Future()
+        self._queue.put((future, data, suffix, filter_name))
+        return future
+
+    def convert(self, data: bytes, suffix: str = '.xlsx', filter_name: str = CALC_PDF_FILTER,
+                timeout: Optional[float] = None) -> bytes:
+        """Converts one document, waiting at most timeout seconds (queue time included)."""
+        future = self.submit(data, suffix, filter_name)
+        try:
+            return future.result(timeout=timeout)
+        finally:
+            future.cancel()  # sin efecto si ya empezó; si sigue en la cola, se descarta
+
+    def _start_listener(self, slot_dir: str) -> OfficeListener:
+        listener = OfficeListener(self.binary, slot_dir, self.start_timeout)
+        listener.start()
+        return listener
+
+    def _worker(self) -> None:
+        with claim_profile_slot(self.profile_dir) as slot_dir:
+            listener = None
+            started = False
+            while not self._closed.is_set():
+                if listener is None:
+                    try:
+                        listener = self._start_listener(slot_dir)
+                    except Exception as e:
+                        logger.error(f"Could not start soffice listener: {str(e)}")
+                        self._closed.wait(RESTART_BACKOFF)
+                        continue
+                    # warm() cuenta un arranque por worker; los reinicios y reciclados no cuentan
+                    if not started:
+                        started = True
+                        self._ready.release()
+
+                try:
+                    job = self._queue.get(timeout=self.health_interval)
+                except queue.Empty:
+                    if not listener.is_healthy():
+                        logger.warning(f"Restarting unhealthy soffice listener {listener.pipe_name}")
+                        listener.kill()
+                        listener = None
+                    continue
+                if job is None:
+                    break
+
+                future, data, suffix, filter_name = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(self._run_job(listener, data, suffix, filter_name))
+                except Exception as e:
+                    if listener.timed_out:
+                        e = OfficeConversionError(f"Conversion timed out after {self.job_timeout} s")
+                    elif not isinstance(e, OfficeConversionError):
+                        e = OfficeConversionError(f"Conversion failed: {str(e)}")
+                    future.set_exception(e)
+                    if not listener.is_healthy():
+                        logger.warning(f"Restarting soffice listener {listener.pipe_name} after failed conversion")
+                        listener.kill()
+                        listener = None
+                    continue
+
+                if self.max_jobs_per_process and listener.jobs >= self.max_jobs_per_process:
+                    logger.info(f"Recycling soffice listener {listener.pipe_name} after {listener.jobs} documents")
+                    listener.stop()
+                    listener = None
+
+            if listener is not None:
+                listener.stop()
+
+    def _run_job(self, listener: OfficeListener, data: bytes, suffix: str, filter_name: str) -> bytes:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source_path = os.path.join(temp_dir, f'document{suffix}')
+            target_path = os.path.join(temp_dir, 'document.pdf')
+            with open(source_path, 'wb') as f:
+                f.write(data)
+
+            started = time.monotonic()
+            with self._lock:
+                self._running[threading.get_ident()] = (listener, started + self.job_timeout)
+            try:
+                listener.convert(source_path, target_path, filter_name)
+            finally:
+                with self._lock:
+                    self._running.pop(threading.get_ident(), None)
+
+            with open(target_path, 'rb') as f:
+                pdf = f.read()
+        logger.info(f"Converted document to PDF in {(time.monotonic() - started) * 1000:.0f} ms ({len(pdf)} bytes)")
+        return pdf
+
+    def _watchdog(self) -> None:
+        """Kills listeners stuck in a conversion; the blocked UNO call then fails in its worker."""
+        while not self._closed.wait(WATCHDOG_INTERVAL):
+            now = time.monotonic()
+            with self._lock:
+                expired = [listener for listener, deadline in self._running.values() if now > deadline]
+            for listener in expired:
+                if not listener.timed_out:
+                    logger.error(f"soffice listener {listener.pipe_name} hung for {self.job_timeout} s, killing it")
+                    listener.timed_out = True
+                    listener.kill()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            threads, self._threads = self._threads, []
+        if not threads:
+            return
+        self._closed.set()
+        for _ in range(self.size):
+            self._queue.put(None)
+        for thread in threads:
+            thread.join(timeout=10)
+        # Trabajos que quedaron en la cola
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                job[0].cancel()
+        logger.info("Office pool stopped")
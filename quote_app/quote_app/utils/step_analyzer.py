@@ -1,13 +1,49 @@
+import hashlib
+import os
 import trimesh
 import numpy as np
 import logging
-from typing import Dict, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
 from dataclasses import dataclass
-import pandas as pd
-import re
 from datetime import datetime
 from io import TextIOWrapper
 
+from .analysis_cache import AnalysisCache, file_digest
+from .analysis_pool import AnalysisPool
+from .component_table import ComponentTable
+from .mesh_kernels import INCH_CONVERSION, batch_mesh_checks, batch_volume_error_bounds, batch_volumes_in3
+from .step_metadata import StepMetadata, scan_step_metadata
+from .step_loader import load_step_scene, step_source_path
+from .step_partition import StepPart, partition_step
+
+
+# Bump whenever a change alters the analysis output so cached results are not reused
+ANALYZER_VERSION = 6
+
+# Modos de reparación: "always" repara todos los cuerpos, "auto" solo los que fallan la validación
+REPAIR_MODES = ('always', 'auto')
+
+# Estado de la malla reportado por cuerpo (el peor estado gana al agrupar)
+MESH_OK = 'ok'
+MESH_REPAIRED = 'repaired'
+MESH_OPEN = 'open'
+MESH_STATUS_SEVERITY = {MESH_OK: 0, MESH_REPAIRED: 1, MESH_OPEN: 2}
+
+# Niveles de teselado para cascadio: desviación lineal (mm) y angular (radianes)
+TESSELLATION_TIERS = {
+    'coarse': {'tol_linear': 0.5, 'tol_angular': 1.0},
+    'default': {'tol_linear': 0.01, 'tol_angular': 0.5},
+    'fine': {'tol_linear': 0.002, 'tol_angular': 0.25},
+}
+# "adaptive": pasada gruesa y refinamiento solo de los cuerpos con error de volumen alto
+TESSELLATION_MODES = tuple(TESSELLATION_TIERS) + ('adaptive',)
+ADAPTIVE_COARSE_TIER = 'coarse'
+ADAPTIVE_REFINE_TIER = 'default'
+
+# OpenCASCADE tesela en milímetros; las mallas del GLB llegan en metros
+TESSELLATION_UNIT = 0.001
+
 
 @dataclass
 class Component:
@@ -17,37 +53,113 @@ class Component:
     vertices: int
     faces: int
     quantity: int = 1
+    mesh_status: Optional[str] = None
+    volume_error: Optional[float] = None
+
+
+def _tessellate_part(data: bytes, tier: str = 'default',
+                     spool_dir: Optional[str] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Process pool task: tessellates a standalone part STEP and returns (vertices, faces) per body."""
+    scene = load_step_scene(data, spool_dir=spool_dir, **TESSELLATION_TIERS[tier])
+    geometries = scene.geometry.values() if isinstance(scene, trimesh.Scene) else [scene]
+    return [
+        (np.asarray(geometry.vertices), np.asarray(geometry.faces))
+        for geometry in geometries
+        if isinstance(geometry, trimesh.Trimesh) and not geometry.is_empty
+    ]
 
 
 class STEPAnalyzer:
-    def __init__(self, file: TextIOWrapper):
+    def __init__(self, file: TextIOWrapper, workers: int = 0, repair_mode: str = 'always',
+                 tessellation: str = 'default', estimate_error: bool = False,
+                 spool_dir: Optional[str] = None):
+        if repair_mode not in REPAIR_MODES:
+            raise ValueError(f"Unknown repair mode: {repair_mode}")
+        if tessellation not in TESSELLATION_TIERS:
+            raise ValueError(f"Unknown tessellation tier: {tessellation}")
         self.file = file
+        self.workers = workers
+        self.repair_mode = repair_mode
+        self.tessellation = tessellation
+        self.estimate_error = estimate_error
+        self.spool_dir = spool_dir
         self.logger = logging.getLogger(__name__)
-        self.materials_map = self._parse_step_materials()
+        self.metadata = self._parse_step_materials()
+        self._parts: Optional[List[StepPart]] = None
 
-    def _parse_step_materials(self) -> Dict[str, str]:
-        materials = {}
+    def _parse_step_materials(self) -> StepMetadata:
         try:
-            self.file.seek(0)  # Asegurar que leemos desde el inicio
-            content = self.file.read()
-            material_pattern = r"#\d+=DESCRIPTIVE_REPRESENTATION_ITEM\('([^']+)','([^']+)'\);"
-            material_matches = re.finditer(material_pattern, content)
-            for match in material_matches:
-                if match.group(1) == 'Steel':
-                    materials[match.group(1)] = 'Steel'
-            return materials
+            # Escaneo por bloques: nunca se copia el archivo completo en memoria
+            return scan_step_metadata(self.file)
+        except MemoryError:
+            raise
         except Exception as e:
             self.logger.error(f"Error parsing materials from STEP file: {str(e)}")
-            return {}
+            return StepMetadata()
+
+    def _repair_mesh(self, mesh: trimesh.Trimesh) -> None:
+        mesh.fix_normals()
 
     def calculate_volume(self, mesh: trimesh.Trimesh) -> float:
-        if not mesh.is_watertight:
-            self.logger.warning(f"Malla no es watertight - el volumen podría ser inexacto")
+        self._repair_mesh(mesh)
+        return float(batch_volumes_in3([(mesh.vertices, mesh.faces)])[0])
 
-        mesh.fix_normals()
-        volume = abs(mesh.volume)
-        inch_conversion = (1 / 0.0254) ** 3
-        return round(volume * inch_conversion, 7)
+    def _validate_and_repair(self, meshes: List[trimesh.Trimesh]) -> List[str]:
+        """
+        Checks every body with the vectorized kernel and repairs them according
+        to the repair mode. In "auto" mode clean bodies (watertight and
+        consistently wound) skip fix_normals entirely.
+        """
+        watertight, consistent = batch_mesh_checks([(mesh.vertices, mesh.faces) for mesh in meshes])
+        clean = watertight & consistent
+        statuses = [MESH_OK if is_clean else MESH_OPEN for is_clean in clean]
+
+        to_repair = range(len(meshes)) if self.repair_mode == 'always' else np.flatnonzero(~clean)
+        for index in to_repair:
+            self._repair_mesh(meshes[index])
+
+        flagged = np.flatnonzero(~clean)
+        if len(flagged):
+            # Solo los cuerpos marcados se vuelven a validar después de la reparación
+            watertight, consistent = batch_mesh_checks([(meshes[i].vertices, meshes[i].faces) for i in flagged])
+            for index, repaired in zip(flagged, watertight & consistent):
+                statuses[index] = MESH_REPAIRED if repaired else MESH_OPEN
+            open_count = statuses.count(MESH_OPEN)
+            if open_count:
+                self.logger.warning(f"{open_count} mallas no son watertight - el volumen podría ser inexacto")
+        return statuses
+
+    def _assign_volumes(self, components: List[Component], bodies: List[List[trimesh.Trimesh]],
+                        tier: Optional[str] = None) -> None:
+        """
+        Validates/repairs every body and measures all of them with a single
+        batched kernel call; bodies[i] are the meshes that make up components[i].
+
+        With estimate_error, each component also gets the relative bound of
+        its volume error for the tessellation tier the bodies came from.
+        """
+        tier = tier or self.tessellation
+        meshes = [mesh for component_bodies in bodies for mesh in component_bodies]
+        statuses = self._validate_and_repair(meshes)
+
+        arrays = [(mesh.vertices, mesh.faces) for mesh in meshes]
+        volumes = batch_volumes_in3(arrays)
+        owners = np.repeat(np.arange(len(components)), [len(component_bodies) for component_bodies in bodies])
+        totals = np.bincount(owners, weights=volumes, minlength=len(components))
+        errors = None
+        if self.estimate_error:
+            deflection = TESSELLATION_TIERS[tier]['tol_linear'] * TESSELLATION_UNIT
+            bounds = batch_volume_error_bounds(arrays, deflection) * INCH_CONVERSION
+            errors = np.bincount(owners, weights=bounds, minlength=len(components))
+        for index, (component, total) in enumerate(zip(components, totals)):
+            component.volume = round(float(total), 7)
+            component.mesh_status = MESH_OK
+            if errors is not None:
+                # Sin volumen no hay error relativo: None deja el cuerpo fuera del refinamiento
+                component.volume_error = float(errors[index] / total) if total > 0 else None
+        for owner, status in zip(owners, statuses):
+            if MESH_STATUS_SEVERITY[status] > MESH_STATUS_SEVERITY[components[owner].mesh_status]:
+                components[owner].mesh_status = status
 
     def _clean_component_name(self, name: str) -> str:
         if '_Default<As Machined>' in name:
@@ -55,86 +167,259 @@ class STEPAnalyzer:
             return f"{base_name}_Default<As Machined>"
         return name
 
+    @staticmethod
+    def _geometry_hash(mesh: trimesh.Trimesh) -> str:
+        """Content hash of a body in its local frame; identical instances hash the same."""
+        digest = hashlib.sha1(np.ascontiguousarray(mesh.vertices).tobytes())
+        digest.update(np.ascontiguousarray(mesh.faces).tobytes())
+        return digest.hexdigest()
+
+    @staticmethod
+    def _base_geometry_name(name: str, geometries) -> str:
+        """Strips the "_1", "_2"... suffix trimesh appends when several bodies share a name."""
+        base_name, _, suffix = name.rpartition('_')
+        if base_name and suffix.isdigit() and base_name in geometries:
+            return base_name
+        return name
+
+    def _step_parts(self) -> List[StepPart]:
+        """Standalone part files of the assembly, split once and reused by the refinement pass."""
+        if self._parts is None:
+            self._parts = partition_step(self.file)
+        return self._parts
+
+    def _tessellate_parts(self, parts: List[StepPart], tier: str) -> List[List[Tuple[np.ndarray, np.ndarray]]]:
+        """Tessellates each part file; uses the process pool when workers are configured."""
+        if not self.workers:
+            return [_tessellate_part(part.data, tier, self.spool_dir) for part in parts]
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            # Las piezas más grandes primero para repartir mejor la carga
+            futures = {
+                index: pool.submit(_tessellate_part, parts[index].data, tier, self.spool_dir)
+                for index in sorted(range(len(parts)), key=lambda i: len(parts[i].data), reverse=True)
+            }
+            return [futures[index].result() for index in range(len(parts))]
+
+    def _components_from_parts(self, parts: List[StepPart], tier: str) -> List[Component]:
+        """Builds and measures one component per part file, tessellated at the given tier."""
+        components = []
+        component_bodies = []
+        for part, bodies in zip(parts, self._tessellate_parts(parts, tier)):
+            meshes = [trimesh.Trimesh(vertices=v, faces=f, process=False) for v, f in bodies]
+            if not meshes:
+                continue
+            clean_name = self._clean_component_name(part.name)
+            components.append(Component(
+                name=clean_name,
+                volume=0.0,
+                material=self.metadata.material_for(clean_name),
+                vertices=sum(len(mesh.vertices) for mesh in meshes),
+                faces=sum(len(mesh.faces) for mesh in meshes),
+                quantity=part.quantity
+            ))
+            component_bodies.append(meshes)
+
+        self._assign_volumes(components, component_bodies, tier)
+        return components
+
+    def _analyze_parts_parallel(self) -> List[Component]:
+        """
+        Splits the assembly into standalone part files and tessellates them in a
+        process pool; each part is tessellated once and its quantity comes from
+        the assembly structure.
+        """
+        parts = self._step_parts()
+        if not parts:
+            return []
+        return self._components_from_parts(parts, self.tessellation)
+
+    def refine_components(self, components: List[Component], tolerance: float,
+                          tier: str = ADAPTIVE_REFINE_TIER) -> List[Component]:
+        """
+        Re-tessellates at `tier` only the components whose relative volume error
+        bound is above `tolerance`; the rest keep their coarse measurement.
+        """
+        flagged = {
+            component.name for component in components
+            if component.volume_error is not None and component.volume_error > tolerance
+        }
+        if not flagged:
+            return components
+
+        parts = [part for part in self._step_parts() if self._clean_component_name(part.name) in flagged]
+        if not parts:
+            self.logger.warning("Could not split STEP into parts, keeping coarse volumes")
+            return components
+
+        self.logger.info(f"Refining {len(parts)} of {len(components)} components at '{tier}' tessellation")
+        refined: Dict[str, List[Component]] = {}
+        for component in self._components_from_parts(parts, tier):
+            refined.setdefault(component.name, []).append(component)
+
+        # Se conserva el orden original; cada nombre refinado reemplaza a sus filas gruesas
+        result = []
+        for component in components:
+            if component.name not in refined:
+                result.append(component)
+            elif refined[component.name]:
+                result.extend(refined.pop(component.name))
+                refined[component.name] = []
+        return result
+
     def analyze_components(self) -> List[Component]:
         try:
-            self.file.seek(0)
-            scene = trimesh.load(self.file, file_type='step')  # Procesa bytes directamente
+            if self.workers:
+                components = self._analyze_parts_parallel()
+                if components:
+                    return components
+                self.logger.warning("Could not split STEP into parts, falling back to serial analysis")
+
+            # cascadio lee el STEP desde disco: la subida no se copia en memoria
+            scene = load_step_scene(self.file, spool_dir=self.spool_dir, **TESSELLATION_TIERS[self.tessellation])
             components_dict = {}
+            bodies = {}
 
             if isinstance(scene, trimesh.Scene):
+                instance_counts = {
+                    name: len(nodes) for name, nodes in scene.graph.geometry_nodes.items()
+                }
                 for name, geometry in scene.geometry.items():
                     if isinstance(geometry, trimesh.Trimesh) and not geometry.is_empty:
-                        volume = self.calculate_volume(geometry)
-                        clean_name = self._clean_component_name(name)
+                        clean_name = self._clean_component_name(self._base_geometry_name(name, scene.geometry))
+                        key = (clean_name, self._geometry_hash(geometry))
+                        quantity = instance_counts.get(name) or 1
 
-                        if clean_name in components_dict:
-                            components_dict[clean_name].quantity += 1
+                        if key in components_dict:
+                            # Cuerpo repetido: solo se suma la cantidad, no se vuelve a medir
+                            components_dict[key].quantity += quantity
                         else:
-                            component = Component(
+                            components_dict[key] = Component(
                                 name=clean_name,
-                                volume=volume,
-                                material='Steel' if 'Steel' in self.materials_map else None,
+                                volume=0.0,
+                                material=self.metadata.material_for(clean_name),
                                 vertices=len(geometry.vertices),
-                                faces=len(geometry.faces)
+                                faces=len(geometry.faces),
+                                quantity=quantity
                             )
-                            components_dict[clean_name] = component
+                            bodies[key] = [geometry]
 
             elif isinstance(scene, trimesh.Trimesh) and not scene.is_empty:
-                volume = self.calculate_volume(scene)
                 clean_name = self._clean_component_name("Component")
                 component = Component(
                     name=clean_name,
-                    volume=volume,
-                    material='Steel' if 'Steel' in self.materials_map else None,
+                    volume=0.0,
+                    material=self.metadata.material_for(clean_name),
                     vertices=len(scene.vertices),
                     faces=len(scene.faces)
                 )
                 components_dict[clean_name] = component
+                bodies[clean_name] = [scene]
 
+            # Todos los cuerpos únicos se miden en una sola pasada vectorizada
+            self._assign_volumes(list(components_dict.values()), list(bodies.values()))
             return list(components_dict.values())
         except Exception as e:
             self.logger.error(f"Error al analizar el archivo STEP: {str(e)}")
             raise
 
 
-            return list(components_dict.values())
-        except Exception as e:
-            self.logger.error(f"Error al analizar el archivo STEP: {str(e)}")
-            raise
+def _analyze_step_path(path: str, refine: Optional[List[Component]] = None,
+                       refine_tolerance: Optional[float] = None, **options) -> List[Component]:
+    """Analysis pool task: analyzes the STEP at `path`, or refines the given coarse components."""
+    with open(path, 'rb') as file:
+        analyzer = STEPAnalyzer(file, **options)
+        if refine is not None:
+            return analyzer.refine_components(refine, refine_tolerance)
+        return analyzer.analyze_components()
+
+
+def analyze_step_file(file: TextIOWrapper, csv_output_path: Optional[str] = None,
+                      cache: Optional[AnalysisCache] = None, workers: int = 0,
+                      repair_mode: str = 'always', tessellation: str = 'default',
+                      refine_tolerance: float = 0.01,
+                      on_coarse_result: Optional[Callable[[ComponentTable], None]] = None,
+                      spool_dir: Optional[str] = None, pool: Optional[AnalysisPool] = None) -> ComponentTable:
+    """
+    Analyzes a STEP file and returns a ComponentTable with one row per unique component.
 
+    `tessellation` is a tier of TESSELLATION_TIERS or "adaptive": a coarse pass
+    whose rows are handed to `on_coarse_result` right away, followed by a
+    refined pass only for components whose relative volume error bound is
+    above `refine_tolerance`.
 
-def analyze_step_file(file: TextIOWrapper, csv_output_path: Optional[str] = "../data/csv/output") -> pd.DataFrame:
+    `file` is best given as an open file on disk (or a Django
+    TemporaryUploadedFile): cascadio then reads it by path and the contents are
+    never loaded into memory. In-memory sources are spooled to `spool_dir`.
+
+    A CSV copy is written to the `csv_output_path` directory only if one is
+    given. With a `pool`, the tessellation runs in one of its resource-limited child
+    processes and AnalysisLimitError is raised if a limit is hit.
+    """
     logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
 
-    try:
-        analyzer = STEPAnalyzer(file)
-        components = analyzer.analyze_components()
+    if tessellation not in TESSELLATION_MODES:
+        raise ValueError(f"Unknown tessellation mode: {tessellation}")
 
-        if not csv_output_path:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            csv_output_path = f"step_analysis_{timestamp}.csv"
-        else:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            csv_output_path = f"{csv_output_path}//csv{timestamp}.csv"
-
-        data = [
-            {
-                "Component": component.name,
-                "Volume (in³)": component.volume,
-                "Material": component.material if component.material else 'Not specified',
-                "Vertices": component.vertices,
-                "Faces": component.faces,
-                "Quantity": component.quantity
+    try:
+        table = None
+        components = None
+        cache_key = None
+        if cache is not None:
+            cache_settings = {
+                'analyzer_version': ANALYZER_VERSION,
+                'mode': 'parallel' if workers else 'serial',
+                'repair_mode': repair_mode,
+                'tessellation': tessellation,
             }
-            for component in components
-        ]
+            if tessellation == 'adaptive':
+                cache_settings['refine_tolerance'] = refine_tolerance
+            cache_key = cache.make_key(file_digest(file), cache_settings)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                table = ComponentTable.from_dict(cached)
+
+        if table is None and pool is not None:
+            options = {'workers': workers, 'repair_mode': repair_mode, 'spool_dir': spool_dir}
+            with step_source_path(file, spool_dir) as step_path:
+                if tessellation == 'adaptive':
+                    options.update(tessellation=ADAPTIVE_COARSE_TIER, estimate_error=True)
+                    components = pool.run(_analyze_step_path, step_path, **options)
+                    if on_coarse_result is not None:
+                        on_coarse_result(ComponentTable.from_components(components))
+                    components = pool.run(_analyze_step_path, step_path, refine=components,
+                                          refine_tolerance=refine_tolerance, **options)
+                else:
+                    components = pool.run(_analyze_step_path, step_path, tessellation=tessellation, **options)
 
-        df = pd.DataFrame(data)
-        df.to_csv(csv_output_path, index=False, encoding='utf-8')
-        logger.info(f"Results saved to {csv_output_path}")
+        if table is None and components is None:
+            if tessellation == 'adaptive':
+                analyzer = STEPAnalyzer(file, workers=workers, repair_mode=repair_mode,
+                                        tessellation=ADAPTIVE_COARSE_TIER, estimate_error=True,
+                                        spool_dir=spool_dir)
+                components = analyzer.analyze_components()
+                if on_coarse_result is not None:
+                    on_coarse_result(ComponentTable.from_components(components))
+                components = analyzer.refine_components(components, refine_tolerance)
+            else:
+                analyzer = STEPAnalyzer(file, workers=workers, repair_mode=repair_mode,
+                                        tessellation=tessellation, spool_dir=spool_dir)
+                components = analyzer.analyze_components()
+
+        if table is None:
+            table = ComponentTable.from_components(components)
+            if cache is not None:
+                cache.set(cache_key, table.to_dict())
+
+        # CSV opcional para depuración; el historial de análisis vive en AnalysisArchive
+        if csv_output_path:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            csv_output_path = os.path.join(csv_output_path, f"csv{timestamp}.csv")
+            table.to_frame().to_csv(csv_output_path, index=False, encoding='utf-8')
+            logger.info(f"Results saved to {csv_output_path}")
 
-        return df
+        return table
     except Exception as e:
         logger.error(f"Error processing STEP file: {str(e)}")
         raise
@@ -150,7 +435,7 @@ if __name__ == "__main__":
         step_file = BytesIO(f.read())
 
     # Analizar archivo directamente desde el objeto BytesIO
-    df = analyze_step_file(step_file)
+    table = analyze_step_file(step_file)
 
     # Trabajar con el DataFrame
-    print(df)
+    print(table.to_frame())
@@ -0,0 +1,84 @@
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from io import BytesIO
+from typing import Iterator, Optional, Union
+
+import cascadio
+import trimesh
+
+
+logger = logging.getLogger(__name__)
+
+SPOOL_CHUNK_SIZE = 1024 * 1024
+
+
+def _on_disk_path(source) -> Optional[str]:
+    """Filesystem path already holding the STEP contents, if there is one."""
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    # TemporaryUploadedFile: Django ya guardó la subida en disco
+    if hasattr(source, 'temporary_file_path'):
+        return source.temporary_file_path()
+    # Archivos abiertos con open() sobre una ruta absoluta (p. ej. job.file.path)
+    name = getattr(source, 'name', None)
+    if isinstance(name, str) and os.path.isabs(name) and os.path.isfile(name):
+        return name
+    return None
+
+
+@contextmanager
+def step_source_path(source, spool_dir: Optional[str] = None) -> Iterator[str]:
+    """
+    Yields a path cascadio can read for any kind of STEP source.
+
+    Paths, Django TemporaryUploadedFile objects and regular open files are
+    handed over as they are, without reading a byte. In-memory sources
+    (bytes, BytesIO, InMemoryUploadedFile) are written to a temporary file from
+    a memoryview, or in chunks, so the contents are never duplicated in memory.
+    """
+    path = _on_disk_path(source)
+    if path is not None:
+        yield path
+        return
+
+    spool = tempfile.NamedTemporaryFile(suffix='.step', dir=spool_dir, delete=False)
+    try:
+        with spool:
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                spool.write(memoryview(source))
+            elif isinstance(getattr(source, 'file', source), BytesIO):
+                # BytesIO / InMemoryUploadedFile: se escribe el búfer sin copiarlo
+                spool.write(getattr(source, 'file', source).getbuffer())
+            else:
+                source.seek(0)
+                shutil.copyfileobj(source, spool, SPOOL_CHUNK_SIZE)
+                source.seek(0)
+        logger.debug(f"STEP source spooled to {spool.name}")
+        yield spool.name
+    finally:
+        os.unlink(spool.name)
+
+
+def load_step_scene(source, tol_linear: Optional[float] = None, tol_angular: Optional[float] = None,
+                    spool_dir: Optional[str] = None) -> Union[trimesh.Scene, trimesh.Trimesh]:
+    """
+    Tessellates a STEP file with cascadio and loads the resulting GLB.
+
+    Same result as trimesh.load(file, file_type='step'), but cascadio reads the
+    STEP straight from disk instead of trimesh copying the whole file into
+    memory and back out to a temporary file.
+    """
+    options = {'tol_linear': tol_linear, 'tol_angular': tol_angular}
+    with step_source_path(source, spool_dir) as step_path, tempfile.TemporaryDirectory(dir=spool_dir) as directory:
+        glb_path = os.path.join(directory, 'converted.glb')
+        cascadio.step_to_glb(
+            step_path,
+            glb_path,
+            merge_primitives=True,
+            **{key: value for key, value in options.items() if value is not None}
+        )
+        with open(glb_path, 'rb') as glb_file:
+            return trimesh.load(glb_file, file_type='glb', merge_primitives=True)
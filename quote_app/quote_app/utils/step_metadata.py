@@ -0,0 +1,182 @@
+import codecs
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+# Cabecera de una entidad simple: "#12 = PRODUCT ( ..."
+ENTITY_HEADER = re.compile(r"\s*#(\d+)\s*=\s*([A-Z][A-Z0-9_]*)\s*\(")
+ARG_TOKEN = re.compile(r"'(?:[^']|'')*'|#\d+|[()]|[^,()\s]+")
+
+# Only the entities needed to tie a material to a product are kept in memory
+METADATA_ENTITIES = {
+    'PRODUCT',
+    'PRODUCT_DEFINITION_FORMATION',
+    'PRODUCT_DEFINITION_FORMATION_WITH_SPECIFIED_SOURCE',
+    'PRODUCT_DEFINITION',
+    'PRODUCT_DEFINITION_SHAPE',
+    'PROPERTY_DEFINITION',
+    'PROPERTY_DEFINITION_REPRESENTATION',
+    'REPRESENTATION',
+    'DESCRIPTIVE_REPRESENTATION_ITEM',
+    'MATERIAL_DESIGNATION',
+}
+
+# Nombres genéricos que algunos exportadores ponen en lugar del material
+GENERIC_MATERIAL_LABELS = {'', 'material', 'material name', 'name', 'none'}
+
+
+@dataclass
+class StepMetadata:
+    products: Dict[int, str] = field(default_factory=dict)
+    descriptive_items: List[Tuple[str, str]] = field(default_factory=list)
+    materials: Dict[str, str] = field(default_factory=dict)
+
+    def material_for(self, name: str) -> Optional[str]:
+        """Material of the product with this name, falling back to the file-wide material if there is only one."""
+        if name in self.materials:
+            return self.materials[name]
+        # trimesh agrega sufijos "_1", "_2"... a geometrías con nombre repetido
+        base_name, _, suffix = name.rpartition('_')
+        if base_name and suffix.isdigit() and base_name in self.materials:
+            return self.materials[base_name]
+        distinct = set(self.materials.values())
+        if len(distinct) == 1:
+            return distinct.pop()
+        return None
+
+
+def iter_step_statements(file: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """
+    Yields the ';'-terminated statements of an ISO-10303-21 file reading it in chunks.
+
+    Only the current chunk and one incomplete statement are held in memory; a ';'
+    inside a quoted string is detected by the parity of the quotes seen so far
+    (escaped quotes come in pairs, so they never flip it).
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    pieces: List[str] = []
+    in_string = False
+
+    file.seek(0)
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        text = decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+        parts = text.split(';')
+        for part in parts[:-1]:
+            pieces.append(part)
+            if part.count("'") % 2:
+                in_string = not in_string
+            if in_string:
+                pieces.append(';')
+                continue
+            yield ''.join(pieces)
+            pieces = []
+        pieces.append(parts[-1])
+        if parts[-1].count("'") % 2:
+            in_string = not in_string
+    file.seek(0)
+
+
+def parse_entity_args(text: str) -> list:
+    """Parses an entity argument list into nested lists of str (strings/literals) and int (references)."""
+    stack: List[list] = [[]]
+    for token in ARG_TOKEN.findall(text):
+        if token == '(':
+            stack.append([])
+        elif token == ')':
+            if len(stack) > 1:
+                group = stack.pop()
+                stack[-1].append(group)
+        elif token.startswith("'"):
+            stack[-1].append(token[1:-1].replace("''", "'"))
+        elif token.startswith('#'):
+            stack[-1].append(int(token[1:]))
+        else:
+            stack[-1].append(token)
+    return stack[0]
+
+
+def _arg(args: list, index: int):
+    return args[index] if index < len(args) else None
+
+
+def scan_step_metadata(file: BinaryIO, chunk_size: int = CHUNK_SIZE) -> StepMetadata:
+    """
+    Single streaming pass over a STEP file collecting products, descriptive items
+    and the material assigned to each product.
+
+    STEP allows forward references, so the small metadata records are kept and
+    resolved once the pass is over; geometry entities are never retained.
+    """
+    entities: Dict[str, Dict[int, list]] = {name: {} for name in METADATA_ENTITIES}
+
+    for statement in iter_step_statements(file, chunk_size):
+        match = ENTITY_HEADER.match(statement)
+        if not match or match.group(2) not in METADATA_ENTITIES:
+            continue
+        body = statement[match.end():]
+        body = body[:body.rfind(')')]
+        entities[match.group(2)][int(match.group(1))] = parse_entity_args(body)
+
+    metadata = StepMetadata()
+
+    for entity_id, args in entities['PRODUCT'].items():
+        metadata.products[entity_id] = _arg(args, 1) or _arg(args, 0) or ''
+
+    items = {}
+    for entity_id, args in entities['DESCRIPTIVE_REPRESENTATION_ITEM'].items():
+        name, description = _arg(args, 0) or '', _arg(args, 1) or ''
+        metadata.descriptive_items.append((name, description))
+        items[entity_id] = description if name.strip().lower() in GENERIC_MATERIAL_LABELS else name
+
+    formations = {}
+    for formation_type in ('PRODUCT_DEFINITION_FORMATION', 'PRODUCT_DEFINITION_FORMATION_WITH_SPECIFIED_SOURCE'):
+        for entity_id, args in entities[formation_type].items():
+            formations[entity_id] = _arg(args, 2)
+
+    def product_name(definition_id) -> Optional[str]:
+        """Follows PRODUCT_DEFINITION_SHAPE -> PRODUCT_DEFINITION -> formation -> PRODUCT."""
+        if definition_id in entities['PRODUCT_DEFINITION_SHAPE']:
+            definition_id = _arg(entities['PRODUCT_DEFINITION_SHAPE'][definition_id], 2)
+        definition = entities['PRODUCT_DEFINITION'].get(definition_id)
+        if definition is None:
+            return None
+        return metadata.products.get(formations.get(_arg(definition, 2)))
+
+    # PROPERTY_DEFINITION('material ...', ..., #definition) <- PDR -> REPRESENTATION((#dri, ...))
+    for args in entities['PROPERTY_DEFINITION_REPRESENTATION'].values():
+        property_definition = entities['PROPERTY_DEFINITION'].get(_arg(args, 0))
+        representation = entities['REPRESENTATION'].get(_arg(args, 1))
+        if property_definition is None or representation is None:
+            continue
+        if 'material' not in (_arg(property_definition, 0) or '').lower():
+            continue
+        name = product_name(_arg(property_definition, 2))
+        representation_items = _arg(representation, 1) or []
+        material = next((items[item] for item in representation_items if items.get(item)), None)
+        if name and material:
+            metadata.materials[name] = material
+
+    # MATERIAL_DESIGNATION('Steel', (#definition, ...))
+    for args in entities['MATERIAL_DESIGNATION'].values():
+        definitions = _arg(args, 1)
+        if not isinstance(definitions, list):
+            definitions = [definitions]
+        for definition_id in definitions:
+            name = product_name(definition_id)
+            if name and _arg(args, 0):
+                metadata.materials.setdefault(name, _arg(args, 0))
+
+    logger.info(
+        f"STEP metadata: {len(metadata.products)} products, "
+        f"{len(metadata.descriptive_items)} descriptive items, {len(metadata.materials)} material assignments"
+    )
+    return metadata
@@ -0,0 +1,252 @@
+import io
+import logging
+import re
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from itertools import accumulate
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, List, Optional, Set, Tuple
+
+from .step_metadata import ENTITY_HEADER, iter_step_statements, parse_entity_args
+
+
+logger = logging.getLogger(__name__)
+
+ENTITY_ID = re.compile(r"\s*#(\d+)\s*=")
+REFERENCE = re.compile(r"#(\d+)")
+STRING = re.compile(r"'(?:[^']|'')*'")
+
+# Entidades que indican que una representación contiene sólidos
+SOLID_ENTITIES = {'MANIFOLD_SOLID_BREP', 'BREP_WITH_VOIDS', 'FACETED_BREP'}
+
+# Header and DATA entity types needed to walk products and assemblies
+STRUCTURE_ENTITIES = {
+    'PRODUCT',
+    'PRODUCT_DEFINITION_FORMATION',
+    'PRODUCT_DEFINITION_FORMATION_WITH_SPECIFIED_SOURCE',
+    'PRODUCT_DEFINITION',
+    'PRODUCT_DEFINITION_SHAPE',
+    'SHAPE_DEFINITION_REPRESENTATION',
+    'SHAPE_REPRESENTATION_RELATIONSHIP',
+    'NEXT_ASSEMBLY_USAGE_OCCURRENCE',
+}
+
+
+@dataclass
+class StepPart:
+    name: str
+    quantity: int
+    data: bytes
+
+
+class StepReferenceIndex:
+    """
+    Type, references and structure arguments of every DATA entity of a STEP
+    file, built in one streaming pass.
+
+    Statement text is not kept, and ids, types and references are stored in
+    flat integer arrays (a few bytes per entity instead of a dict entry and
+    a string). to_step_files() reads the file again and copies only the
+    statements each part needs, so memory is bounded by the index and the
+    part files rather than by the whole file.
+    """
+
+    def __init__(self, file: BinaryIO):
+        self.file = file
+        self.header: List[str] = []
+        self.args: Dict[int, list] = {}
+        # Entidad en la posición i (orden del archivo): id _ids[i], tipo _type_names[_types[i]]
+        # y referencias _refs[_offsets[i]:_offsets[i + 1]]
+        self._ids = array('Q')
+        self._types = array('H')
+        self._offsets = array('Q', [0])
+        self._refs = array('Q')
+        self._type_names: List[Optional[str]] = [None]
+        type_codes: Dict[Optional[str], int] = {None: 0}
+
+        for statement in iter_step_statements(file):
+            id_match = ENTITY_ID.match(statement)
+            if id_match is None:
+                if not self._ids and statement.strip() and statement.strip() != 'DATA':
+                    self.header.append(statement.strip())
+                continue
+            entity_id = int(id_match.group(1))
+            self._ids.append(entity_id)
+            self._refs.extend(int(ref) for ref in REFERENCE.findall(STRING.sub('', statement[id_match.end():])))
+            self._offsets.append(len(self._refs))
+            header_match = ENTITY_HEADER.match(statement)
+            # Las entidades complejas "( A() B() )" no tienen tipo simple
+            entity_type = header_match.group(2) if header_match else None
+            if entity_type not in type_codes:
+                type_codes[entity_type] = len(self._type_names)
+                self._type_names.append(entity_type)
+            self._types.append(type_codes[entity_type])
+            if entity_type in STRUCTURE_ENTITIES:
+                body = statement[header_match.end():]
+                self.args[entity_id] = parse_entity_args(body[:body.rfind(')')])
+
+        # Búsqueda de posiciones por id; los exportadores suelen escribir los ids en orden
+        if all(self._ids[i] < self._ids[i + 1] for i in range(len(self._ids) - 1)):
+            self._sorted_ids, self._order = self._ids, None
+        else:
+            order = sorted(range(len(self._ids)), key=self._ids.__getitem__)
+            self._sorted_ids = array('Q', (self._ids[i] for i in order))
+            self._order = array('Q', order)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _position(self, entity_id: int) -> Optional[int]:
+        index = bisect_left(self._sorted_ids, entity_id)
+        if index == len(self._sorted_ids) or self._sorted_ids[index] != entity_id:
+            return None
+        return index if self._order is None else self._order[index]
+
+    def type_of(self, entity_id: int) -> Optional[str]:
+        position = self._position(entity_id)
+        return None if position is None else self._type_names[self._types[position]]
+
+    def of_type(self, entity_type: str) -> List[int]:
+        if entity_type not in self._type_names:
+            return []
+        code = self._type_names.index(entity_type)
+        return [self._ids[position] for position, t in enumerate(self._types) if t == code]
+
+    def closure(self, roots: List[int]) -> array:
+        """File positions of every entity reachable from the roots, in file order."""
+        seen = set()
+        stack = [position for position in map(self._position, roots) if position is not None]
+        while stack:
+            position = stack.pop()
+            if position in seen:
+                continue
+            seen.add(position)
+            for ref in self._refs[self._offsets[position]:self._offsets[position + 1]]:
+                ref_position = self._position(ref)
+                if ref_position is not None:
+                    stack.append(ref_position)
+        return array('Q', sorted(seen))
+
+    def types_at(self, positions: array) -> Set[Optional[str]]:
+        return {self._type_names[code] for code in {self._types[position] for position in positions}}
+
+    def to_step_files(self, closures: List[array]) -> List[bytes]:
+        """One standalone STEP file per closure(), from a second pass over the file."""
+        # Partes que usan cada posición: _owners[owner_offsets[i]:owner_offsets[i + 1]]
+        counts = [0] * (len(self._ids) + 1)
+        for positions in closures:
+            for position in positions:
+                counts[position + 1] += 1
+        owner_offsets = array('Q', accumulate(counts))
+        del counts
+        owners = array('I', bytes(4 * owner_offsets[-1]))
+        filled = array('Q', owner_offsets)
+        for index, positions in enumerate(closures):
+            for position in positions:
+                owners[filled[position]] = index
+                filled[position] += 1
+        del filled
+
+        header = '\n'.join([f"{statement};" for statement in self.header] + ['DATA;', '']).encode('utf-8')
+        buffers = [io.BytesIO(header) for _ in closures]
+        for buffer in buffers:
+            buffer.seek(0, io.SEEK_END)
+        position = 0
+        for statement in iter_step_statements(self.file):
+            if ENTITY_ID.match(statement) is None:
+                continue
+            first, last = owner_offsets[position], owner_offsets[position + 1]
+            if first < last:
+                data = f"{statement.strip()};\n".encode('utf-8')
+                for index in owners[first:last]:
+                    buffers[index].write(data)
+            position += 1
+
+        files = []
+        for index, buffer in enumerate(buffers):
+            buffer.write(b'ENDSEC;\nEND-ISO-10303-21;')
+            files.append(buffer.getvalue())
+            buffers[index] = None  # se libera en cuanto se copia
+        return files
+
+
+def _occurrence_counts(table: StepReferenceIndex) -> Dict[int, int]:
+    """
+    Number of times each PRODUCT_DEFINITION appears in the assembly tree.
+
+    NEXT_ASSEMBLY_USAGE_OCCURRENCE(id, name, description, #relating, #related, ...)
+    links parent and child; counts multiply through nested sub-assemblies.
+    """
+    parents = defaultdict(list)
+    for nauo_id in table.of_type('NEXT_ASSEMBLY_USAGE_OCCURRENCE'):
+        args = table.args[nauo_id]
+        parents[args[4]].append(args[3])
+
+    counts: Dict[int, int] = {}
+
+    def count(definition_id: int, path: Tuple[int, ...] = ()) -> int:
+        if definition_id in counts:
+            return counts[definition_id]
+        if definition_id in path:
+            return 0
+        if not parents[definition_id]:
+            total = 1
+        else:
+            total = sum(count(parent, path + (definition_id,)) for parent in parents[definition_id])
+        counts[definition_id] = total
+        return total
+
+    for definition_id in table.of_type('PRODUCT_DEFINITION'):
+        count(definition_id)
+    return counts
+
+
+def partition_step(file: BinaryIO) -> List[StepPart]:
+    """
+    Splits a STEP assembly into one standalone STEP file per solid part.
+
+    Each part file holds the closure of the part's SHAPE_DEFINITION_REPRESENTATION
+    and its plain SHAPE_REPRESENTATION_RELATIONSHIPs (the ones linking the part's
+    placement representation to its B-rep). Placement relationships with
+    transformation are complex entities and are left out, so the parent assembly
+    is never pulled in. Quantities come from the assembly usage occurrences.
+    """
+    table = StepReferenceIndex(file)
+    counts = _occurrence_counts(table)
+
+    types = {entity_id: table.type_of(entity_id) for entity_id in table.args}
+    products = {entity_id: args[1] or args[0] for entity_id, args in table.args.items()
+                if types[entity_id] == 'PRODUCT'}
+    formations = {entity_id: args[2] for entity_id, args in table.args.items()
+                  if types[entity_id] in ('PRODUCT_DEFINITION_FORMATION',
+                                          'PRODUCT_DEFINITION_FORMATION_WITH_SPECIFIED_SOURCE')}
+
+    relationships = defaultdict(list)
+    for srr_id in table.of_type('SHAPE_REPRESENTATION_RELATIONSHIP'):
+        for rep_id in table.args[srr_id][2:4]:
+            relationships[rep_id].append(srr_id)
+
+    found = []
+    for sdr_id in table.of_type('SHAPE_DEFINITION_REPRESENTATION'):
+        pds_id, rep_id = table.args[sdr_id][:2]
+        if types.get(pds_id) != 'PRODUCT_DEFINITION_SHAPE':
+            continue
+        definition_id = table.args[pds_id][2]
+        if types.get(definition_id) != 'PRODUCT_DEFINITION':
+            continue
+
+        positions = table.closure([sdr_id] + relationships[rep_id])
+        if not table.types_at(positions) & SOLID_ENTITIES:
+            continue  # Ensamble: solo contiene posiciones de sus hijos
+
+        name = products.get(formations.get(table.args[definition_id][2]), f"Component {definition_id}")
+        found.append((name, counts.get(definition_id, 1), positions))
+
+    files = table.to_step_files([positions for _, _, positions in found])
+    parts = [
+        StepPart(name=name, quantity=quantity, data=data)
+        for (name, quantity, _), data in zip(found, files)
+    ]
+    logger.info(f"STEP partitioned into {len(parts)} parts ({len(table)} entities)")
+    return parts